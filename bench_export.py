@@ -0,0 +1,138 @@
+"""
+bench_export.py
+───────────────
+Throughput benchmark for the markdown → PDF / HTML export path.
+
+    python bench_export.py                          # 10k-line document, 3 repeats
+    python bench_export.py --save bench.json        # record a baseline
+    python bench_export.py --baseline bench.json    # exit 1 if a stage got slower
+
+Builds a synthetic post (headings, paragraphs with inline markup, nested
+lists, tables, multi-line quotes, code, images) and times each stage in
+lines per second, best of --repeat runs:
+
+    flowables   markdown → ReportLab flowables (parse + layout objects)
+    pdf         full to_pdf_bytes (flowables + ReportLab page layout)
+    html        full to_styled_html
+
+The parse cache (bwa_mdtree) is cleared before every timed run, so each
+run pays for parsing. Only long-standing entry points are used, so the same
+script can be run against older checkouts to compare.
+
+Functions:
+    synthetic_markdown(lines, seed)  →  str
+    run(lines, repeat)               →  Dict[str, float]  (lines/s per stage)
+    main(argv)                       →  int  (exit code)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import bwa_export
+
+_WORDS = ("latency throughput cache token request worker queue index shard replica "
+          "budget retry backoff model embedding vector search ranking evidence").split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+    i = rng.randrange(len(words))
+    words[i] = rng.choice([f"**{words[i]}**", f"*{words[i]}*", f"`{words[i]}()`",
+                           f"[{words[i]}](https://example.com/{words[i]})", words[i]])
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_markdown(lines: int = 10_000, seed: int = 0) -> str:
+    """A roundup-shaped post of roughly `lines` lines."""
+    rng = random.Random(seed)
+    out: List[str] = ["# Synthetic roundup", ""]
+    section = 0
+    while len(out) < lines:
+        section += 1
+        out += [f"## {section}. {rng.choice(_WORDS).title()} update", ""]
+        out += [_sentence(rng) for _ in range(rng.randint(2, 4))] + [""]
+        for _ in range(rng.randint(3, 6)):
+            out.append(f"- {_sentence(rng)}")
+            if rng.random() < 0.4:
+                out += [f"    - {_sentence(rng)}" for _ in range(2)]
+        out.append("")
+        out += ["| Metric | Before | After |", "|:--|--:|--:|"]
+        out += [f"| {rng.choice(_WORDS)} | {rng.randint(1, 999)} ms | {rng.randint(1, 999)} ms |"
+                for _ in range(rng.randint(3, 6))]
+        out.append("")
+        out += [f"> {_sentence(rng)}", ">", f"> {_sentence(rng)}", ""]
+        if section % 3 == 0:
+            out += ["```python", "def handler(event):", "    return process(event)", "```", ""]
+        if section % 5 == 0:
+            out += [f"![figure {section}](images/missing_{section}.png)", f"*Figure {section}*", ""]
+        out += [f"{n}. {_sentence(rng)}" for n in range(1, 4)] + [""]
+    return "\n".join(out[:lines]) + "\n"
+
+
+def _clear_parse_cache() -> None:
+    try:
+        from bwa_mdtree import parse
+    except ImportError:                     # checkouts from before the shared tree
+        return
+    parse.cache_clear()
+
+
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        _clear_parse_cache()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(lines: int = 10_000, repeat: int = 3) -> Dict[str, float]:
+    md = synthetic_markdown(lines)
+    n = md.count("\n")
+    st = bwa_export._make_styles()
+    stages = {
+        "flowables": lambda: bwa_export._parse_md_to_flowables(md, st),
+        "pdf": lambda: bwa_export.to_pdf_bytes(md, "Benchmark"),
+        "html": lambda: bwa_export.to_styled_html(md, "Benchmark"),
+    }
+    return {name: round(n / _best(fn, repeat)) for name, fn in stages.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark markdown export throughput.")
+    parser.add_argument("--lines", type=int, default=10_000, help="document size (default: 10000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, best counts (default: 3)")
+    parser.add_argument("--save", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with a JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed slowdown vs baseline before failing (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    results = run(args.lines, args.repeat)
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else {}
+    failed = False
+    print(f"{args.lines} lines, best of {args.repeat}")
+    for stage, rate in results.items():
+        line = f"  {stage:10} {rate:>10,} lines/s"
+        if stage in baseline:
+            ratio = rate / baseline[stage]
+            line += f"   {ratio:5.2f}x baseline"
+            if ratio < 1 - args.tolerance:
+                line += "   REGRESSION"
+                failed = True
+        print(line)
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
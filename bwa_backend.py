@@ -1,22 +1,45 @@
 from __future__ import annotations
 
-import operator
+import asyncio
+import hashlib
+import inspect
+import json
 import os
 import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import date, timedelta
 from pathlib import Path
 from typing import TypedDict, List, Optional, Literal, Annotated, cast
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Sequence, Tuple, Type, TypeVar, get_type_hints
 from google.genai.types import HarmCategory, HarmBlockThreshold
 from pydantic import BaseModel, Field
 from pydantic import ConfigDict          # ← Fix 3: needed for mutable Pydantic models
 
 from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_stream_writer
 from langgraph.types import Send
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from dotenv import load_dotenv
 import tempfile
+
+from bwa_cache import cache_dir, get_response_cache, get_search_cache, llm_cache_key
+from bwa_images import (
+    ImageResult, ImageStore, generate_images, get_genai_client, get_image_store, make_variants, place_images,
+)
+from bwa_library import get_library
+from bwa_providers import get_search_engine, image_backend, make_llm, provider
+from bwa_ratelimit import estimate_tokens, get_rate_limiter
+from bwa_research import (
+    SEARCH_BREAKER, SearchUnavailable, canonicalize_url, get_evidence_index, preprocess_results,
+)
+from bwa_resilience import acall, call, get_breaker, llm_policy
+from bwa_trace import record_cache_hit, record_count, record_llm, span
 load_dotenv()
 
 
@@ -41,8 +64,7 @@ class WorkerState(TypedDict):
     mode: str
     as_of: str
     recency_days: int
-    plan: dict
-    evidence: List[dict]
+    context: str                # handle from publish_context(): shared plan + evidence snapshot
 
 class Plan(BaseModel):
     # ✅ Fix 3: allow attribute mutation (plan.blog_kind = "news_roundup")
@@ -91,6 +113,37 @@ class GlobalImagePlan(BaseModel):
     images: List[ImageSpec] = Field(default_factory=list)
 
 
+class ImageAnchor(BaseModel):
+    section: int = Field(..., description="Section number from the outline, e.g. 2 for [2].")
+    paragraph: int = Field(0, description="Insert after this paragraph of the section; 0 = directly under the heading.")
+
+
+class AnchoredImage(BaseModel):
+    anchor: ImageAnchor
+    filename: str = Field(..., description="Save under images/, e.g. qkv_flow.png")
+    alt: str
+    caption: str
+    prompt: str = Field(..., description="Prompt to send to the image model.")
+    size: Literal["1024x1024", "1024x1536", "1536x1024"] = "1024x1024"
+    quality: Literal["low", "medium", "high"] = "medium"
+
+
+class ImagePlacementPlan(BaseModel):
+    images: List[AnchoredImage] = Field(default_factory=list)
+
+
+def merge_sections(current: Optional[List[tuple[int, str]]],
+                   update: Optional[List[tuple[int, str]]]) -> List[tuple[int, str]]:
+    """
+    Reducer for State.sections: one (task_id, markdown) entry per task, the latest
+    write wins. operator.add doubled the list, because the reducer subgraph hands its
+    full state (sections included) back to the parent graph.
+    """
+    merged: Dict[int, str] = dict(current or [])
+    merged.update(update or [])
+    return list(merged.items())
+
+
 class State(TypedDict):
     topic: str
 
@@ -103,7 +156,7 @@ class State(TypedDict):
     as_of: str
     recency_days: int
 
-    sections: Annotated[List[tuple[int, str]], operator.add]
+    sections: Annotated[List[tuple[int, str]], merge_sections]
 
     merged_md: str
     md_with_placeholders: str
@@ -115,7 +168,184 @@ class State(TypedDict):
 # -----------------------------
 # 2) LLM
 # -----------------------------
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+LLM_MODEL = "gemini-2.5-flash"
+llm = make_llm(LLM_MODEL)           # Gemini, or the offline fake with BWA_PROVIDER=fake (bwa_providers)
+LLM_BREAKER = "gemini"
+# response-cache model id: fake output must never be served to a live run
+LLM_CACHE_MODEL = LLM_MODEL if provider("llm") == "live" else f"fake/{LLM_MODEL}"
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _cache_bypassed(config: Optional[RunnableConfig]) -> bool:
+    """Per-run switch: config={"configurable": {"bypass_llm_cache": True}} skips cache reads."""
+    return bool(((config or {}).get("configurable") or {}).get("bypass_llm_cache"))
+
+
+def _cache_lookup(key: str, config: Optional[RunnableConfig]) -> Optional[str]:
+    cache = get_response_cache()
+    if cache is None or _cache_bypassed(config):
+        return None
+    value = cache.get(key)
+    if value is not None:
+        record_cache_hit()
+    return value
+
+
+def _cache_store(key: str, value: str) -> None:
+    cache = get_response_cache()
+    if cache is not None:
+        cache.put(key, value)
+
+
+def _usage_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+def _parsed(schema: Type[M], out: dict) -> M:
+    # include_raw=True returns {"raw": AIMessage, "parsed": ..., "parsing_error": ...}
+    if out.get("parsed") is None:
+        raise out.get("parsing_error") or ValueError(f"Model returned no {schema.__name__}.")
+    return cast(M, out["parsed"])
+
+
+def _invoke_structured(schema: Type[M], messages: Sequence[BaseMessage],
+                       config: Optional[RunnableConfig] = None) -> M:
+    """llm.with_structured_output(schema).invoke(messages), cached, rate limited and retried."""
+    key = llm_cache_key(LLM_CACHE_MODEL, messages, schema)
+    hit = _cache_lookup(key, config)
+    if hit is not None:
+        return schema.model_validate_json(hit)
+
+    limiter, estimate = get_rate_limiter(), estimate_tokens(messages)
+    structured = llm.with_structured_output(schema, include_raw=True)
+
+    # queue for capacity once, up front: a wait in the limiter is neither a failed
+    # try (retry, breaker) nor part of the attempt deadline
+    limiter.acquire(estimate)
+    out = call(lambda: structured.invoke(list(messages)), llm_policy(), get_breaker(LLM_BREAKER))
+    record_llm(out.get("raw"))
+    limiter.settle(estimate, _usage_tokens(out.get("raw")))
+    result = _parsed(schema, out)
+    _cache_store(key, result.model_dump_json())
+    return result
+
+
+async def _ainvoke_structured(schema: Type[M], messages: Sequence[BaseMessage],
+                              config: Optional[RunnableConfig] = None) -> M:
+    key = llm_cache_key(LLM_CACHE_MODEL, messages, schema)
+    hit = _cache_lookup(key, config)
+    if hit is not None:
+        return schema.model_validate_json(hit)
+
+    limiter, estimate = get_rate_limiter(), estimate_tokens(messages)
+    structured = llm.with_structured_output(schema, include_raw=True)
+
+    await limiter.aacquire(estimate)
+    out = await acall(lambda: structured.ainvoke(list(messages)), llm_policy(), get_breaker(LLM_BREAKER))
+    record_llm(out.get("raw"))
+    limiter.settle(estimate, _usage_tokens(out.get("raw")))
+    result = _parsed(schema, out)
+    _cache_store(key, result.model_dump_json())
+    return result
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(p if isinstance(p, str) else p.get("text", "") for p in content or [])
+
+
+# on_token(text) receives streamed deltas; on_token(text, True) marks the first
+# delta of a retried stream, so consumers drop what the failed attempt sent
+TokenSink = Callable[..., None]
+
+
+def _collect_stream(chunks: Iterator[Any], on_token: TokenSink, restart: bool) -> Any:
+    msg = None
+    for chunk in chunks:
+        msg = chunk if msg is None else msg + chunk
+        delta = _chunk_text(chunk)
+        if delta:
+            on_token(delta, restart)
+            restart = False
+    return msg
+
+
+async def _acollect_stream(chunks: AsyncIterator[Any], on_token: TokenSink, restart: bool) -> Any:
+    msg = None
+    async for chunk in chunks:
+        msg = chunk if msg is None else msg + chunk
+        delta = _chunk_text(chunk)
+        if delta:
+            on_token(delta, restart)
+            restart = False
+    return msg
+
+
+def _invoke_text(messages: Sequence[BaseMessage], config: Optional[RunnableConfig] = None,
+                 on_token: Optional[TokenSink] = None, hedge: bool = False) -> str:
+    """
+    llm.invoke(messages).content as a stripped string, cached, rate limited and retried.
+    With `on_token`, the call streams and every text delta is passed on as it arrives
+    (a cache hit is delivered as one delta). `hedge` allows a duplicate request for
+    slow non-streamed calls (BWA_HEDGE_AFTER).
+    """
+    key = llm_cache_key(LLM_CACHE_MODEL, messages)
+    hit = _cache_lookup(key, config)
+    if hit is not None:
+        if on_token is not None:
+            on_token(hit)
+        return hit
+
+    limiter, estimate = get_rate_limiter(), estimate_tokens(messages)
+    tries = 0
+
+    def attempt() -> Any:
+        nonlocal tries
+        tries += 1
+        if on_token is None:
+            return llm.invoke(list(messages))
+        return _collect_stream(llm.stream(list(messages)), on_token, restart=tries > 1)
+
+    limiter.acquire(estimate)               # once per call, outside retries and deadlines
+    msg = call(attempt, llm_policy(hedge=hedge and on_token is None), get_breaker(LLM_BREAKER))
+    record_llm(msg)
+    limiter.settle(estimate, _usage_tokens(msg))
+    # AIMessage.content is str | list; the plain chat call always yields str
+    text = _chunk_text(msg).strip()
+    _cache_store(key, text)
+    return text
+
+
+async def _ainvoke_text(messages: Sequence[BaseMessage], config: Optional[RunnableConfig] = None,
+                        on_token: Optional[TokenSink] = None, hedge: bool = False) -> str:
+    key = llm_cache_key(LLM_CACHE_MODEL, messages)
+    hit = _cache_lookup(key, config)
+    if hit is not None:
+        if on_token is not None:
+            on_token(hit)
+        return hit
+
+    limiter, estimate = get_rate_limiter(), estimate_tokens(messages)
+    tries = 0
+
+    async def attempt() -> Any:
+        nonlocal tries
+        tries += 1
+        if on_token is None:
+            return await llm.ainvoke(list(messages))
+        return await _acollect_stream(llm.astream(list(messages)), on_token, restart=tries > 1)
+
+    await limiter.aacquire(estimate)
+    msg = await acall(attempt, llm_policy(hedge=hedge and on_token is None), get_breaker(LLM_BREAKER))
+    record_llm(msg)
+    limiter.settle(estimate, _usage_tokens(msg))
+    text = _chunk_text(msg).strip()
+    _cache_store(key, text)
+    return text
 
 
 # -----------------------------
@@ -136,18 +366,14 @@ If needs_research=true:
 """
 
 
-def router_node(state: State) -> dict:
-    # ✅ Fix 1: cast result of with_structured_output().invoke() to the correct Pydantic type
-    #    Pylance sees the return as BaseModel | dict because with_structured_output is generic.
-    #    cast() tells the type-checker exactly what type to expect at runtime.
-    decider = llm.with_structured_output(RouterDecision)
-    decision = cast(RouterDecision, decider.invoke(
-        [
-            SystemMessage(content=ROUTER_SYSTEM),
-            HumanMessage(content=f"Topic: {state['topic']}\nAs-of date: {state['as_of']}"),
-        ]
-    ))
+def _router_messages(state: State) -> List[BaseMessage]:
+    return [
+        SystemMessage(content=ROUTER_SYSTEM),
+        HumanMessage(content=f"Topic: {state['topic']}\nAs-of date: {state['as_of']}"),
+    ]
+
 
+def _router_update(decision: RouterDecision) -> dict:
     if decision.mode == "open_book":
         recency_days = 7
     elif decision.mode == "hybrid":
@@ -163,34 +389,59 @@ def router_node(state: State) -> dict:
     }
 
 
+def router_node(state: State, config: RunnableConfig) -> dict:
+    return _router_update(_invoke_structured(RouterDecision, _router_messages(state), config))
+
+
+async def arouter_node(state: State, config: RunnableConfig) -> dict:
+    return _router_update(await _ainvoke_structured(RouterDecision, _router_messages(state), config))
+
+
 def route_next(state: State) -> str:
-    return "research" if state["needs_research"] else "orchestrator"
+    # degrade instead of hanging: with search's breaker open, plan without evidence
+    if state["needs_research"] and not get_breaker(SEARCH_BREAKER).is_open:
+        return "research"
+    return "orchestrator"
 
 
 # -----------------------------
 # 4) Research (Tavily)
 # -----------------------------
-def _tavily_search(query: str, max_results: int = 5) -> List[dict]:
-    if not os.getenv("TAVILY_API_KEY"):
-        return []
-    try:
-        from langchain_community.tools.tavily_search import TavilySearchResults  # type: ignore
-        tool = TavilySearchResults(max_results=max_results)
-        results = tool.invoke({"query": query})
-        out: List[dict] = []
-        for r in results or []:
-            out.append(
-                {
-                    "title": r.get("title") or "",
-                    "url": r.get("url") or "",
-                    "snippet": r.get("content") or r.get("snippet") or "",
-                    "published_at": r.get("published_date") or r.get("published_at"),
-                    "source": r.get("source"),
-                }
-            )
-        return out
-    except Exception:
-        return []
+def _tavily_search(query: str, max_results: int = 5, recency_days: int = 3650) -> List[dict]:
+    return _cached_search_many([query], max_results, recency_days)[0]
+
+
+def _cached_search_many(queries: List[str], max_results: int, recency_days: int) -> List[List[dict]]:
+    """
+    Serve each query from the on-disk search cache when fresh enough for this
+    run's recency window; only the misses go to Tavily (concurrently).
+    A query that still fails after retries contributes no results; if every
+    query failed, raises SearchUnavailable.
+    """
+    engine = get_search_engine()
+    if engine is None:                  # live provider without TAVILY_API_KEY
+        return [[] for _ in queries]
+
+    # synthetic hits stay out of the shared search cache
+    cache = get_search_cache() if provider("search") == "live" else None
+    results: List[Optional[List[dict]]] = [
+        cache.get(q, max_results, recency_days) if cache else None for q in queries
+    ]
+    missing = [i for i, r in enumerate(results) if r is None]
+    record_count("search_cache_hits", len(queries) - len(missing))
+    if missing:
+        fetched = engine.search_many([queries[i] for i in missing], max_results=max_results)
+        errors = [found for found in fetched if isinstance(found, BaseException)]
+        record_count("searches", len(missing))
+        record_count("search_errors", len(errors))
+        if errors and len(errors) == len(queries):
+            raise SearchUnavailable(f"all {len(queries)} searches failed: {errors[0]!r}") from errors[0]
+        for i, found in zip(missing, fetched):
+            if not isinstance(found, BaseException):
+                if cache:
+                    cache.put(queries[i], max_results, found)
+                results[i] = found
+    return [r or [] for r in results]
 
 
 def _iso_to_date(s: Optional[str]) -> Optional[date]:
@@ -215,44 +466,89 @@ Rules:
 """
 
 
-def research_node(state: State) -> dict:
+def _recency_cutoff(state: State) -> Optional[date]:
+    if state.get("mode") != "open_book":
+        return None
+    return date.fromisoformat(state["as_of"]) - timedelta(days=int(state["recency_days"]))
+
+
+def _gather_raw(state: State) -> List[dict]:
+    """Search, then canonicalize/dedup/recency-filter locally before anything reaches the LLM."""
     queries = (state.get("queries") or [])[:10]
     raw: List[dict] = []
-    for q in queries:
-        raw.extend(_tavily_search(q, max_results=6))
+    for results in _cached_search_many(queries, 6, int(state.get("recency_days") or 3650)):
+        raw.extend(results)
+    return preprocess_results(raw, cutoff=_recency_cutoff(state))
 
-    if not raw:
-        return {"evidence": []}
 
-    # ✅ Fix 1 (same pattern): cast structured output result to EvidencePack
-    extractor = llm.with_structured_output(EvidencePack)
-    pack = cast(EvidencePack, extractor.invoke(
-        [
-            SystemMessage(content=RESEARCH_SYSTEM),
-            HumanMessage(
-                content=(
-                    f"As-of date: {state['as_of']}\n"
-                    f"Recency days: {state['recency_days']}\n\n"
-                    f"Raw results:\n{raw}"
-                )
-            ),
-        ]
-    ))
+_SNIPPET_CHARS = 600
+
 
+def _format_raw(raw: List[dict]) -> str:
+    """One compact JSON object per line instead of the Python repr of every field."""
+    return "\n".join(
+        json.dumps(
+            {
+                "title": r.get("title") or "",
+                "url": r["url"],
+                "published_at": r.get("published_at"),
+                "snippet": (r.get("snippet") or "")[:_SNIPPET_CHARS],
+            },
+            ensure_ascii=False,
+        )
+        for r in raw
+    )
+
+
+def _research_messages(state: State, raw: List[dict]) -> List[BaseMessage]:
+    return [
+        SystemMessage(content=RESEARCH_SYSTEM),
+        HumanMessage(
+            content=(
+                f"As-of date: {state['as_of']}\n"
+                f"Recency days: {state['recency_days']}\n\n"
+                f"Raw results (JSON lines):\n{_format_raw(raw)}"
+            )
+        ),
+    ]
+
+
+def _research_update(state: State, pack: EvidencePack) -> dict:
     dedup = {}
-    for e in pack.evidence:          # ✅ Fix 1: now correctly typed as EvidencePack
+    for e in pack.evidence:
         if e.url:
-            dedup[e.url] = e
+            dedup[canonicalize_url(e.url)] = e
     evidence = list(dedup.values())
 
-    if state.get("mode") == "open_book":
-        as_of = date.fromisoformat(state["as_of"])
-        cutoff = as_of - timedelta(days=int(state["recency_days"]))
+    cutoff = _recency_cutoff(state)
+    if cutoff is not None:
         evidence = [e for e in evidence if (d := _iso_to_date(e.published_at)) and d >= cutoff]
 
     return {"evidence": evidence}
 
 
+def research_node(state: State, config: RunnableConfig) -> dict:
+    try:
+        raw = _gather_raw(state)
+    except SearchUnavailable:
+        raw = []                        # plan without evidence rather than fail the run
+    if not raw:
+        return {"evidence": []}
+    pack = _invoke_structured(EvidencePack, _research_messages(state, raw), config)
+    return _research_update(state, pack)
+
+
+async def aresearch_node(state: State, config: RunnableConfig) -> dict:
+    try:
+        raw = await asyncio.to_thread(_gather_raw, state)   # search engine is thread-pooled
+    except SearchUnavailable:
+        raw = []
+    if not raw:
+        return {"evidence": []}
+    pack = await _ainvoke_structured(EvidencePack, _research_messages(state, raw), config)
+    return _research_update(state, pack)
+
+
 # -----------------------------
 # 5) Orchestrator (Plan)
 # -----------------------------
@@ -275,56 +571,145 @@ Output must match Plan schema.
 """
 
 
-def orchestrator_node(state: State) -> dict:
-    # ✅ Fix 1: cast structured output to Plan
-    planner = llm.with_structured_output(Plan)
+def _orchestrator_messages(state: State) -> List[BaseMessage]:
     mode = state.get("mode", "closed_book")
     evidence = state.get("evidence", [])
-
     forced_kind = "news_roundup" if mode == "open_book" else None
+    return [
+        SystemMessage(content=ORCH_SYSTEM),
+        HumanMessage(
+            content=(
+                f"Topic: {state['topic']}\n"
+                f"Mode: {mode}\n"
+                f"As-of: {state['as_of']} (recency_days={state['recency_days']})\n"
+                f"{'Force blog_kind=news_roundup' if forced_kind else ''}\n\n"
+                f"Evidence:\n{[e.model_dump() for e in evidence][:16]}"
+            )
+        ),
+    ]
 
-    plan = cast(Plan, planner.invoke(
-        [
-            SystemMessage(content=ORCH_SYSTEM),
-            HumanMessage(
-                content=(
-                    f"Topic: {state['topic']}\n"
-                    f"Mode: {mode}\n"
-                    f"As-of: {state['as_of']} (recency_days={state['recency_days']})\n"
-                    f"{'Force blog_kind=news_roundup' if forced_kind else ''}\n\n"
-                    f"Evidence:\n{[e.model_dump() for e in evidence][:16]}"
-                )
-            ),
-        ]
-    ))
 
+def _orchestrator_update(state: State, plan: Plan) -> dict:
     # ✅ Fix 3: Plan now has model_config = ConfigDict(frozen=False), so mutation works
-    if forced_kind:
+    if state.get("mode", "closed_book") == "open_book":
         plan.blog_kind = "news_roundup"
-
     return {"plan": plan}
 
 
+def orchestrator_node(state: State, config: RunnableConfig) -> dict:
+    return _orchestrator_update(state, _invoke_structured(Plan, _orchestrator_messages(state), config))
+
+
+async def aorchestrator_node(state: State, config: RunnableConfig) -> dict:
+    return _orchestrator_update(state, await _ainvoke_structured(Plan, _orchestrator_messages(state), config))
+
+
 # -----------------------------
 # 6) Fanout
+#    Workers share one immutable plan/evidence snapshot per run. It is
+#    serialized once, addressed by its hash, and only the handle travels in
+#    each Send (and in checkpoints). The JSON is also written to disk so a run
+#    resumed in a fresh process can still load it; those files are kept LRU by
+#    mtime and capped in number (BWA_CONTEXT_FILES, default 256). The handle is
+#    the hash of the content, so resuming re-publishes the snapshot from the
+#    checkpointed plan/evidence and a pruned file comes back under the same ref.
 # -----------------------------
+@dataclass(frozen=True)
+class RunContext:
+    plan: Plan
+    evidence: Tuple[EvidenceItem, ...]
+
+
+_CONTEXTS: "OrderedDict[str, RunContext]" = OrderedDict()
+_CONTEXTS_MAX = 32
+_contexts_lock = threading.Lock()
+
+
+def _context_path(ref: str) -> Path:
+    d = cache_dir() / "contexts"
+    d.mkdir(exist_ok=True)
+    return d / f"{ref}.json"
+
+
+def _touch(path: Path) -> None:
+    try:
+        path.touch()
+    except OSError:
+        pass
+
+
+def _prune_contexts(keep: str) -> None:
+    """Drop the least recently used snapshot files beyond BWA_CONTEXT_FILES (never `keep`)."""
+    limit = int(os.getenv("BWA_CONTEXT_FILES", "256"))
+    entries = []
+    for path in (cache_dir() / "contexts").glob("*.json"):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue                    # pruned concurrently
+    for _, path in sorted(entries, reverse=True)[limit:]:
+        if path.stem != keep:
+            path.unlink(missing_ok=True)
+
+
+def _remember_context(ref: str, ctx: RunContext) -> RunContext:
+    with _contexts_lock:
+        _CONTEXTS[ref] = ctx
+        _CONTEXTS.move_to_end(ref)
+        while len(_CONTEXTS) > _CONTEXTS_MAX:
+            _CONTEXTS.popitem(last=False)
+    return ctx
+
+
+def publish_context(plan: Plan, evidence: List[EvidenceItem]) -> str:
+    blob = json.dumps(
+        {"plan": plan.model_dump(), "evidence": [e.model_dump() for e in evidence]},
+        sort_keys=True, ensure_ascii=False,
+    )
+    ref = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+    with _contexts_lock:
+        known = ref in _CONTEXTS
+    if not known:
+        path = _context_path(ref)
+        if path.exists():
+            _touch(path)
+        else:
+            path.write_text(blob, encoding="utf-8")
+            _prune_contexts(keep=ref)
+        # deep copy: later mutation of the caller's Plan must not leak into the snapshot
+        _remember_context(ref, RunContext(plan.model_copy(deep=True), tuple(evidence)))
+    return ref
+
+
+def load_context(ref: str) -> RunContext:
+    with _contexts_lock:
+        ctx = _CONTEXTS.get(ref)
+    if ctx is not None:
+        return ctx
+    path = _context_path(ref)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    _touch(path)
+    return _remember_context(ref, RunContext(
+        Plan.model_validate(data["plan"]),
+        tuple(EvidenceItem.model_validate(e) for e in data["evidence"]),
+    ))
+
+
+def _worker_input(state: State, task: Task, context: str) -> WorkerState:
+    return {
+        "task": task.model_dump(),
+        "topic": state["topic"],
+        "mode": state["mode"],
+        "as_of": state["as_of"],
+        "recency_days": state["recency_days"],
+        "context": context,
+    }
+
+
 def fanout(state: State):
     assert state["plan"] is not None
-    return [
-        Send(
-            "worker",
-            {
-                "task": task.model_dump(),
-                "topic": state["topic"],
-                "mode": state["mode"],
-                "as_of": state["as_of"],
-                "recency_days": state["recency_days"],
-                "plan": state["plan"].model_dump(),
-                "evidence": [e.model_dump() for e in state.get("evidence", [])],
-            },
-        )
-        for task in state["plan"].tasks
-    ]
+    context = publish_context(state["plan"], list(state.get("evidence", []) or []))
+    return [Send("worker", _worker_input(state, task, context)) for task in state["plan"].tasks]
 
 
 # -----------------------------
@@ -355,48 +740,83 @@ Code:
 """
 
 
-def worker_node(state: WorkerState) -> dict:  # ✅ Fix 2: parameter MUST be named "state"
+def _relevant_evidence(task: Task, evidence: List[EvidenceItem]) -> List[EvidenceItem]:
+    """
+    Top-k evidence for one section, ranked by BM25 over title + snippet against
+    the task's title, goal, bullets and tags. Env: BWA_EVIDENCE_TOP_K (default 8).
+    """
+    k = int(os.getenv("BWA_EVIDENCE_TOP_K", "8"))
+    if len(evidence) <= k:
+        return evidence
+    index = get_evidence_index([f"{e.title} {e.snippet or ''}" for e in evidence])
+    query = " ".join([task.title, task.goal, *task.bullets, *task.tags])
+    return [evidence[i] for i in index.top_k(query, k)]
+
+
+def _worker_messages(state: WorkerState) -> Tuple[Task, List[BaseMessage]]:
     payload = state                     # alias for readability inside the function
     task = Task(**payload["task"])
-    plan = Plan(**payload["plan"])
-    evidence = [EvidenceItem(**e) for e in payload.get("evidence", [])]
+    ctx = load_context(payload["context"])
+    plan, evidence = ctx.plan, list(ctx.evidence)
 
     bullets_text = "\n- " + "\n- ".join(task.bullets)
     evidence_text = "\n".join(
         f"- {e.title} | {e.url} | {e.published_at or 'date:unknown'}"
-        for e in evidence[:20]
+        for e in _relevant_evidence(task, evidence)
     )
 
-    # ✅ Fix 4: llm.invoke() returns AIMessage; .content is str | list.
-    #    Cast to str so .strip() is always valid.
-    raw_content = llm.invoke(
-        [
-            SystemMessage(content=WORKER_SYSTEM),
-            HumanMessage(
-                content=(
-                    f"Blog title: {plan.blog_title}\n"
-                    f"Audience: {plan.audience}\n"
-                    f"Tone: {plan.tone}\n"
-                    f"Blog kind: {plan.blog_kind}\n"
-                    f"Constraints: {plan.constraints}\n"
-                    f"Topic: {payload['topic']}\n"
-                    f"Mode: {payload.get('mode')}\n"
-                    f"As-of: {payload.get('as_of')} (recency_days={payload.get('recency_days')})\n\n"
-                    f"Section title: {task.title}\n"
-                    f"Goal: {task.goal}\n"
-                    f"Target words: {task.target_words}\n"
-                    f"Tags: {task.tags}\n"
-                    f"requires_research: {task.requires_research}\n"
-                    f"requires_citations: {task.requires_citations}\n"
-                    f"requires_code: {task.requires_code}\n"
-                    f"Bullets:{bullets_text}\n\n"
-                    f"Evidence (ONLY cite these URLs):\n{evidence_text}\n"
-                )
-            ),
-        ]
-    ).content
-    section_md = cast(str, raw_content).strip()  # ✅ Fix 4
+    return task, [
+        SystemMessage(content=WORKER_SYSTEM),
+        HumanMessage(
+            content=(
+                f"Blog title: {plan.blog_title}\n"
+                f"Audience: {plan.audience}\n"
+                f"Tone: {plan.tone}\n"
+                f"Blog kind: {plan.blog_kind}\n"
+                f"Constraints: {plan.constraints}\n"
+                f"Topic: {payload['topic']}\n"
+                f"Mode: {payload.get('mode')}\n"
+                f"As-of: {payload.get('as_of')} (recency_days={payload.get('recency_days')})\n\n"
+                f"Section title: {task.title}\n"
+                f"Goal: {task.goal}\n"
+                f"Target words: {task.target_words}\n"
+                f"Tags: {task.tags}\n"
+                f"requires_research: {task.requires_research}\n"
+                f"requires_citations: {task.requires_citations}\n"
+                f"requires_code: {task.requires_code}\n"
+                f"Bullets:{bullets_text}\n\n"
+                f"Evidence (ONLY cite these URLs):\n{evidence_text}\n"
+            )
+        ),
+    ]
+
+
+def _section_stream(task_id: int) -> Optional[TokenSink]:
+    """
+    Emits {"section_delta": {"task_id", "text", "restart"}} on LangGraph's "custom"
+    stream mode. Returns None outside a graph run (e.g. direct calls), and when
+    hedging is on (BWA_HEDGE_AFTER): two racing streams can't share one preview.
+    """
+    if llm_policy(hedge=True).hedge_after is not None:
+        return None
+    try:
+        writer = get_stream_writer()
+    except Exception:
+        return None
+    return lambda text, restart=False: writer(
+        {"section_delta": {"task_id": task_id, "text": text, "restart": restart}}
+    )
+
+
+def worker_node(state: WorkerState, config: RunnableConfig) -> dict:  # ✅ Fix 2: parameter MUST be named "state"
+    task, messages = _worker_messages(state)
+    section_md = _invoke_text(messages, config, on_token=_section_stream(task.id), hedge=True)
+    return {"sections": [(task.id, section_md)]}
+
 
+async def aworker_node(state: WorkerState, config: RunnableConfig) -> dict:
+    task, messages = _worker_messages(state)
+    section_md = await _ainvoke_text(messages, config, on_token=_section_stream(task.id), hedge=True)
     return {"sections": [(task.id, section_md)]}
 
 
@@ -404,12 +824,17 @@ def worker_node(state: WorkerState) -> dict:  # ✅ Fix 2: parameter MUST be nam
 # 8) ReducerWithImages subgraph
 #    merge_content -> decide_images -> generate_and_place_images
 # ============================================================
+def ordered_sections(plan: Plan, sections: List[tuple[int, str]]) -> List[tuple[int, str]]:
+    """One entry per task id (the latest), in plan task order; ids the plan lacks go last."""
+    order = {t.id: i for i, t in enumerate(plan.tasks)}
+    return sorted(merge_sections([], sections), key=lambda s: (order.get(s[0], len(order)), s[0]))
+
+
 def merge_content(state: State) -> dict:
     plan = state["plan"]
     if plan is None:
         raise ValueError("merge_content called without plan.")
-    ordered_sections = [md for _, md in sorted(state["sections"], key=lambda x: x[0])]
-    body = "\n\n".join(ordered_sections).strip()
+    body = "\n\n".join(md for _, md in ordered_sections(plan, state["sections"])).strip()
     merged_md = f"# {plan.blog_title}\n\n{body}\n"
     return {"merged_md": merged_md}
 
@@ -427,48 +852,194 @@ Return strictly GlobalImagePlan.
 """
 
 
-def decide_images(state: State) -> dict:
-    # ✅ Fix 1: cast to GlobalImagePlan
-    planner = llm.with_structured_output(GlobalImagePlan)
-    merged_md = state["merged_md"]
+DECIDE_IMAGES_ANCHOR_SYSTEM = """You are an expert technical editor.
+Decide if images/diagrams are needed for THIS blog.
+
+Rules:
+- Max 3 images total.
+- Each image must materially improve understanding (diagram/flow/table-like visual).
+- Do NOT rewrite or repeat the blog text. Anchor each image instead:
+  section = number from the outline, paragraph = insert after that paragraph (0 = under the heading).
+- If no images needed: images=[].
+- Avoid decorative images; prefer technical diagrams with short labels.
+Return strictly ImagePlacementPlan.
+"""
+
+
+def _md_blocks(lines: List[str]) -> List[Tuple[int, int]]:
+    """[start, end) line spans of blank-line separated blocks; fenced code stays one block."""
+    spans: List[Tuple[int, int]] = []
+    i, n = 0, len(lines)
+    while i < n:
+        if not lines[i].strip():
+            i += 1
+            continue
+        start, in_fence = i, False
+        while i < n and (in_fence or lines[i].strip()):
+            if lines[i].strip().startswith("```"):
+                in_fence = not in_fence
+            i += 1
+        spans.append((start, i))
+    return spans
+
+
+def _md_sections(md: str) -> Tuple[List[str], List[Tuple[str, List[int]]]]:
+    """
+    Returns (lines, sections). Each section is (heading, [end line of block 0, 1, ...])
+    where block 0 is the "## " heading itself. Section 0 is the preamble (title).
+    """
+    lines = md.splitlines()
+    sections: List[Tuple[str, List[int]]] = [("", [0])]
+    for start, end in _md_blocks(lines):
+        if lines[start].startswith("## "):
+            sections.append((lines[start][3:].strip(), [start + 1]))
+            if end > start + 1:                 # text right under the heading, no blank line
+                sections[-1][1].append(end)
+        else:
+            sections[-1][1].append(end)
+    return lines, sections
+
+
+def md_outline(md: str) -> str:
+    _, sections = _md_sections(md)
+    return "\n".join(
+        f"[{i}] ## {heading} ({len(ends) - 1} paragraphs)"
+        for i, (heading, ends) in enumerate(sections) if i > 0
+    )
+
+
+def splice_placeholders(md: str, anchors: List[Tuple[ImageAnchor, str]]) -> str:
+    """
+    Insert each placeholder as its own paragraph at its anchor.
+    Out-of-range paragraphs clamp to the end of the section; unknown sections
+    go to the end of the document. The rest of the text is left untouched.
+    """
+    lines, sections = _md_sections(md)
+    inserts: Dict[int, List[str]] = {}
+    for anchor, placeholder in anchors:
+        if 1 <= anchor.section < len(sections):
+            ends = sections[anchor.section][1]
+            at = ends[min(max(anchor.paragraph, 0), len(ends) - 1)]
+        else:
+            at = len(lines)
+        inserts.setdefault(at, []).append(placeholder)
+
+    out: List[str] = []
+    for i in range(len(lines) + 1):
+        for placeholder in inserts.get(i, []):
+            # anchors are block ends: usually a blank separator or EOF, but a heading
+            # may run straight into its first paragraph
+            out.extend(["", placeholder, ""] if i < len(lines) and lines[i].strip() else ["", placeholder])
+        if i < len(lines):
+            out.append(lines[i])
+    return "\n".join(out) + ("\n" if md.endswith("\n") else "")
+
+
+_PLACEHOLDER_LINE_RE = re.compile(r"\[\[IMAGE_\d+\]\]")
+
+
+def placeholder_anchors(md: str) -> List[Tuple[ImageAnchor, str]]:
+    """
+    Inverse of splice_placeholders: the anchor of every [[IMAGE_n]] line in `md`,
+    counted without the placeholders themselves, so they can be spliced into a
+    re-merged post at the same section / paragraph.
+    """
+    lines = md.splitlines()
+    anchors: List[Tuple[ImageAnchor, str]] = []
+    section, paragraph = 0, 0
+    for start, end in _md_blocks(lines):
+        block = [ln.strip() for ln in lines[start:end]]
+        body = [ln for ln in block if not _PLACEHOLDER_LINE_RE.fullmatch(ln)]
+        if body and body[0].startswith("## "):
+            section, paragraph = section + 1, (1 if len(body) > 1 else 0)
+        elif body:
+            paragraph += 1
+        anchors.extend((ImageAnchor(section=section, paragraph=paragraph), ln)
+                       for ln in block if _PLACEHOLDER_LINE_RE.fullmatch(ln))
+    return anchors
+
+
+def _image_placement_mode() -> str:
+    """Env: BWA_IMAGE_PLACEMENT = anchor (default) | inline (model returns the full markdown)."""
+    return "inline" if os.getenv("BWA_IMAGE_PLACEMENT", "anchor").strip().lower() == "inline" else "anchor"
+
+
+def _decide_images_messages(state: State) -> List[BaseMessage]:
     plan = state["plan"]
     assert plan is not None
-
-    image_plan = cast(GlobalImagePlan, planner.invoke(
-        [
+    if _image_placement_mode() == "inline":
+        return [
             SystemMessage(content=DECIDE_IMAGES_SYSTEM),
             HumanMessage(
                 content=(
                     f"Blog kind: {plan.blog_kind}\n"
                     f"Topic: {state['topic']}\n\n"
                     "Insert placeholders + propose image prompts.\n\n"
-                    f"{merged_md}"
+                    f"{state['merged_md']}"
                 )
             ),
         ]
-    ))
+    return [
+        SystemMessage(content=DECIDE_IMAGES_ANCHOR_SYSTEM),
+        HumanMessage(
+            content=(
+                f"Blog kind: {plan.blog_kind}\n"
+                f"Topic: {state['topic']}\n\n"
+                f"Outline:\n{md_outline(state['merged_md'])}\n\n"
+                "Propose anchored image prompts for this blog:\n\n"
+                f"{state['merged_md']}"
+            )
+        ),
+    ]
+
+
+def _decide_images_schema() -> type:
+    return GlobalImagePlan if _image_placement_mode() == "inline" else ImagePlacementPlan
 
+
+def _decide_images_update(state: State, image_plan: BaseModel) -> dict:
+    if isinstance(image_plan, GlobalImagePlan):
+        return {
+            "md_with_placeholders": image_plan.md_with_placeholders,
+            "image_specs": [img.model_dump() for img in image_plan.images],
+        }
+
+    assert isinstance(image_plan, ImagePlacementPlan)
+    specs: List[dict] = []
+    anchors: List[Tuple[ImageAnchor, str]] = []
+    for n, img in enumerate(image_plan.images[:3], start=1):
+        placeholder = f"[[IMAGE_{n}]]"
+        anchors.append((img.anchor, placeholder))
+        specs.append(ImageSpec(placeholder=placeholder,
+                               **img.model_dump(exclude={"anchor"})).model_dump())
     return {
-        "md_with_placeholders": image_plan.md_with_placeholders,   # ✅ Fix 1
-        "image_specs": [img.model_dump() for img in image_plan.images],  # ✅ Fix 1
+        "md_with_placeholders": splice_placeholders(state["merged_md"], anchors),
+        "image_specs": specs,
     }
 
 
+def decide_images(state: State, config: RunnableConfig) -> dict:
+    return _decide_images_update(
+        state, _invoke_structured(_decide_images_schema(), _decide_images_messages(state), config)
+    )
+
+
+async def adecide_images(state: State, config: RunnableConfig) -> dict:
+    return _decide_images_update(
+        state, await _ainvoke_structured(_decide_images_schema(), _decide_images_messages(state), config)
+    )
+
+
 def _gemini_generate_image_bytes(prompt: str) -> bytes:
     """
     Returns raw image bytes generated by Gemini.
     Requires: pip install google-genai
     Env var: GOOGLE_API_KEY
     """
-    from google import genai
     from google.genai import types
     from google.genai.types import HarmCategory  # ✅ Fix 5: import the enum
 
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        raise RuntimeError("GOOGLE_API_KEY is not set.")
-
-    client = genai.Client(api_key=api_key)
+    client = get_genai_client()     # shared across calls; raises if GOOGLE_API_KEY is missing
 
     resp = client.models.generate_content(
         model="gemini-2.5-flash-image",   # use a valid image-capable model name
@@ -513,6 +1084,25 @@ def _safe_slug(title: str) -> str:
     return s or "blog"
 
 
+def _images_dir() -> Path:
+    images_dir = Path(os.getenv("BWA_IMAGES_DIR", "images"))
+    images_dir.mkdir(exist_ok=True)
+    return images_dir
+
+
+def _save_post(plan: Plan, md: str, state: Optional[Dict[str, Any]] = None) -> None:
+    path = Path(f"{_safe_slug(plan.blog_title)}.md")
+    path.write_text(md, encoding="utf-8")
+    state = state or {}
+    urls = [getattr(e, "url", None) or (e.get("url") if isinstance(e, dict) else None)
+            for e in state.get("evidence") or []]
+    try:
+        get_library().record(path, md, topic=state.get("topic") or "", as_of=state.get("as_of") or "",
+                             urls=[u for u in urls if u])
+    except sqlite3.Error:
+        pass                            # the file is saved; Library.sync() indexes it next start
+
+
 def generate_and_place_images(state: State) -> dict:
     plan = state["plan"]
     assert plan is not None
@@ -521,45 +1111,84 @@ def generate_and_place_images(state: State) -> dict:
     image_specs = state.get("image_specs", []) or []
 
     if not image_specs:
-        filename = f"{_safe_slug(plan.blog_title)}.md"
-        Path(filename).write_text(md, encoding="utf-8")
+        _save_post(plan, md, state)
         return {"final": md}
 
-    images_dir = Path(os.getenv("BWA_IMAGES_DIR", "images"))
-    images_dir.mkdir(exist_ok=True)
+    images_dir = _images_dir()
+
+    # identical prompt/size/quality → reuse the stored image, whatever the filename
+    store = get_image_store(images_dir)
+    namespace = "" if provider("image") == "live" else "fake"
+    keys = [ImageStore.key(spec, namespace) for spec in image_specs]
+    pending: Dict[str, dict] = {}
+    for key, spec in zip(keys, image_specs):
+        if key not in pending and store.get(key) is None:
+            pending[key] = spec
+
+    record_count("images_reused", len(set(keys)) - len(pending))
+    record_count("images_generated", len(pending))
+    failures: Dict[str, BaseException] = {}
+    for key, result in zip(pending, generate_images(list(pending.values()), image_backend(_gemini_generate_image_bytes))):
+        if result.ok:
+            store.put(key, cast(bytes, result.data))
+        else:
+            failures[key] = result.error or RuntimeError("No image bytes returned.")
+    record_count("image_errors", len(failures))
+
+    for key in dict.fromkeys(keys):
+        blob = store.get(key) if key not in failures else None
+        if blob is not None:
+            try:
+                make_variants(blob)     # web / thumb / print renditions for the consumers
+            except Exception:
+                pass                    # originals still work everywhere
 
-    for spec in image_specs:
-        placeholder = spec["placeholder"]
-        filename = spec["filename"]
-        out_path = images_dir / filename
+    results: List[ImageResult] = []
+    for key, spec in zip(keys, image_specs):
+        if key in failures:
+            # the spec keeps its failure so a later re-render shows the same note
+            results.append(ImageResult({**spec, "error": str(failures[key])}, error=failures[key]))
+        else:
+            results.append(ImageResult({**spec, "filename": store.place(key, spec["filename"])}))
+    store.evict(keep=keys)
 
-        if not out_path.exists():
-            try:
-                img_bytes = _gemini_generate_image_bytes(spec["prompt"])
-                out_path.write_bytes(img_bytes)
-            except Exception as e:
-                prompt_block = (
-                    f"> **[IMAGE GENERATION FAILED]** {spec.get('caption', '')}\n>\n"
-                    f"> **Alt:** {spec.get('alt', '')}\n>\n"
-                    f"> **Prompt:** {spec.get('prompt', '')}\n>\n"
-                    f"> **Error:** {e}\n"
-                )
-                md = md.replace(placeholder, prompt_block)
-                continue
+    md = place_images(md, results, images_dir)
+
+    _save_post(plan, md, state)
+    return {"final": md, "image_specs": [r.spec for r in results]}
+
+
+def _node_span(name: str, state: Any, config: Optional[RunnableConfig]):
+    run_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    task = state.get("task") if isinstance(state, dict) else None
+    return span(name, run_id, task_id=task.get("id") if isinstance(task, dict) else None)
+
+
+def _node(func: Callable, afunc: Optional[Callable] = None) -> RunnableLambda:
+    """
+    One graph node usable from both app.invoke/stream and app.ainvoke/astream
+    (sync-only nodes run in an executor under astream), traced as a bwa_trace
+    span named after the node and keyed by the run's thread_id.
+    """
+    name = func.__name__.removesuffix("_node")
+    takes_config = "config" in inspect.signature(func).parameters
+
+    def run(state: Any, config: RunnableConfig) -> Any:
+        with _node_span(name, state, config):
+            return func(state, config) if takes_config else func(state)
 
-        img_md = f"![{spec['alt']}]({images_dir}/{filename})\n*{spec['caption']}*"
-        md = md.replace(placeholder, img_md)
+    async def arun(state: Any, config: RunnableConfig) -> Any:
+        with _node_span(name, state, config):
+            return await cast(Callable, afunc)(state, config)
 
-    filename = f"{_safe_slug(plan.blog_title)}.md"
-    Path(filename).write_text(md, encoding="utf-8")
-    return {"final": md}
+    return RunnableLambda(run, afunc=arun if afunc is not None else None, name=func.__name__)
 
 
 # build reducer subgraph
 reducer_graph = StateGraph(State)
-reducer_graph.add_node("merge_content", merge_content)
-reducer_graph.add_node("decide_images", decide_images)
-reducer_graph.add_node("generate_and_place_images", generate_and_place_images)
+reducer_graph.add_node("merge_content", _node(merge_content))
+reducer_graph.add_node("decide_images", _node(decide_images, adecide_images))
+reducer_graph.add_node("generate_and_place_images", _node(generate_and_place_images))
 reducer_graph.add_edge(START, "merge_content")
 reducer_graph.add_edge("merge_content", "decide_images")
 reducer_graph.add_edge("decide_images", "generate_and_place_images")
@@ -571,10 +1200,10 @@ reducer_subgraph = reducer_graph.compile()
 # 9) Build main graph
 # -----------------------------
 g = StateGraph(State)
-g.add_node("router", router_node)
-g.add_node("research", research_node)
-g.add_node("orchestrator", orchestrator_node)
-g.add_node("worker", worker_node)  # ✅ Fix 2: worker_node now accepts "state" param → no type error
+g.add_node("router", _node(router_node, arouter_node))
+g.add_node("research", _node(research_node, aresearch_node))
+g.add_node("orchestrator", _node(orchestrator_node, aorchestrator_node))
+g.add_node("worker", _node(worker_node, aworker_node))  # ✅ Fix 2: worker_node now accepts "state" param → no type error
 g.add_node("reducer", reducer_subgraph)
 
 g.add_edge(START, "router")
@@ -585,4 +1214,285 @@ g.add_conditional_edges("orchestrator", fanout, ["worker"])
 g.add_edge("worker", "reducer")
 g.add_edge("reducer", END)
 
-app = g.compile()
\ No newline at end of file
+
+# pydantic models stored in checkpointed State; everything else in it is plain data
+_CHECKPOINT_TYPES = (Plan, Task, EvidenceItem)
+
+
+def _checkpoint_serde():
+    """
+    LangGraph's msgpack serializer with an explicit allowlist for our State models.
+    Without one, unregistered types load with a deprecation warning today and are
+    blocked by later langgraph versions, which would break resume.
+    """
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    return JsonPlusSerializer(allowed_msgpack_modules=[(t.__module__, t.__name__) for t in _CHECKPOINT_TYPES])
+
+
+def _make_checkpointer():
+    """
+    Persist every superstep so a failed or interrupted run can resume from its last
+    completed node. LangGraph also stores the writes of tasks that finished inside a
+    failed superstep, so completed worker sections are kept and only the failed
+    tasks run again. The reducer subgraph inherits this checkpointer.
+
+    Env: BWA_CHECKPOINTER = sqlite (default, <cache dir>/checkpoints.sqlite3) | memory | off.
+    """
+    backend = os.getenv("BWA_CHECKPOINTER", "sqlite").strip().lower()
+    if backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError:
+            backend = "memory"      # langgraph-checkpoint-sqlite not installed
+        else:
+            class _ThreadedSqliteSaver(SqliteSaver):
+                # SqliteSaver is sync-only; run its calls in a thread for app.astream
+                async def aget_tuple(self, config):
+                    return await asyncio.to_thread(self.get_tuple, config)
+
+                async def alist(self, config, **kwargs):
+                    for item in await asyncio.to_thread(lambda: list(self.list(config, **kwargs))):
+                        yield item
+
+                async def aput(self, config, checkpoint, metadata, new_versions):
+                    return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+                async def aput_writes(self, config, writes, task_id, *args, **kwargs):
+                    return await asyncio.to_thread(self.put_writes, config, writes, task_id, *args, **kwargs)
+
+            conn = sqlite3.connect(str(cache_dir() / "checkpoints.sqlite3"), check_same_thread=False)
+            return _ThreadedSqliteSaver(conn, serde=_checkpoint_serde())
+    if backend == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver(serde=_checkpoint_serde())
+    return None
+
+
+checkpointer = _make_checkpointer()
+app = g.compile(checkpointer=checkpointer)
+
+
+# -----------------------------
+# 10) Single-pass streaming executor
+# -----------------------------
+def _state_reducers() -> Dict[str, Callable[[Any, Any], Any]]:
+    """Collect the reducers declared on State via Annotated[..., reducer]."""
+    reducers: Dict[str, Callable[[Any, Any], Any]] = {}
+    for key, hint in get_type_hints(State, include_extras=True).items():
+        for meta in getattr(hint, "__metadata__", ()):
+            if callable(meta):
+                reducers[key] = meta
+    return reducers
+
+
+_STATE_REDUCERS = _state_reducers()
+
+
+def apply_update(state: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fold one node update into `state` the same way LangGraph does:
+    reducer keys (e.g. `sections` with merge_sections) accumulate, the rest overwrite.
+    """
+    for key, value in update.items():
+        reducer = _STATE_REDUCERS.get(key)
+        if reducer is not None and state.get(key) is not None:
+            state[key] = reducer(state[key], value)
+        else:
+            state[key] = value
+    return state
+
+
+@dataclass
+class RunOutcome:
+    state: Dict[str, Any]
+    last_node: Optional[str] = None
+    error: Optional[BaseException] = None
+    thread_id: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def fold(self, chunk: Any) -> bool:
+        """Apply one stream_mode="updates" chunk; returns False for non-update chunks."""
+        if not isinstance(chunk, dict):
+            return False
+        for node, update in chunk.items():
+            self.last_node = node
+            if isinstance(update, dict):
+                apply_update(self.state, update)
+        return True
+
+
+def new_run_inputs(topic: str, as_of: str, recency_days: int = 7) -> Dict[str, Any]:
+    """Initial State for one run; every key the graph reads is present."""
+    return {
+        "topic": topic.strip(),
+        "mode": "",
+        "needs_research": False,
+        "queries": [],
+        "evidence": [],
+        "plan": None,
+        "as_of": as_of,
+        "recency_days": recency_days,
+        "sections": [],
+        "merged_md": "",
+        "md_with_placeholders": "",
+        "image_specs": [],
+        "final": "",
+    }
+
+
+def run_config(config: Optional[dict] = None) -> dict:
+    """
+    Fill per-run defaults. `max_concurrency` caps how many graph tasks (i.e. the
+    worker fanout) run at once within a single run. Env: BWA_MAX_CONCURRENCY (default 4).
+    """
+    cfg = dict(config or {})
+    cfg.setdefault("max_concurrency", int(os.getenv("BWA_MAX_CONCURRENCY", "4")))
+    # the checkpointer keys every run by thread_id; pass the same id again to resume
+    configurable = dict(cfg.get("configurable") or {})
+    configurable.setdefault("thread_id", uuid.uuid4().hex)
+    cfg["configurable"] = configurable
+    return cfg
+
+
+def _start_state(graph_app, inputs: Optional[Dict[str, Any]], cfg: dict) -> Dict[str, Any]:
+    """Fresh runs start from `inputs`; resumed runs (inputs=None) from the last checkpoint."""
+    if inputs is not None:
+        return dict(inputs)
+    if getattr(graph_app, "checkpointer", None) is None:
+        raise ValueError("Resuming a run needs a checkpointer (BWA_CHECKPOINTER is off).")
+    state = dict(graph_app.get_state(cfg).values)
+    if state.get("plan") is not None:   # pending workers load their snapshot by ref
+        publish_context(Plan.model_validate(state["plan"]),
+                        [EvidenceItem.model_validate(e) for e in state.get("evidence") or []])
+    return state
+
+
+def _finish(graph_app, outcome: RunOutcome) -> None:
+    """A completed run has nothing left to resume; drop its checkpoints."""
+    delete_thread = getattr(getattr(graph_app, "checkpointer", None), "delete_thread", None)
+    if outcome.ok and outcome.thread_id and delete_thread is not None:
+        try:
+            delete_thread(outcome.thread_id)
+        except Exception:
+            pass
+
+
+STREAM_MODES = ["updates", "custom"]
+
+
+def stream_run(graph_app, inputs: Optional[Dict[str, Any]], config: Optional[dict] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Execute the graph exactly once.
+
+    Pass inputs=None with the `configurable.thread_id` of a failed run to resume it
+    from its last checkpoint (see RunOutcome.thread_id).
+
+    Yields ("updates", {node: update}) for every node as it finishes and
+    ("custom", payload) for in-node events such as worker section_delta tokens,
+    then a single ("final", RunOutcome) whose state is rebuilt from the updates.
+    Failures are captured on the outcome instead of re-running the graph.
+    """
+    cfg = run_config(config)
+    outcome = RunOutcome(state={}, thread_id=cfg["configurable"]["thread_id"])
+    try:
+        outcome.state = _start_state(graph_app, inputs, cfg)
+        for mode, chunk in graph_app.stream(inputs, config=cfg, stream_mode=STREAM_MODES):
+            if mode == "custom":
+                yield ("custom", chunk)
+            elif outcome.fold(chunk):
+                yield ("updates", chunk)
+    except Exception as exc:
+        outcome.error = exc
+    _finish(graph_app, outcome)
+    yield ("final", outcome)
+
+
+async def astream_run(graph_app, inputs: Optional[Dict[str, Any]], config: Optional[dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """Async twin of stream_run, driven by app.astream and the async node functions."""
+    cfg = run_config(config)
+    outcome = RunOutcome(state={}, thread_id=cfg["configurable"]["thread_id"])
+    try:
+        outcome.state = await asyncio.to_thread(_start_state, graph_app, inputs, cfg)
+        async for mode, chunk in graph_app.astream(inputs, config=cfg, stream_mode=STREAM_MODES):
+            if mode == "custom":
+                yield ("custom", chunk)
+            elif outcome.fold(chunk):
+                yield ("updates", chunk)
+    except Exception as exc:
+        outcome.error = exc
+    await asyncio.to_thread(_finish, graph_app, outcome)
+    yield ("final", outcome)
+
+
+# -----------------------------
+# 11) Single-section regeneration
+# -----------------------------
+def _section_worker_input(state: Dict[str, Any], task_id: int) -> WorkerState:
+    if state.get("plan") is None:
+        raise ValueError("Regenerating a section needs the run's plan; posts loaded from .md files have none.")
+    plan = Plan.model_validate(state["plan"])
+    task = next((t for t in plan.tasks if t.id == task_id), None)
+    if task is None:
+        raise ValueError(f"The plan has no task with id {task_id}.")
+    evidence = [EvidenceItem.model_validate(e) for e in state.get("evidence") or []]
+    return _worker_input(cast(State, state), task, publish_context(plan, evidence))
+
+
+def _regenerate_config(config: Optional[RunnableConfig]) -> RunnableConfig:
+    """The point is a different draft: skip the cached response unless told otherwise."""
+    cfg = dict(config or {})
+    cfg["configurable"] = {"bypass_llm_cache": True, **(cfg.get("configurable") or {})}
+    return cast(RunnableConfig, cfg)
+
+
+def _rendered_image(spec: dict, images_dir: Path) -> ImageResult:
+    if spec.get("error"):               # failed in the original run: keep that failure note
+        return ImageResult(spec, error=RuntimeError(spec["error"]))
+    if (images_dir / spec["filename"]).exists():
+        return ImageResult(spec)
+    return ImageResult(spec, error=FileNotFoundError(f"{images_dir / spec['filename']} no longer exists"))
+
+
+def _rendered_images(md: str, image_specs: List[dict]) -> str:
+    """Re-render placeholders from the already generated files; nothing is regenerated."""
+    images_dir = _images_dir()
+    results = [_rendered_image(spec, images_dir)
+               for spec in image_specs if spec.get("placeholder") and spec.get("filename")]
+    return place_images(md, results, images_dir)
+
+
+def _with_section(state: Dict[str, Any], task_id: int, section_md: str) -> Dict[str, Any]:
+    plan = Plan.model_validate(state["plan"])
+    # states saved before merge_sections can still hold every section twice
+    sections = ordered_sections(plan, merge_sections(state.get("sections"), [(task_id, section_md)]))
+    new_state = {**state, "plan": plan, "sections": sections}
+    new_state.update(merge_content(cast(State, new_state)))
+
+    # image paragraphs keep their section / paragraph anchors; inside the rewritten
+    # section they clamp to its end if it now has fewer paragraphs
+    anchors = placeholder_anchors(state.get("md_with_placeholders") or "")
+    md = splice_placeholders(new_state["merged_md"], anchors) if anchors else new_state["merged_md"]
+    new_state["md_with_placeholders"] = md
+    new_state["final"] = _rendered_images(md, list(state.get("image_specs") or []))
+    _save_post(plan, new_state["final"], state)
+    return new_state
+
+
+def regenerate_section(state: Dict[str, Any], task_id: int,
+                       config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """
+    Rewrite one section of a finished run (one worker LLM call) and return the new state.
+    Reuses the run's plan and evidence, re-merges, keeps existing image placements
+    and overwrites the saved .md file.
+    """
+    section_md = worker_node(_section_worker_input(state, task_id), _regenerate_config(config))["sections"][0][1]
+    return _with_section(state, task_id, section_md)
+
+
+async def aregenerate_section(state: Dict[str, Any], task_id: int,
+                              config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    update = await aworker_node(_section_worker_input(state, task_id), _regenerate_config(config))
+    return _with_section(state, task_id, update["sections"][0][1])
@@ -0,0 +1,281 @@
+"""
+bwa_batch.py
+────────────
+Headless batch generation for BlogForge AI.
+
+    python bwa_batch.py topics.txt --out runs --concurrency 2
+    cat topics.jsonl | python bwa_batch.py - --as-of 2025-01-15
+
+Input is one topic per line, either plain text or JSON
+({"topic": "...", "as_of": "YYYY-MM-DD"}); blank lines and "#" comments are
+skipped. Each run gets its own directory under --out holding the post, the
+images it references and state.json (plan, evidence, image specs).
+Every finished run appends one line to <out>/summary.jsonl.
+
+Each invocation is a new batch with its own id (recorded in <out>/batch.json),
+and every run's checkpoint thread and trace are keyed by batch id + topic, so
+repeated batches over the same topics never share them. Add --resume to
+continue the last batch in --out instead: topics with an "ok" summary line
+for that batch are skipped, and a topic whose run was interrupted continues
+from its last checkpoint.
+
+Functions:
+    read_topics(lines, default_as_of)  →  List[BatchItem]
+    run_batch(items, out_dir, concurrency, resume)  →  List[dict]  (summary records)
+    main(argv)                         →  int  (exit code)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bwa_backend import app, new_run_inputs, stream_run
+from bwa_trace import trace_path
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  TOPIC QUEUE
+# ══════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class BatchItem:
+    topic: str
+    as_of: str
+
+    @property
+    def key(self) -> str:
+        """Stable id of (topic, as_of): names the run directory, and the checkpoint thread within a batch."""
+        return hashlib.sha256(f"{self.topic}\x1f{self.as_of}".encode("utf-8")).hexdigest()[:16]
+
+    def thread_id(self, batch_id: str) -> str:
+        return f"batch-{batch_id}-{self.key}"
+
+    @property
+    def dirname(self) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "-", self.topic.lower()).strip("-")[:48] or "topic"
+        return f"{slug}-{self.key[:8]}"
+
+
+def read_topics(lines: Iterable[str], default_as_of: str) -> List[BatchItem]:
+    items: List[BatchItem] = []
+    seen: Set[str] = set()
+    for n, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {n}: invalid JSON ({e})") from e
+            topic, as_of = str(obj.get("topic") or "").strip(), str(obj.get("as_of") or default_as_of)
+        else:
+            topic, as_of = line, default_as_of
+        if not topic:
+            raise ValueError(f"line {n}: missing topic")
+        date.fromisoformat(as_of)       # fail early on a bad date, not mid-batch
+        item = BatchItem(topic, as_of)
+        if item.key not in seen:        # the same topic twice would share a checkpoint thread
+            seen.add(item.key)
+            items.append(item)
+    return items
+
+
+def new_batch_id() -> str:
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def last_batch_id(out_dir: Path) -> Optional[str]:
+    """Id of the most recent batch started in out_dir, if any."""
+    try:
+        return json.loads((out_dir / "batch.json").read_text(encoding="utf-8")).get("batch_id")
+    except (OSError, ValueError):
+        return None
+
+
+def completed_keys(summary_path: Path, batch_id: str) -> Set[str]:
+    """Keys of every run of `batch_id` that already has an "ok" line in the summary."""
+    done: Set[str] = set()
+    if not summary_path.exists():
+        return done
+    for line in summary_path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue                    # torn last line from a crash
+        if record.get("status") == "ok" and record.get("batch") == batch_id:
+            done.add(record.get("key"))
+    return done
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  ONE RUN
+# ══════════════════════════════════════════════════════════════
+
+_MD_IMG_RE = re.compile(r"!\[[^\]]*\]\(([^)\s]+)\)")
+
+
+def _jsonable(value: Any) -> Any:
+    return value.model_dump() if hasattr(value, "model_dump") else str(value)
+
+
+def _write_outputs(run_dir: Path, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Post + referenced images (same relative paths) + state.json into run_dir."""
+    run_dir.mkdir(parents=True, exist_ok=True)
+    final_md = state.get("final") or ""
+    plan = state.get("plan")
+    title = getattr(plan, "blog_title", None) or "post"
+    slug = re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_") or "post"
+    (run_dir / f"{slug}.md").write_text(final_md, encoding="utf-8")
+
+    copied, missing = 0, []
+    for src in dict.fromkeys(_MD_IMG_RE.findall(final_md)):
+        path = Path(src)
+        if path.is_absolute() or ".." in path.parts:
+            continue
+        if not path.is_file():
+            missing.append(src)
+            continue
+        dest = run_dir / path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, dest)
+        copied += 1
+
+    (run_dir / "state.json").write_text(json.dumps({
+        "topic": state.get("topic"),
+        "as_of": state.get("as_of"),
+        "mode": state.get("mode"),
+        "plan": plan,
+        "evidence": state.get("evidence") or [],
+        "image_specs": state.get("image_specs") or [],
+    }, default=_jsonable, ensure_ascii=False, indent=2), encoding="utf-8")
+    return {"post": f"{slug}.md", "words": len(re.findall(r"\b\w+\b", final_md)),
+            "sections": len(state.get("sections") or []), "images": copied, "missing_images": missing}
+
+
+def _resumable(thread_id: str) -> bool:
+    if getattr(app, "checkpointer", None) is None:
+        return False
+    snapshot = app.get_state({"configurable": {"thread_id": thread_id}})
+    return bool(snapshot.next)
+
+
+def run_item(item: BatchItem, out_dir: Path, batch_id: str, bypass_cache: bool = False) -> Dict[str, Any]:
+    """Run one topic to completion and return its summary record (never raises)."""
+    started = time.monotonic()
+    thread_id = item.thread_id(batch_id)
+    record: Dict[str, Any] = {
+        "batch": batch_id, "key": item.key, "topic": item.topic, "as_of": item.as_of,
+        "run_dir": str(out_dir / item.dirname),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    config = {"configurable": {"thread_id": thread_id, "bypass_llm_cache": bypass_cache}}
+    node_done: Dict[str, float] = {}
+    try:
+        resumed = _resumable(thread_id)
+        inputs = None if resumed else new_run_inputs(item.topic, item.as_of)
+        record["resumed"] = resumed
+        outcome = None
+        for kind, payload in stream_run(app, inputs, config=config):
+            if kind == "updates":
+                for node in payload:
+                    node_done[node] = round(time.monotonic() - started, 3)
+            elif kind == "final":
+                outcome = payload
+        assert outcome is not None
+        if outcome.ok:
+            record.update(status="ok", **_write_outputs(out_dir / item.dirname, outcome.state))
+        else:
+            record.update(status="error", failed_after=outcome.last_node, error=repr(outcome.error))
+    except Exception as e:                  # output writing / checkpoint lookup
+        record.update(status="error", error=repr(e))
+    record["seconds"] = round(time.monotonic() - started, 3)
+    record["node_finished_s"] = node_done   # seconds from start until each node (last) finished
+    record["trace"] = str(trace_path(thread_id))   # per-node spans (bwa_trace)
+    return record
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  BATCH
+# ══════════════════════════════════════════════════════════════
+
+def run_batch(items: List[BatchItem], out_dir: Path, concurrency: int = 2,
+              bypass_cache: bool = False, log=print, resume: bool = False) -> List[Dict[str, Any]]:
+    """
+    Run every item as a new batch, `concurrency` at a time; with `resume`, continue
+    the last batch in out_dir instead, skipping the items it completed.
+    Records are appended (and flushed) as runs finish, so a crash loses at most
+    the runs in flight.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = out_dir / "summary.jsonl"
+    batch_id = last_batch_id(out_dir) if resume else None
+    if batch_id is None:
+        if resume:
+            log(f"no batch to resume in {out_dir}; starting a new one")
+        batch_id = new_batch_id()
+        (out_dir / "batch.json").write_text(json.dumps({
+            "batch_id": batch_id,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }), encoding="utf-8")
+    done = completed_keys(summary_path, batch_id)
+    todo = [it for it in items if it.key not in done]
+    log(f"batch {batch_id}: {len(items)} topics, {len(items) - len(todo)} already done, {len(todo)} to run")
+
+    records: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def job(item: BatchItem) -> None:
+        record = run_item(item, out_dir, batch_id, bypass_cache=bypass_cache)
+        with lock:
+            with summary_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            records.append(record)
+            log(f"[{len(records)}/{len(todo)}] {record['status']:5} {record['seconds']:8.1f}s  {item.topic}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="bwa-batch") as pool:
+        for fut in [pool.submit(job, it) for it in todo]:
+            fut.result()
+    return records
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate blog posts for a list of topics without the UI.")
+    parser.add_argument("topics", help="topics file (text or JSONL), or - for stdin")
+    parser.add_argument("--out", default="runs", help="output directory (default: runs)")
+    parser.add_argument("--concurrency", type=int, default=2, help="runs in parallel (default: 2)")
+    parser.add_argument("--as-of", default=date.today().isoformat(),
+                        help="as_of for topics that don't set one (default: today)")
+    parser.add_argument("--fresh", action="store_true", help="ignore cached LLM responses")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the last batch in --out: skip its finished topics, resume interrupted runs")
+    args = parser.parse_args(argv)
+
+    if args.topics == "-":
+        items = read_topics(sys.stdin, args.as_of)
+    else:
+        items = read_topics(Path(args.topics).read_text(encoding="utf-8").splitlines(), args.as_of)
+
+    log = lambda msg: print(msg, file=sys.stderr, flush=True)
+    records = run_batch(items, Path(args.out), args.concurrency, bypass_cache=args.fresh, log=log,
+                        resume=args.resume)
+    failed = sum(1 for r in records if r["status"] != "ok")
+    log(f"done: {len(records) - failed} ok, {failed} failed (summary: {Path(args.out) / 'summary.jsonl'})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+bwa_cache.py
+────────────
+Response and search-result caches for BlogForge AI.
+
+Classes:
+    SqliteLRU       size-bounded key/value store with LRU eviction + hit/miss counters
+    MemoryLRU       in-process equivalent of SqliteLRU
+    SearchCache     raw Tavily results keyed by normalized query + max_results
+    ResponseCache   LLM responses keyed by hash(model, messages, output schema)
+
+Functions:
+    search_ttl(recency_days)  →  int   (max age in seconds for a run's recency window)
+    get_search_cache()        →  SearchCache    (process-wide shared instance)
+    get_response_cache()      →  ResponseCache | None  (None when disabled)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def cache_dir() -> Path:
+    d = Path(os.getenv("BWA_CACHE_DIR", ".bwa_cache"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  SQLITE LRU STORE
+# ══════════════════════════════════════════════════════════════
+
+class SqliteLRU:
+    """
+    A single-table key/value store. Every read refreshes `last_used`; once the
+    stored payload exceeds `max_bytes`, least-recently-used rows are evicted.
+    Safe to share between threads (one connection guarded by a lock).
+    """
+
+    def __init__(self, path: Path | str, table: str = "entries", max_bytes: int = 64 * 1024 * 1024):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = str(path)
+        self.table = table
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table}(last_used)")
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Return the stored value, or None if missing or older than `max_age` seconds."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (max_age is not None and now - row[1] > max_age):
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY last_used ASC"
+        ).fetchall():
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def purge_older_than(self, max_age: float) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - max_age,)
+            )
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": entries, "bytes": size}
+
+
+class MemoryLRU:
+    """Same interface as SqliteLRU, kept in process memory (lost on restart)."""
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (max_age is not None and time.time() - item[1] > max_age):
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0].encode("utf-8"))
+            self._data[key] = (value, time.time())
+            self._bytes += len(value.encode("utf-8"))
+            while self._bytes > self.max_bytes and len(self._data) > 1:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._data), "bytes": self._bytes}
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  SEARCH RESULT CACHE
+# ══════════════════════════════════════════════════════════════
+
+_HOUR = 3600
+_DAY = 24 * _HOUR
+
+
+def search_ttl(recency_days: int) -> int:
+    """
+    open_book runs (recency window of a week or less) only trust results from
+    the last few hours; closed_book / hybrid runs can reuse them for a week.
+    """
+    return 6 * _HOUR if int(recency_days) <= 7 else 7 * _DAY
+
+
+def normalize_query(query: str) -> str:
+    q = re.sub(r"\s+", " ", query.strip().lower())
+    return q.strip(" ?!.,;:\"'")
+
+
+class SearchCache:
+    def __init__(self, store: SqliteLRU):
+        self.store = store
+
+    @staticmethod
+    def key(query: str, max_results: int) -> str:
+        raw = f"{normalize_query(query)}\x1f{int(max_results)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, max_results: int, recency_days: int) -> Optional[List[dict]]:
+        value = self.store.get(self.key(query, max_results), max_age=search_ttl(recency_days))
+        return None if value is None else json.loads(value)
+
+    def put(self, query: str, max_results: int, results: List[dict]) -> None:
+        # empty lists are usually transient failures; never pin them in the cache
+        if results:
+            self.store.put(self.key(query, max_results), json.dumps(results))
+
+    def stats(self) -> Dict[str, int]:
+        return self.store.stats()
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Env: BWA_CACHE_DIR (default .bwa_cache), BWA_SEARCH_CACHE_MB (default 64).
+    """
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            max_mb = float(os.getenv("BWA_SEARCH_CACHE_MB", "64"))
+            store = SqliteLRU(cache_dir() / "search.sqlite3", "search_results",
+                              max_bytes=int(max_mb * 1024 * 1024))
+            store.purge_older_than(search_ttl(3650))
+            _search_cache = SearchCache(store)
+        return _search_cache
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  LLM RESPONSE CACHE
+# ══════════════════════════════════════════════════════════════
+
+def llm_cache_key(model: str, messages: Sequence[Any], schema: Optional[type] = None) -> str:
+    """
+    Content address for one LLM call: model name, every message (role + content)
+    and the JSON schema of the structured output, if any.
+    """
+    payload = {
+        "model": model,
+        "messages": [[getattr(m, "type", type(m).__name__), getattr(m, "content", m)] for m in messages],
+        "schema": schema.model_json_schema() if schema is not None else None,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thin wrapper over a MemoryLRU / SqliteLRU store holding serialized responses."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, key: str) -> Optional[str]:
+        return self.store.get(key)
+
+    def put(self, key: str, value: str) -> None:
+        self.store.put(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return self.store.stats()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_ready = False
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Env: BWA_LLM_CACHE = sqlite (default) | memory | off,
+         BWA_LLM_CACHE_MB (default 128).
+    """
+    global _response_cache, _response_cache_ready
+    with _response_cache_lock:
+        if not _response_cache_ready:
+            backend = os.getenv("BWA_LLM_CACHE", "sqlite").strip().lower()
+            max_bytes = int(float(os.getenv("BWA_LLM_CACHE_MB", "128")) * 1024 * 1024)
+            if backend == "memory":
+                _response_cache = ResponseCache(MemoryLRU(max_bytes=max_bytes))
+            elif backend == "sqlite":
+                _response_cache = ResponseCache(
+                    SqliteLRU(cache_dir() / "llm.sqlite3", "llm_responses", max_bytes=max_bytes)
+                )
+            else:
+                _response_cache = None
+            _response_cache_ready = True
+        return _response_cache
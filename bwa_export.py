@@ -3,17 +3,32 @@ bwa_export.py
 ─────────────
 Export utilities for BlogForge AI.
 
+Classes:
+    ExportCache  bounded LRU of built exports, keyed by content
+
 Functions:
     to_styled_html(md_text, blog_title)  →  str   (full HTML document)
     to_pdf_bytes(md_text, blog_title)    →  bytes  (PDF via ReportLab)
+    export_key(kind, md_text, blog_title)  →  str  (hash of markdown + referenced image files)
+    get_export_cache()                   →  ExportCache  (process-wide, shared by sessions)
 """
 
 from __future__ import annotations
 
 import os
 import re
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from html import escape
 from io import BytesIO
-from typing import List, Tuple
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from bwa_images import variant_path
+import bwa_mdtree as mdt                 # node classes stay qualified: ReportLab also has Paragraph, Table, …
+from bwa_mdtree import Block, Spans, heading_slug, parse, parse_inline, plain_text
 
 
 # ══════════════════════════════════════════════════════════════
@@ -181,7 +196,9 @@ img {
     box-shadow: 0 4px 20px rgba(0,0,0,.1);
 }
 
-em { color: #6b7280; font-size: .9rem; display: block; text-align: center; margin-top: -.8rem; margin-bottom: 1rem; }
+figure { margin: 1.4rem 0; }
+figure img { margin: 0 0 .6rem; }
+figcaption { color: #6b7280; font-size: .9rem; font-style: italic; text-align: center; margin-bottom: 1rem; }
 
 /* ── Horizontal rule ── */
 hr {
@@ -236,19 +253,78 @@ _HTML_TEMPLATE = """\
 """
 
 
+def _html_inline(spans: Spans) -> str:
+    out: List[str] = []
+    for s in spans:
+        if isinstance(s, mdt.Text):
+            out.append(escape(s.text, quote=False))
+        elif isinstance(s, mdt.Code):
+            out.append(f"<code>{escape(s.text, quote=False)}</code>")
+        elif isinstance(s, mdt.Strong):
+            out.append(f"<strong>{_html_inline(s.children)}</strong>")
+        elif isinstance(s, mdt.Emph):
+            out.append(f"<em>{_html_inline(s.children)}</em>")
+        elif isinstance(s, mdt.Link):
+            out.append(f'<a href="{escape(s.href)}">{_html_inline(s.children)}</a>')
+        elif isinstance(s, mdt.InlineImage):
+            out.append(f'<img alt="{escape(s.alt)}" src="{escape(s.src)}" />')
+        elif isinstance(s, mdt.LineBreak):
+            out.append("<br />\n")
+    return "".join(out)
+
+
+def _html_blocks(blocks: Sequence[Block], ids: Dict[str, int]) -> List[str]:
+    """`ids` de-duplicates heading anchors across the whole document (toc-style: x, x_1, …)."""
+    out: List[str] = []
+    for b in blocks:
+        if isinstance(b, mdt.Heading):
+            slug = heading_slug(plain_text(b.spans)) or "section"
+            n = ids.get(slug, 0)
+            ids[slug] = n + 1
+            anchor = slug if n == 0 else f"{slug}_{n}"
+            out.append(f'<h{b.level} id="{anchor}">{_html_inline(b.spans)}</h{b.level}>')
+        elif isinstance(b, mdt.Paragraph):
+            out.append(f"<p>{_html_inline(b.spans)}</p>")
+        elif isinstance(b, mdt.CodeBlock):
+            cls = f' class="language-{escape(b.lang)}"' if b.lang else ""
+            out.append(f"<pre><code{cls}>{escape(b.text, quote=False)}\n</code></pre>")
+        elif isinstance(b, mdt.Quote):
+            out.append("<blockquote>\n" + "\n".join(_html_blocks(b.children, ids)) + "\n</blockquote>")
+        elif isinstance(b, mdt.ListBlock):
+            tag = "ol" if b.ordered else "ul"
+            start = f' start="{b.start}"' if b.ordered and b.start != 1 else ""
+            items = []
+            for item in b.items:
+                nested = "\n".join(_html_blocks(item.children, ids))
+                items.append(f"<li>{_html_inline(item.spans)}{nested and chr(10) + nested}</li>")
+            out.append(f"<{tag}{start}>\n" + "\n".join(items) + f"\n</{tag}>")
+        elif isinstance(b, mdt.Table):
+            def row(cells: Sequence[Spans], cell: str) -> str:
+                tds = []
+                for spans, align in zip(cells, b.align):
+                    style = f' style="text-align: {align};"' if align else ""
+                    tds.append(f"<{cell}{style}>{_html_inline(spans)}</{cell}>")
+                return "<tr>" + "".join(tds) + "</tr>"
+            body = "\n".join(row(r, "td") for r in b.rows)
+            out.append(f"<table>\n<thead>\n{row(b.header, 'th')}\n</thead>\n<tbody>\n{body}\n</tbody>\n</table>")
+        elif isinstance(b, mdt.Rule):
+            out.append("<hr />")
+        elif isinstance(b, mdt.Image):
+            img = f'<img alt="{escape(b.alt)}" src="{escape(b.src)}" />'
+            caption = f"<figcaption>{_html_inline(parse_inline(b.caption))}</figcaption>" if b.caption else ""
+            out.append(f"<figure>{img}{caption}</figure>")
+    return out
+
+
 def to_styled_html(md_text: str, blog_title: str = "Blog Post") -> str:
     """
     Convert markdown text → full styled HTML document string.
-    Uses the `markdown` standard library package with fenced-code + tables extensions.
+    Renders the shared bwa_mdtree parse, so it matches the preview and the PDF.
     """
-    import markdown as _md
-    from datetime import date
-
-    extensions = ["fenced_code", "tables", "toc", "nl2br", "attr_list"]
-    body_html = _md.markdown(md_text, extensions=extensions)
+    body_html = "\n".join(_html_blocks(parse(md_text).blocks, {}))
 
     return _HTML_TEMPLATE.format(
-        title=blog_title,
+        title=escape(blog_title),
         css=_HTML_CSS,
         date_str=date.today().strftime("%B %d, %Y"),
         body_html=body_html,
@@ -263,10 +339,11 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY, TA_RIGHT
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, HRFlowable,
     Preformatted, Table, TableStyle, KeepTogether,
+    ListFlowable, ListItem as RLListItem,
     Image as RLImage,
 )
 from reportlab.lib.styles import getSampleStyleSheet
@@ -286,8 +363,11 @@ _C_BLOCK  = colors.HexColor("#eff6ff")
 _C_WHITE  = colors.white
 
 
+_ALIGN = {"left": TA_LEFT, "center": TA_CENTER, "right": TA_RIGHT}
+
+
 def _make_styles() -> dict:
-    return {
+    st = {
         "h1": ParagraphStyle("H1", fontName="Helvetica-Bold", fontSize=22,
                               textColor=_C_DARK, spaceAfter=6, spaceBefore=4, leading=28),
         "h2": ParagraphStyle("H2", fontName="Helvetica-Bold", fontSize=14,
@@ -298,8 +378,11 @@ def _make_styles() -> dict:
         "body": ParagraphStyle("Body", fontName="Helvetica", fontSize=10,
                                 textColor=_C_BODY, spaceAfter=6, leading=15.5, alignment=TA_JUSTIFY),
         "bullet": ParagraphStyle("Bullet", fontName="Helvetica", fontSize=10,
-                                  textColor=_C_BODY, spaceAfter=2, leading=15, leftIndent=14,
-                                  firstLineIndent=-8),
+                                  textColor=_C_BODY, spaceAfter=2, leading=15),
+        "th": ParagraphStyle("TH", fontName="Helvetica-Bold", fontSize=8.5,
+                              textColor=_C_WHITE, leading=11),
+        "td": ParagraphStyle("TD", fontName="Helvetica", fontSize=9,
+                              textColor=_C_BODY, leading=12),
         "code_inline": ParagraphStyle("CI", fontName="Courier", fontSize=9,
                                        textColor=_C_BLUE, spaceAfter=6, leading=14),
         "meta": ParagraphStyle("Meta", fontName="Helvetica", fontSize=8.5,
@@ -310,6 +393,12 @@ def _make_styles() -> dict:
                                       textColor=_C_BLUE, spaceAfter=6, leading=15,
                                       leftIndent=16, rightIndent=8),
     }
+    # aligned table cells ("th_center", "td_right", ...), built once per export
+    for key in ("th", "td"):
+        for align, alignment in _ALIGN.items():
+            st[f"{key}_{align}"] = ParagraphStyle(f"{st[key].name}_{align}", parent=st[key],
+                                                  alignment=alignment)
+    return st
 
 
 def _rule():
@@ -339,9 +428,8 @@ def _preformat_block(text: str) -> Table:
     return tbl
 
 
-def _blockquote_block(text: str, st: dict) -> Table:
-    para = Paragraph(text, st["blockquote"])
-    tbl = Table([[para]], colWidths=[_W - 1.1 * inch])
+def _blockquote_block(flowables: list) -> Table:
+    tbl = Table([[flowables]], colWidths=[_W - 1.1 * inch])
     tbl.setStyle(TableStyle([
         ("BACKGROUND",    (0, 0), (-1, -1), _C_BLOCK),
         ("TOPPADDING",    (0, 0), (-1, -1), 8),
@@ -354,34 +442,30 @@ def _blockquote_block(text: str, st: dict) -> Table:
 
 
 # ── Image embedding helper ───────────────────────────────────
-_IMG_MD_RE  = re.compile(r"^!\[(?P<alt>[^\]]*)\]\((?P<src>[^)]+)\)$")
 _MAX_IMG_W  = _W - 1.7 * inch   # honour page margins
 
+def _find_image(src: str) -> Optional[Path]:
+    """Resolve an image link: as written, relative to cwd, then under BWA_IMAGES_DIR."""
+    src = src.strip()
+    clean = src.lstrip("./")            # strip leading ./ so Path resolves relative to cwd
+    candidates = [Path(src), Path(clean), Path.cwd() / clean]   # absolute first (cloud deployments)
+    images_env = os.getenv("BWA_IMAGES_DIR")
+    if images_env:
+        candidates.append(Path(images_env) / Path(src).name)
+    return next((p for p in candidates if p.exists()), None)
+
+
 def _embed_image(src: str, alt: str, caption: str, st: dict) -> list:
     """
     Resolve `src` relative to cwd, scale to fit page width,
     and return a list of Flowables: [Spacer, image-table, optional-caption, Spacer].
     Returns an empty list if the file cannot be found/loaded.
     """
-    from pathlib import Path
+    img_path = _find_image(src)
+    if img_path is not None:
+        img_path = variant_path(img_path, "print")   # pre-sized rendition when available
 
-    # strip leading ./ so Path resolves relative to cwd
-    src = src.strip()
-    clean = src.lstrip("./")
-
-# Try absolute path first (cloud deployments write full paths)
-    img_path = Path(src)
-    if not img_path.exists():
-      img_path = Path(clean) 
-    if not img_path.exists():
-      img_path = Path.cwd() / clean
-# Try BWA_IMAGES_DIR
-    if not img_path.exists():
-      images_env = os.getenv("BWA_IMAGES_DIR")
-      if images_env:
-        img_path = Path(images_env) / Path(src).name
-
-    if not img_path.exists():
+    if img_path is None or not img_path.exists():
         # graceful fallback: show a note instead of crashing
         note = Paragraph(
             f'<i>[Image not found: {src}]</i>',
@@ -435,165 +519,149 @@ def _embed_image(src: str, alt: str, caption: str, st: dict) -> list:
         return []   # silently skip unreadable images
 
 
-# ── Markdown line-level inline cleaner ──────────────────────
-_INLINE_CODE_RE = re.compile(r"`([^`]+)`")
-_BOLD_RE        = re.compile(r"\*\*(.+?)\*\*")
-_ITALIC_RE      = re.compile(r"\*(.+?)\*")
-_LINK_RE        = re.compile(r"\[([^\]]+)\]\([^)]+\)")
-_IMG_RE         = re.compile(r"!\[[^\]]*\]\([^)]+\)")
-
+class _Para(Paragraph):
+    """
+    Paragraph that keeps its line breaks between wraps at the same width.
+    ListFlowable and Table cells wrap their content once to measure and again
+    to draw; breakLines only depends on the width, so the second pass is free.
+    """
 
-def _inline(text: str) -> str:
-    """Convert inline markdown to ReportLab XML-safe markup."""
-    text = _IMG_RE.sub("", text)                                          # strip images
-    text = _LINK_RE.sub(r"\1", text)                                      # keep link text
-    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-    text = _INLINE_CODE_RE.sub(r'<font name="Courier" color="#2563eb">\1</font>', text)
-    text = _BOLD_RE.sub(r"<b>\1</b>", text)
-    text = _ITALIC_RE.sub(r"<i>\1</i>", text)
-    return text
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, "_wrapped_at", None) == availWidth and hasattr(self, "blPara"):  # split() drops it
+            return self.width, self.height
+        size = super().wrap(availWidth, availHeight)
+        self._wrapped_at = availWidth
+        return size
+
+
+# ── Inline spans → ReportLab paragraph markup ───────────────
+_INLINE_BLUE = "rgb(37,99,235)"       # _C_BLUE; the markup parser reads rgb() faster than hex
+
+def _inline(spans: Spans) -> str:
+    out: List[str] = []
+    for s in spans:
+        if isinstance(s, mdt.Text):
+            out.append(escape(s.text, quote=False))
+        elif isinstance(s, mdt.Code):
+            out.append(f'<font name="Courier" color="{_INLINE_BLUE}">{escape(s.text, quote=False)}</font>')
+        elif isinstance(s, mdt.Strong):
+            out.append(f"<b>{_inline(s.children)}</b>")
+        elif isinstance(s, mdt.Emph):
+            out.append(f"<i>{_inline(s.children)}</i>")
+        elif isinstance(s, mdt.Link):
+            out.append(f'<a href="{escape(s.href)}" color="{_INLINE_BLUE}">{_inline(s.children)}</a>')
+        elif isinstance(s, mdt.LineBreak):
+            out.append(" ")
+        # inline images are dropped: only image lines are embedded
+    return "".join(out)
+
+
+# ── Document tree → flowables ────────────────────────────────
+_TEXT_W = _W - 1.7 * inch             # between the page margins
+
+
+def _list_flowable(block: mdt.ListBlock, st: dict) -> ListFlowable:
+    """One ListFlowable per list; nested lists become nested ListFlowables inside their item."""
+    items = []
+    for item in block.items:
+        content = [_Para(_inline(item.spans), st["bullet"])]
+        content.extend(_blocks_to_flowables(item.children, st))
+        items.append(RLListItem(content) if len(content) > 1 else content[0])
+    if block.ordered:
+        return ListFlowable(items, bulletType="1", start=block.start, bulletFormat="%s.",
+                            leftIndent=18, bulletFontName="Helvetica", bulletFontSize=10,
+                            bulletColor=_C_BODY, spaceAfter=4)
+    return ListFlowable(items, bulletType="bullet", start="•", leftIndent=14,
+                        bulletFontName="Helvetica", bulletFontSize=10, bulletColor=_C_BODY,
+                        spaceAfter=4)
+
+
+def _table_block(block: mdt.Table, st: dict) -> Table:
+    ncols = max(1, len(block.header))
+    col_w = _TEXT_W / ncols
+    max_chars = int(col_w / 5)            # ~5pt per character at 9pt Helvetica
+
+    def cell(spans: Spans, style: str, align: str):
+        # short plain cells are drawn as strings (no Paragraph layout); the rest wrap
+        if all(isinstance(s, mdt.Text) for s in spans):
+            text = plain_text(spans)
+            if len(text) <= max_chars:
+                return text
+        return _Para(_inline(spans), st.get(f"{style}_{align}", st[style]))
+
+    aligns = list(block.align) + [""] * (ncols - len(block.align))
+    data = [[cell(c, "th", a) for c, a in zip(block.header, aligns)]]
+    data += [[cell(c, "td", a) for c, a in zip(row, aligns)] for row in block.rows]
+    commands = [
+        ("BACKGROUND",    (0, 0), (-1, 0),  _C_NAVY),
+        ("FONT",          (0, 0), (-1, 0),  "Helvetica-Bold", 8.5),
+        ("TEXTCOLOR",     (0, 0), (-1, 0),  _C_WHITE),
+        ("FONT",          (0, 1), (-1, -1), "Helvetica", 9),
+        ("TEXTCOLOR",     (0, 1), (-1, -1), _C_BODY),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [_C_WHITE, colors.HexColor("#f8fafc")]),
+        ("LINEBELOW",     (0, 1), (-1, -1), 0.5, _C_RULE),
+        ("VALIGN",        (0, 0), (-1, -1), "TOP"),
+        ("TOPPADDING",    (0, 0), (-1, -1), 5),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+    ]
+    for col, align in enumerate(aligns):
+        if align in _ALIGN:
+            commands.append(("ALIGN", (col, 0), (col, -1), align.upper()))
+    tbl = Table(data, colWidths=[col_w] * ncols, repeatRows=1, spaceBefore=6, spaceAfter=8)
+    tbl.setStyle(TableStyle(commands))
+    return tbl
 
 
-# ── Block-level parser ───────────────────────────────────────
-def _parse_md_to_flowables(md_text: str, st: dict) -> list:
-    """
-    Walk markdown line-by-line and produce ReportLab Flowable objects.
-    Handles: H1-H3, paragraphs, fenced code, blockquotes, bullets, numbered lists, HR.
-    """
-    flowables = []
-    lines = md_text.splitlines()
-    i = 0
-    para_buf: List[str] = []
-
-    def flush_para():
-        if para_buf:
-            text = " ".join(para_buf).strip()
+def _blocks_to_flowables(blocks: Sequence[Block], st: dict) -> list:
+    flowables: list = []
+    for b in blocks:
+        if isinstance(b, mdt.Heading):
+            if b.level == 1:
+                flowables.append(Spacer(1, 4))
+                flowables.append(_Para(_inline(b.spans), st["h1"]))
+                flowables.append(_section_rule())
+            elif b.level == 2:
+                flowables.append(Spacer(1, 6))
+                flowables.append(_Para(_inline(b.spans), st["h2"]))
+                flowables.append(HRFlowable(width="100%", thickness=0.8, color=_C_RULE,
+                                             spaceAfter=4, spaceBefore=0))
+            else:
+                flowables.append(_Para(_inline(b.spans), st["h3"]))
+        elif isinstance(b, mdt.Paragraph):
+            text = _inline(b.spans).strip()
             if text:
-                flowables.append(Paragraph(_inline(text), st["body"]))
-            para_buf.clear()
-
-    while i < len(lines):
-        raw = lines[i]
-        stripped = raw.strip()
-
-        # ── fenced code block
-        if stripped.startswith("```"):
-            flush_para()
-            lang = stripped[3:].strip()
-            code_lines = []
-            i += 1
-            while i < len(lines) and not lines[i].strip().startswith("```"):
-                code_lines.append(lines[i])
-                i += 1
-            code_text = "\n".join(code_lines)
+                flowables.append(_Para(text, st["body"]))
+        elif isinstance(b, mdt.CodeBlock):
             flowables.append(Spacer(1, 4))
-            flowables.append(_preformat_block(code_text))
+            flowables.append(_preformat_block(b.text))
             flowables.append(Spacer(1, 6))
-            i += 1
-            continue
-
-        # ── blockquote
-        if stripped.startswith("> "):
-            flush_para()
-            bq_text = stripped[2:].strip()
-            flowables.append(_blockquote_block(_inline(bq_text), st))
-            i += 1
-            continue
-
-        # ── horizontal rule
-        if stripped in ("---", "***", "___") or re.match(r"^-{3,}$", stripped):
-            flush_para()
+        elif isinstance(b, mdt.Quote):
+            if st.get("_quoted"):           # a quote inside a quote shares the outer box
+                flowables.extend(_blocks_to_flowables(b.children, st))
+            else:
+                quoted = {**st, "body": st["blockquote"], "_quoted": True}
+                flowables.append(_blockquote_block(_blocks_to_flowables(b.children, quoted)))
+        elif isinstance(b, mdt.ListBlock):
+            flowables.append(_list_flowable(b, st))
+        elif isinstance(b, mdt.Table):
+            flowables.append(_table_block(b, st))
+        elif isinstance(b, mdt.Rule):
             flowables.append(_rule())
-            i += 1
-            continue
-
-        # ── H1
-        if stripped.startswith("# "):
-            flush_para()
-            text = stripped[2:].strip()
-            flowables.append(Spacer(1, 4))
-            flowables.append(Paragraph(_inline(text), st["h1"]))
-            flowables.append(_section_rule())
-            i += 1
-            continue
-
-        # ── H2
-        if stripped.startswith("## "):
-            flush_para()
-            text = stripped[3:].strip()
-            flowables.append(Spacer(1, 6))
-            flowables.append(Paragraph(_inline(text), st["h2"]))
-            flowables.append(HRFlowable(width="100%", thickness=0.8, color=_C_RULE,
-                                         spaceAfter=4, spaceBefore=0))
-            i += 1
-            continue
-
-        # ── H3
-        if stripped.startswith("### "):
-            flush_para()
-            text = stripped[4:].strip()
-            flowables.append(Paragraph(_inline(text), st["h3"]))
-            i += 1
-            continue
-
-        # ── unordered bullet
-        if re.match(r"^[-*+] ", stripped):
-            flush_para()
-            text = stripped[2:].strip()
-            flowables.append(Paragraph(f"• &nbsp; {_inline(text)}", st["bullet"]))
-            i += 1
-            continue
-
-        # ── numbered list
-        if re.match(r"^\d+\. ", stripped):
-            flush_para()
-            text = re.sub(r"^\d+\. ", "", stripped).strip()
-            flowables.append(Paragraph(f"  {_inline(text)}", st["bullet"]))
-            i += 1
-            continue
-
-        # ── blank line → paragraph break
-        if stripped == "":
-            flush_para()
-            i += 1
-            continue
-
-        # ── image line → embed in PDF with optional caption
-        if stripped.startswith("!["):
-            flush_para()
-            m = _IMG_MD_RE.match(stripped)
-            if m:
-                alt_text = m.group("alt").strip()
-                src_text = m.group("src").strip()
-
-                # peek at the NEXT line — if it's *italic caption*, consume it
-                caption_text = ""
-                if i + 1 < len(lines):
-                    next_stripped = lines[i + 1].strip()
-                    cap_m = re.match(r"^\*(?P<cap>.+)\*$", next_stripped)
-                    if cap_m:
-                        caption_text = cap_m.group("cap").strip()
-                        i += 1  # consume caption line
-
-                flowables.extend(_embed_image(src_text, alt_text, caption_text, st))
-            i += 1
-            continue
-
-        # ── regular text → accumulate into paragraph
-        para_buf.append(stripped)
-        i += 1
-
-    flush_para()
+        elif isinstance(b, mdt.Image):
+            flowables.extend(_embed_image(b.src, escape(b.alt), _inline(parse_inline(b.caption)), st))
     return flowables
 
 
+def _parse_md_to_flowables(md_text: str, st: dict) -> list:
+    """Render the shared bwa_mdtree parse of `md_text` as ReportLab flowables."""
+    return _blocks_to_flowables(parse(md_text).blocks, st)
+
+
 def to_pdf_bytes(md_text: str, blog_title: str = "Blog Post") -> bytes:
     """
     Convert markdown text → PDF bytes via ReportLab.
     No external binaries required.
     """
-    from datetime import date
-
     buf = BytesIO()
     doc = SimpleDocTemplate(
         buf,
@@ -626,4 +694,87 @@ def to_pdf_bytes(md_text: str, blog_title: str = "Blog Post") -> bytes:
     ))
 
     doc.build(story)
-    return buf.getvalue()
\ No newline at end of file
+    return buf.getvalue()
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  EXPORT CACHE
+# ══════════════════════════════════════════════════════════════
+
+_MD_IMG_SRC_RE = re.compile(r"!\[[^\]]*\]\(([^)\s]+)")
+
+
+def export_key(kind: str, md_text: str, blog_title: str = "") -> str:
+    """
+    Content hash of one export: kind, title, markdown, today's date (stamped
+    into the HTML/PDF header) and size + mtime of every referenced local image,
+    so regenerating an image under the same filename invalidates the export.
+    """
+    h = hashlib.sha256()
+    for part in (kind, blog_title, date.today().isoformat(), md_text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    for src in sorted(set(_MD_IMG_SRC_RE.findall(md_text))):
+        path = None if src.startswith(("http://", "https://")) else _find_image(src)
+        if path is None:
+            h.update(f"{src}:-".encode("utf-8"))
+        else:
+            stat = path.stat()
+            h.update(f"{src}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+class ExportCache:
+    """
+    Thread-safe LRU of built exports (bytes), bounded by total size.
+    Builds run outside the lock; two sessions racing on the same key both
+    build and the later put() wins, which is harmless.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return                          # would evict everything else; serve it uncached
+        with self._lock:
+            old = self._items.pop(key, None)
+            self._size -= len(old) if old is not None else 0
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_build(self, key: str, build: Callable[[], Union[bytes, str]]) -> bytes:
+        data = self.get(key)
+        if data is None:
+            built = build()
+            data = built.encode("utf-8") if isinstance(built, str) else built
+            self.put(key, data)
+        return data
+
+
+_export_cache: Optional[ExportCache] = None
+_export_cache_lock = threading.Lock()
+
+
+def get_export_cache() -> ExportCache:
+    """Env: BWA_EXPORT_CACHE_MB (total size of cached exports, default 64)."""
+    global _export_cache
+    with _export_cache_lock:
+        if _export_cache is None:
+            mb = float(os.getenv("BWA_EXPORT_CACHE_MB", "64"))
+            _export_cache = ExportCache(max_bytes=int(mb * 1024 * 1024))
+        return _export_cache
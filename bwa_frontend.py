@@ -3,6 +3,8 @@ from __future__ import annotations
 import json
 import os
 import re
+import time
+import uuid
 import zipfile
 from datetime import date
 from io import BytesIO
@@ -12,8 +14,13 @@ from typing import Any, Dict, Optional, List, Iterator, Tuple
 import pandas as pd
 import streamlit as st
 
-from bwa_backend import app
-from bwa_export import to_styled_html, to_pdf_bytes
+from bwa_backend import apply_update, new_run_inputs, regenerate_section
+from bwa_export import export_key, get_export_cache, to_styled_html, to_pdf_bytes
+from bwa_images import STORE_DIRNAME, variant_path
+from bwa_jobs import JobService, get_job_service
+from bwa_library import get_library
+from bwa_mdtree import Image as MdImage, parse as parse_md
+from bwa_trace import read_trace, summarize
 
 # ─────────────────────────────────────────────
 # Page config — must be FIRST streamlit call
@@ -344,14 +351,53 @@ def safe_slug(title: str) -> str:
     return s or "blog"
 
 
+def export_button(kind: str, label: str, build, key: str,
+                  file_name: str, mime: str, help: str) -> None:
+    """
+    Download button for an export that is built on demand. Until this exact
+    content has been exported (by any session), a build button stands in, so
+    reruns never pay for ReportLab or ZIP deflate.
+    """
+    cache = get_export_cache()
+    data = cache.get(key)
+    slot = st.empty()
+    if data is None:
+        if not slot.button(f"{label}  ·  build", key=f"build_{kind}", use_container_width=True,
+                           help=f"{help} (built once, then cached)"):
+            return
+        try:
+            with st.spinner(f"Building {kind}…"):
+                data = cache.get_or_build(key, build)
+        except Exception as e:
+            slot.button(label, key=f"failed_{kind}", disabled=True, use_container_width=True,
+                        help=f"{kind} export failed: {e}")
+            return
+    slot.download_button(label, data=data, file_name=file_name, mime=mime,
+                         use_container_width=True, help=help)
+
+
 def bundle_zip(md_text: str, md_filename: str, images_dir: Path) -> bytes:
+    """
+    Markdown + only the images it references, using the web renditions.
+    Links are rewritten to the bundled images/<name> files so the ZIP is self-contained.
+    """
     buf = BytesIO()
     with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        bundled: Dict[str, str] = {}
+        for m in _MD_IMG_RE.finditer(md_text):
+            src = m.group("src").strip()
+            if src in bundled or src.startswith(("http://", "https://")):
+                continue
+            path = _resolve_image_path(src)
+            if not path.exists():
+                continue
+            web = variant_path(path, "web")
+            arcname = f"{images_dir.name}/{Path(src).stem}{web.suffix}"
+            z.write(web, arcname=arcname)
+            bundled[src] = arcname
+        for src, arcname in bundled.items():
+            md_text = md_text.replace(f"]({src})", f"]({arcname})")
         z.writestr(md_filename, md_text.encode("utf-8"))
-        if images_dir.exists() and images_dir.is_dir():
-            for p in images_dir.rglob("*"):
-                if p.is_file():
-                    z.write(p, arcname=str(p))
     return buf.getvalue()
 
 
@@ -361,44 +407,79 @@ def images_zip(images_dir: Path) -> Optional[bytes]:
     buf = BytesIO()
     with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
         for p in images_dir.rglob("*"):
-            if p.is_file():
+            if p.is_file() and STORE_DIRNAME not in p.parts:
                 z.write(p, arcname=str(p))
     return buf.getvalue()
 
 
-def try_stream(graph_app, inputs: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
-    try:
-        for step in graph_app.stream(inputs, stream_mode="updates"):
-            yield ("updates", step)
-        out = graph_app.invoke(inputs)
-        yield ("final", out)
-        return
-    except Exception:
-        pass
-    try:
-        for step in graph_app.stream(inputs, stream_mode="values"):
-            yield ("values", step)
-        out = graph_app.invoke(inputs)
-        yield ("final", out)
-        return
-    except Exception:
-        pass
-    out = graph_app.invoke(inputs)
-    yield ("final", out)
-
-
 def extract_latest_state(current_state: Dict[str, Any], step_payload: Any) -> Dict[str, Any]:
     if isinstance(step_payload, dict):
-        if len(step_payload) == 1 and isinstance(next(iter(step_payload.values())), dict):
-            inner = next(iter(step_payload.values()))
-            current_state.update(inner)
-        else:
-            current_state.update(step_payload)
+        for update in step_payload.values():
+            if isinstance(update, dict):
+                apply_update(current_state, update)
     return current_state
 
 
+def render_trace(spans: List[Dict[str, Any]]) -> None:
+    """Waterfall of node spans (one bar per execution) plus a per-node summary table."""
+    import altair as alt        # ships with streamlit
+
+    t0 = min(s["start"] for s in spans)
+    rows = []
+    for s in spans:
+        label = s["node"] if s.get("task_id") is None else f"{s['node']} #{s['task_id']}"
+        rows.append({
+            "span": label,
+            "start_s": round(s["start"] - t0, 3),
+            "end_s": round(s["end"] - t0, 3),
+            "seconds": s["seconds"],
+            "llm_calls": s.get("llm_calls", 0),
+            "tokens": (s.get("input_tokens") or 0) + (s.get("output_tokens") or 0),
+            "cache_hits": s.get("cache_hits", 0),
+            "status": "error" if s.get("error") else "ok",
+            "error": s.get("error") or "",
+        })
+    df = pd.DataFrame(rows)
+    total = df["end_s"].max()
+    llm_calls = int(df["llm_calls"].sum())
+    tokens = int(df["tokens"].sum())
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Wall time", f"{total:.1f}s")
+    m2.metric("LLM calls", llm_calls)
+    m3.metric("Tokens", f"{tokens:,}")
+    m4.metric("Cache hits", int(df["cache_hits"].sum()))
+
+    chart = (
+        alt.Chart(df)
+        .mark_bar(cornerRadius=3)
+        .encode(
+            x=alt.X("start_s:Q", title="seconds since start"),
+            x2="end_s:Q",
+            y=alt.Y("span:N", sort=list(dict.fromkeys(df["span"])), title=None),
+            color=alt.Color("status:N", scale=alt.Scale(domain=["ok", "error"], range=["#2dd4c4", "#ff6b6b"]),
+                            legend=None),
+            tooltip=["span", "seconds", "llm_calls", "tokens", "cache_hits", "error"],
+        )
+        .properties(height=max(160, 26 * len(df)))
+    )
+    st.altair_chart(chart, use_container_width=True)
+
+    summary = pd.DataFrame(summarize(spans))
+    st.dataframe(
+        summary[["node", "runs", "wall_s", "slowest_s", "llm_calls", "input_tokens",
+                 "output_tokens", "cache_hits", "errors"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def render_live_sections(area, sections: Dict[int, str]) -> None:
+    """Draft preview of the sections written so far, in plan (task id) order."""
+    if sections:
+        area.markdown("\n\n".join(sections[tid] for tid in sorted(sections)))
+
+
 _MD_IMG_RE = re.compile(r"!\[(?P<alt>[^\]]*)\]\((?P<src>[^)]+)\)")
-_CAPTION_LINE_RE = re.compile(r"^\*(?P<cap>.+)\*$")
 
 
 def _resolve_image_path(src: str) -> Path:
@@ -428,56 +509,32 @@ def _resolve_image_path(src: str) -> Path:
 
 
 def render_markdown_with_local_images(md: str):
-    matches = list(_MD_IMG_RE.finditer(md))
-    if not matches:
-        st.markdown(md, unsafe_allow_html=False)
-        return
-    parts: List[Tuple[str, str]] = []
-    last = 0
-    for m in matches:
-        before = md[last: m.start()]
-        if before:
-            parts.append(("md", before))
-        alt = (m.group("alt") or "").strip()
-        src = (m.group("src") or "").strip()
-        parts.append(("img", f"{alt}|||{src}"))
-        last = m.end()
-    tail = md[last:]
-    if tail:
-        parts.append(("md", tail))
-    i = 0
-    while i < len(parts):
-        kind, payload = parts[i]
-        if kind == "md":
-            st.markdown(payload, unsafe_allow_html=False)
-            i += 1
+    """
+    Walk the shared bwa_mdtree parse: runs of ordinary blocks go to
+    st.markdown as written, image blocks (with their caption) to st.image.
+    """
+    pending: List[str] = []
+    for block in parse_md(md).blocks:
+        if not isinstance(block, MdImage):
+            pending.append(block.source)
             continue
-        alt, src = payload.split("|||", 1)
-        caption = None
-        if i + 1 < len(parts) and parts[i + 1][0] == "md":
-            nxt = parts[i + 1][1].lstrip()
-            if nxt.strip():
-                first_line = nxt.splitlines()[0].strip()
-                mcap = _CAPTION_LINE_RE.match(first_line)
-                if mcap:
-                    caption = mcap.group("cap").strip()
-                    rest = "\n".join(nxt.splitlines()[1:])
-                    parts[i + 1] = ("md", rest)
-        if src.startswith("http://") or src.startswith("https://"):
-            st.image(src, caption=caption or (alt or None), use_container_width=True)
+        if pending:
+            st.markdown("\n\n".join(pending), unsafe_allow_html=False)
+            pending.clear()
+        caption = block.caption or block.alt or None
+        if block.src.startswith(("http://", "https://")):
+            st.image(block.src, caption=caption, use_container_width=True)
         else:
-            img_path = _resolve_image_path(src)
+            img_path = _resolve_image_path(block.src)
             if img_path.exists():
-                st.image(str(img_path), caption=caption or (alt or None), use_container_width=True)
+                st.image(str(variant_path(img_path, "web")), caption=caption, use_container_width=True)
             else:
-                st.warning(f"Image not found: `{src}`")
-        i += 1
+                st.warning(f"Image not found: `{block.src}`")
+    if pending:
+        st.markdown("\n\n".join(pending), unsafe_allow_html=False)
 
 
-def list_past_blogs() -> List[Path]:
-    files = [p for p in Path(".").glob("*.md") if p.is_file()]
-    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return files
+LIBRARY_PAGE_SIZE = 15              # sidebar posts per page (bwa_library)
 
 
 def read_md_file(p: Path) -> str:
@@ -505,6 +562,16 @@ if "logs" not in st.session_state:
     st.session_state["logs"] = []
 if "gen_stats" not in st.session_state:
     st.session_state["gen_stats"] = {}
+if "failed_run" not in st.session_state:
+    st.session_state["failed_run"] = None
+if "owner" not in st.session_state:
+    st.session_state["owner"] = uuid.uuid4().hex     # fair-queuing identity of this browser session
+
+
+@st.cache_resource
+def job_service() -> JobService:
+    """Generations run on the shared job pool, not in this script thread."""
+    return get_job_service()
 
 # ─────────────────────────────────────────────
 # Sidebar
@@ -535,9 +602,24 @@ with st.sidebar:
     with col_date:
         as_of = st.date_input("As-of date", value=date.today(), label_visibility="visible")
 
+    fresh_run = st.checkbox(
+        "Fresh run",
+        value=False,
+        help="Ignore cached LLM responses and call Gemini for every step (results still refresh the cache)",
+    )
+
     st.markdown('<div style="height:.4rem"></div>', unsafe_allow_html=True)
     run_btn = st.button("🚀  Generate Blog", type="primary", use_container_width=True)
 
+    failed_run = st.session_state.get("failed_run")
+    resume_btn = False
+    if failed_run:
+        resume_btn = st.button(
+            f"↻  Resume failed run (after `{failed_run['node']}`)",
+            use_container_width=True,
+            help="Continue from the last checkpoint; completed research and sections are reused",
+        )
+
     # ── Stats strip (shown after a run) ──
     stats = st.session_state.get("gen_stats", {})
     if stats:
@@ -578,37 +660,49 @@ with st.sidebar:
     st.markdown('<hr style="margin:1.2rem 0;border-color:#252836;">', unsafe_allow_html=True)
     st.markdown('<div style="color:#8a90a8;font-size:11.5px;letter-spacing:.5px;text-transform:uppercase;font-family:\'DM Mono\',monospace;margin-bottom:.7rem;">Past Blogs</div>', unsafe_allow_html=True)
 
-    past_files = list_past_blogs()
-    if not past_files:
-        st.markdown('<div style="color:#555a72;font-size:12.5px;padding:.4rem 0;">No saved blogs yet.</div>', unsafe_allow_html=True)
-        selected_md_file = None
+    library = get_library()
+    query = st.text_input("Search posts", key="library_query", placeholder="🔍  Search titles, text, sources…",
+                          label_visibility="collapsed").strip()
+    if query != st.session_state.get("library_last_query", ""):
+        st.session_state["library_last_query"] = query
+        st.session_state["library_page"] = 0
+    total = library.search_count(query) if query else library.count()
+    if not total:
+        empty = "No matching posts." if query else "No saved blogs yet."
+        st.markdown(f'<div style="color:#555a72;font-size:12.5px;padding:.4rem 0;">{empty}</div>', unsafe_allow_html=True)
     else:
-        options: List[str] = []
-        file_by_label: Dict[str, Path] = {}
-        for p in past_files[:30]:
-            try:
-                md_text = read_md_file(p)
-                title = extract_title_from_md(md_text, p.stem)
-            except Exception:
-                title = p.stem
-            label = f"{title[:36]}…" if len(title) > 36 else title
-            full_label = f"{title}|||{p.name}"
-            options.append(full_label)
-            file_by_label[full_label] = p
-
-        display_options = [o.split("|||")[0] for o in options]
+        pages = (total + LIBRARY_PAGE_SIZE - 1) // LIBRARY_PAGE_SIZE
+        page = min(st.session_state.get("library_page", 0), pages - 1)
+        if query:
+            posts = library.search(query, LIBRARY_PAGE_SIZE, page * LIBRARY_PAGE_SIZE)
+        else:
+            posts = library.page(LIBRARY_PAGE_SIZE, page * LIBRARY_PAGE_SIZE)
+
         selected_idx = st.radio(
             "blogs",
-            range(len(options)),
-            format_func=lambda i: display_options[i],
+            range(len(posts)),
+            format_func=lambda i: posts[i].title,
             label_visibility="collapsed",
         )
-        selected_md_file = file_by_label[options[selected_idx]] if options else None
+        if pages > 1:
+            pc1, pc2, pc3 = st.columns([1, 2, 1])
+            if pc1.button("‹", key="library_prev", disabled=page == 0, use_container_width=True):
+                st.session_state["library_page"] = page - 1
+                st.rerun()
+            pc2.markdown(f'<div style="color:#555a72;font-size:11px;text-align:center;padding-top:.45rem;">'
+                         f'page {page + 1} / {pages} · {total} posts</div>', unsafe_allow_html=True)
+            if pc3.button("›", key="library_next", disabled=page >= pages - 1, use_container_width=True):
+                st.session_state["library_page"] = page + 1
+                st.rerun()
 
-        if st.button("📂  Load Selected Blog", use_container_width=True):
-            if selected_md_file:
-                md_text = read_md_file(selected_md_file)
-                wc = count_words(md_text)
+        if st.button("📂  Load Selected Blog", use_container_width=True) and posts:
+            selected = posts[selected_idx]
+            try:
+                md_text = read_md_file(library.path(selected))
+            except OSError:
+                library.forget(selected.name)   # deleted behind the index's back
+                st.warning(f"`{selected.name}` no longer exists; removed it from the library.")
+            else:
                 st.session_state["last_out"] = {
                     "plan": None,
                     "evidence": [],
@@ -617,10 +711,10 @@ with st.sidebar:
                 }
                 st.session_state["gen_stats"] = {
                     "sections": "—",
-                    "words": f"{wc:,}",
-                    "images": "—",
+                    "words": f"{selected.words:,}",
+                    "images": len(selected.images),
                 }
-                st.session_state["topic_prefill"] = extract_title_from_md(md_text, selected_md_file.stem)
+                st.session_state["topic_prefill"] = selected.topic or selected.title
                 st.rerun()
 
 # ─────────────────────────────────────────────
@@ -628,6 +722,11 @@ with st.sidebar:
 # ─────────────────────────────────────────────
 hero_header()
 
+if st.session_state.get("failed_run") and not (run_btn or resume_btn):
+    _failed = st.session_state["failed_run"]
+    st.error(f"Generation failed after node `{_failed['node']}`: {_failed['error']}  \n"
+             "Use **Resume failed run** in the sidebar to continue from the last checkpoint.")
+
 tab_plan, tab_evidence, tab_preview, tab_images, tab_logs = st.tabs(
     ["  🧩 Plan  ", "  🔎 Evidence  ", "  📝 Preview  ", "  🖼️ Images  ", "  🧾 Logs  "]
 )
@@ -642,28 +741,38 @@ def log(msg: str):
 # ─────────────────────────────────────────────
 # Run graph
 # ─────────────────────────────────────────────
-if run_btn:
-    if not topic.strip():
+if run_btn or resume_btn:
+    if run_btn and not topic.strip():
         st.warning("Please enter a topic before generating.")
         st.stop()
 
     st.session_state["logs"] = []
+    run_config: Dict[str, Any] = {"configurable": {"bypass_llm_cache": fresh_run}}
+    if resume_btn:
+        job_id = job_service().resume(failed_run["thread_id"], owner=st.session_state["owner"], config=run_config)
+        st.session_state["logs"].append(f"[resume] thread {failed_run['thread_id']} after {failed_run['node']}")
+    else:
+        job_id = job_service().submit(new_run_inputs(topic, as_of.isoformat()),
+                                      owner=st.session_state["owner"], config=run_config)
+    st.session_state["failed_run"] = None
+    # the job id lives in the URL too, so a refresh re-attaches instead of losing the run
+    st.session_state["job_id"] = job_id
+    st.query_params["job"] = job_id
+
+active_job = st.session_state.get("job_id") or st.query_params.get("job")
+if active_job and job_service().get(active_job) is None:
+    st.session_state.pop("job_id", None)            # forgotten after a server restart
+    st.query_params.pop("job", None)
+    active_job = None
+
+
+def detach_job() -> None:
+    st.session_state.pop("job_id", None)
+    st.query_params.pop("job", None)
+
 
-    inputs: Dict[str, Any] = {
-        "topic": topic.strip(),
-        "mode": "",
-        "needs_research": False,
-        "queries": [],
-        "evidence": [],
-        "plan": None,
-        "as_of": as_of.isoformat(),
-        "recency_days": 7,
-        "sections": [],
-        "merged_md": "",
-        "md_with_placeholders": "",
-        "image_specs": [],
-        "final": "",
-    }
+if active_job:
+    job_status = job_service().status(active_job) or {}
 
     # ── Live progress panel ──
     st.markdown("""
@@ -673,16 +782,27 @@ if run_btn:
                     letter-spacing:.5px;margin-bottom:.8rem;">▶ AGENT RUNNING</div>
     """, unsafe_allow_html=True)
 
-    status = st.status("Initialising agent…", expanded=True)
+    if job_status.get("status") == "queued":
+        status = st.status(f"Queued — {job_status['queue_position']} run(s) ahead of you…"
+                           if job_status.get("queue_position") else "Queued — starting shortly…", expanded=True)
+    else:
+        status = st.status("Initialising agent…", expanded=True)
     progress_area = st.empty()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    # ── Live draft: worker tokens arrive as "custom" section_delta events ──
+    live_preview = st.container(height=520, border=True)
+    live_area = live_preview.empty()
+    live_sections: Dict[int, str] = {}
+    last_paint = 0.0
+
     current_state: Dict[str, Any] = {}
     last_node = None
 
-    for kind, payload in try_stream(app, inputs):
-        if kind in ("updates", "values"):
+    # replays the job's events from the start, then follows it live
+    for kind, payload in job_service().follow(active_job):
+        if kind == "updates":
             node_name = None
             if isinstance(payload, dict) and len(payload) == 1 and isinstance(next(iter(payload.values())), dict):
                 node_name = next(iter(payload.keys()))
@@ -692,6 +812,13 @@ if run_btn:
 
             current_state = extract_latest_state(current_state, payload)
 
+            # a finished worker replaces its streamed draft with the final section text
+            worker_update = payload.get("worker") if isinstance(payload, dict) else None
+            if isinstance(worker_update, dict):
+                for tid, section_md in worker_update.get("sections") or []:
+                    live_sections[tid] = section_md
+                render_live_sections(live_area, live_sections)
+
             # Live summary card
             ev_count = len(current_state.get("evidence", []) or [])
             sec_count = len(current_state.get("sections", []) or [])
@@ -717,25 +844,65 @@ if run_btn:
             </div>
             """, unsafe_allow_html=True)
 
-            log(f"[{kind}] {json.dumps(payload, default=str)[:1200]}")
+            for node, update in (payload.items() if isinstance(payload, dict) else []):
+                keys = ", ".join(update) if isinstance(update, dict) else type(update).__name__
+                log(f"[{node}] updated {keys}")
+
+        elif kind == "custom":
+            delta = payload.get("section_delta") if isinstance(payload, dict) else None
+            if delta:
+                tid = delta["task_id"]
+                # a retried stream starts over; drop what the failed attempt sent
+                previous = "" if delta.get("restart") else live_sections.get(tid, "")
+                live_sections[tid] = previous + delta["text"]
+                # re-rendering markdown per token is wasteful; repaint a few times a second
+                now = time.monotonic()
+                if now - last_paint >= 0.25:
+                    render_live_sections(live_area, live_sections)
+                    last_paint = now
 
         elif kind == "final":
-            out = payload
+            if not payload.ok:
+                failed_at = payload.last_node or "start"
+                status.update(label=f"❌ Run failed after `{failed_at}`", state="error", expanded=True)
+                log(f"[error] after {failed_at}: {payload.error!r}")
+                st.session_state["last_run_id"] = payload.thread_id
+                st.session_state["logs"].extend(logs)
+                # rerun so the sidebar offers "Resume" for this thread
+                st.session_state["failed_run"] = {
+                    "thread_id": payload.thread_id, "node": failed_at, "error": str(payload.error),
+                }
+                detach_job()
+                st.rerun()
+
+            st.session_state["failed_run"] = None
+
+            out = payload.state
             final_md = out.get("final", "")
             wc = count_words(final_md)
             sec_n = len(out.get("sections", []) or [])
             img_n = len(out.get("image_specs", []) or [])
 
             st.session_state["last_out"] = out
+            st.session_state["last_run_id"] = payload.thread_id
             st.session_state["gen_stats"] = {
-                "sections": sec_n or len((out.get("plan") or {}).get("tasks", [])) if isinstance(out.get("plan"), dict) else "—",
+                "sections": sec_n or (len(out["plan"].get("tasks", [])) if isinstance(out.get("plan"), dict) else "—"),
                 "words": f"{wc:,}",
                 "images": img_n,
             }
             status.update(label="✅ Blog generated successfully", state="complete", expanded=False)
-            log("[final] received final state")
+            log(f"[final] state assembled from stream (last node: {payload.last_node})")
+            st.session_state["logs"].extend(logs)
+            logs.clear()
+            detach_job()
             st.rerun()
 
+    # the event log ended without a "final" event: the worker itself crashed
+    job_status = job_service().status(active_job) or {}
+    st.error(f"Generation job stopped unexpectedly: {job_status.get('error')}")
+    st.session_state["logs"].extend(logs)
+    detach_job()
+
 # ─────────────────────────────────────────────
 # Render result
 # ─────────────────────────────────────────────
@@ -864,6 +1031,42 @@ if out:
             render_markdown_with_local_images(final_md)
             st.markdown('</div>', unsafe_allow_html=True)
 
+            # ── Regenerate one section (single worker call, images kept) ──
+            plan_for_regen = out.get("plan")
+            regen_tasks = (plan_for_regen.get("tasks") if isinstance(plan_for_regen, dict)
+                           else getattr(plan_for_regen, "tasks", None)) or []
+            if regen_tasks and out.get("sections"):
+                st.markdown('<div style="height:.8rem"></div>', unsafe_allow_html=True)
+                with st.expander("🔁  Regenerate a section"):
+                    task_by_id = {
+                        (t["id"] if isinstance(t, dict) else t.id): (t["title"] if isinstance(t, dict) else t.title)
+                        for t in regen_tasks
+                    }
+                    rc1, rc2 = st.columns([3, 1])
+                    with rc1:
+                        regen_id = st.selectbox(
+                            "Section",
+                            list(task_by_id),
+                            format_func=lambda tid: f"{tid}. {task_by_id[tid]}",
+                            label_visibility="collapsed",
+                        )
+                    with rc2:
+                        regen_btn = st.button("Regenerate", use_container_width=True)
+                    if regen_btn:
+                        with st.spinner(f"Rewriting “{task_by_id[regen_id]}”…"):
+                            try:
+                                new_out = regenerate_section(out, regen_id)
+                            except Exception as e:
+                                st.error(f"Regeneration failed: {e}")
+                            else:
+                                st.session_state["last_out"] = new_out
+                                st.session_state["gen_stats"] = {
+                                    **st.session_state.get("gen_stats", {}),
+                                    "words": f"{count_words(new_out.get('final', '')):,}",
+                                }
+                                st.session_state["logs"].append(f"[regenerate] section {regen_id}")
+                                st.rerun()
+
             # ── Export bar ──────────────────────────────────────
             st.markdown('<div style="height:1rem"></div>', unsafe_allow_html=True)
 
@@ -896,45 +1099,25 @@ if out:
                 )
 
             with ec2:
-                # ── Styled HTML export ──────────────────────
-                try:
-                    html_bytes = to_styled_html(final_md, blog_title).encode("utf-8")
-                    st.download_button(
-                        "🌐  HTML",
-                        data=html_bytes,
-                        file_name=f"{slug}.html",
-                        mime="text/html",
-                        use_container_width=True,
-                        help="Fully styled HTML — open in browser or print to PDF via Ctrl+P",
-                    )
-                except Exception as e:
-                    st.button("🌐  HTML", disabled=True, use_container_width=True,
-                              help=f"HTML export failed: {e}")
+                export_button(
+                    "HTML", "🌐  HTML", lambda: to_styled_html(final_md, blog_title),
+                    export_key("html", final_md, blog_title),
+                    file_name=f"{slug}.html", mime="text/html",
+                    help="Fully styled HTML — open in browser or print to PDF via Ctrl+P",
+                )
 
             with ec3:
-                # ── PDF export via ReportLab ─────────────────
-                try:
-                    pdf_bytes = to_pdf_bytes(final_md, blog_title)
-                    st.download_button(
-                        "📄  PDF",
-                        data=pdf_bytes,
-                        file_name=f"{slug}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True,
-                        help="Formatted PDF — ready to share or print",
-                    )
-                except Exception as e:
-                    st.button("📄  PDF", disabled=True, use_container_width=True,
-                              help=f"PDF export failed: {e}")
+                export_button(
+                    "PDF", "📄  PDF", lambda: to_pdf_bytes(final_md, blog_title),
+                    export_key("pdf", final_md, blog_title),
+                    file_name=f"{slug}.pdf", mime="application/pdf",
+                    help="Formatted PDF — ready to share or print",
+                )
 
             with ec4:
-                bundle = bundle_zip(final_md, f"{slug}.md", Path("images"))
-                st.download_button(
-                    "📦  Bundle",
-                    data=bundle,
-                    file_name=f"{slug}_bundle.zip",
-                    mime="application/zip",
-                    use_container_width=True,
+                export_button(
+                    "bundle", "📦  Bundle", lambda: bundle_zip(final_md, f"{slug}.md", Path("images")),
+                    export_key("bundle", final_md, slug), file_name=f"{slug}_bundle.zip", mime="application/zip",
                     help="ZIP with Markdown + all generated images",
                 )
 
@@ -980,31 +1163,41 @@ if out:
                     cols = st.columns(min(len(files), 2))
                     for idx, p in enumerate(sorted(files)):
                         with cols[idx % 2]:
-                            st.image(str(p), caption=p.name, use_container_width=True)
+                            st.image(str(variant_path(p, "thumb")), caption=p.name, use_container_width=True)
 
-                    z = images_zip(images_dir)
-                    if z:
-                        st.download_button("⬇️  Download All Images (.zip)", data=z,
-                                           file_name="images.zip", mime="application/zip")
+                    # one image link per file, so the key tracks each file's size + mtime
+                    listing = "\n".join(f"![]({p})" for p in sorted(images_dir.rglob("*"))
+                                         if p.is_file() and STORE_DIRNAME not in p.parts)
+                    export_button("images", "⬇️  Download All Images (.zip)", lambda: images_zip(images_dir) or b"",
+                                  export_key("images", listing), file_name="images.zip",
+                                  mime="application/zip", help="Every generated image file")
 
     # ── Logs tab ──
     with tab_logs:
-        section_heading("Agent Logs", "Raw event stream from the LangGraph execution")
+        section_heading("Run Trace", "Per-node timing, LLM calls, tokens and cache hits")
         if logs:
             st.session_state["logs"].extend(logs)
 
-        col_log, col_ctrl = st.columns([5, 1])
-        with col_ctrl:
-            if st.button("🗑  Clear", use_container_width=True):
-                st.session_state["logs"] = []
-                st.rerun()
-        with col_log:
-            st.text_area(
-                "event_log",
-                value="\n\n".join(st.session_state["logs"][-80:]),
-                height=520,
-                label_visibility="collapsed",
-            )
+        run_id = st.session_state.get("last_run_id")
+        spans = read_trace(run_id) if run_id else []
+        if not spans:
+            st.info("No trace recorded for this post (loaded from disk, or BWA_TRACE=off).")
+        else:
+            render_trace(spans)
+
+        with st.expander("Event log"):
+            col_log, col_ctrl = st.columns([5, 1])
+            with col_ctrl:
+                if st.button("🗑  Clear", use_container_width=True):
+                    st.session_state["logs"] = []
+                    st.rerun()
+            with col_log:
+                st.text_area(
+                    "event_log",
+                    value="\n".join(st.session_state["logs"][-200:]),
+                    height=360,
+                    label_visibility="collapsed",
+                )
 
 else:
     # ── Empty state ──
@@ -0,0 +1,421 @@
+"""
+bwa_images.py
+─────────────
+Image generation stage for BlogForge AI.
+
+Classes:
+    ImageResult   outcome of one ImageSpec (bytes or error, never both)
+    ImageStore    content-addressed, size-capped LRU store under BWA_IMAGES_DIR
+
+Functions:
+    get_genai_client()                          →  genai.Client (shared, lazily created)
+    generate_images(specs, backend, ...)        →  List[ImageResult]
+    place_images(md, results, images_dir)       →  str
+    get_image_store(images_dir)                 →  ImageStore
+    make_variants(blob)                         →  Dict[str, Path]  (web / thumb / print renditions)
+    variant_path(path, kind)                    →  Path  (smallest adequate file for a consumer)
+
+`backend` is any callable prompt -> bytes, so tests can swap the Gemini call
+for a local fake.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from pathlib import Path
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  SHARED GEMINI CLIENT
+# ══════════════════════════════════════════════════════════════
+
+_client: Any = None
+_client_lock = threading.Lock()
+
+
+def image_timeout() -> float:
+    """Env: BWA_IMAGE_TIMEOUT (seconds per image, default 90)."""
+    return float(os.getenv("BWA_IMAGE_TIMEOUT", "90"))
+
+
+def get_genai_client():
+    """One google-genai client (and its HTTP connection pool) for every image call."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google import genai
+            from google.genai import types
+
+            api_key = os.environ.get("GOOGLE_API_KEY")
+            if not api_key:
+                raise RuntimeError("GOOGLE_API_KEY is not set.")
+            _client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(timeout=int(image_timeout() * 1000)),
+            )
+        return _client
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  CONCURRENT GENERATION
+# ══════════════════════════════════════════════════════════════
+
+@dataclass
+class ImageResult:
+    spec: dict
+    data: Optional[bytes] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.data is not None
+
+
+def generate_images(
+    specs: Sequence[dict],
+    backend: Callable[[str], bytes],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[ImageResult]:
+    """
+    Generate every spec's prompt with bounded concurrency.
+    Each image has its own `timeout`; failures and timeouts are recorded on
+    that image's result and never affect the others. Results keep spec order.
+    Env: BWA_IMAGE_CONCURRENCY (default 3).
+    """
+    if not specs:
+        return []
+    workers = max_workers or int(os.getenv("BWA_IMAGE_CONCURRENCY", "3"))
+    per_image = timeout if timeout is not None else image_timeout()
+
+    started: Dict[int, float] = {}
+
+    def run(i: int, prompt: str) -> bytes:
+        started[i] = monotonic()
+        return backend(prompt)
+
+    results: List[ImageResult] = []
+    n_workers = max(1, min(workers, len(specs)))
+    # hung backends keep their thread busy, so queued images also get an overall cap
+    batch_deadline = monotonic() + per_image * -(-len(specs) // n_workers)
+    pool = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="bwa-images")
+    try:
+        futures = [pool.submit(run, i, spec["prompt"]) for i, spec in enumerate(specs)]
+        for i, (spec, fut) in enumerate(zip(specs, futures)):
+            while True:
+                # the budget starts when the image actually starts, not when it was queued
+                begun = started.get(i)
+                deadline = batch_deadline if begun is None else begun + per_image
+                try:
+                    results.append(ImageResult(spec, data=fut.result(timeout=max(0.0, deadline - monotonic()))))
+                    break
+                except FutureTimeout:
+                    if started.get(i) is None and monotonic() < batch_deadline:
+                        continue
+                    if started.get(i) is not None and monotonic() < started[i] + per_image:
+                        continue
+                    fut.cancel()
+                    results.append(ImageResult(spec, error=TimeoutError(
+                        f"Image generation timed out after {per_image:.0f}s")))
+                    break
+                except Exception as exc:
+                    results.append(ImageResult(spec, error=exc))
+                    break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  PLACEMENT
+# ══════════════════════════════════════════════════════════════
+
+_PLACEHOLDER_RE = re.compile(r"\[\[IMAGE_\d+\]\]")
+
+
+def image_markdown(spec: dict, images_dir: Path) -> str:
+    return f"![{spec['alt']}]({images_dir}/{spec['filename']})\n*{spec['caption']}*"
+
+
+def failure_markdown(spec: dict, error: BaseException) -> str:
+    return (
+        f"> **[IMAGE GENERATION FAILED]** {spec.get('caption', '')}\n>\n"
+        f"> **Alt:** {spec.get('alt', '')}\n>\n"
+        f"> **Prompt:** {spec.get('prompt', '')}\n>\n"
+        f"> **Error:** {error}\n"
+    )
+
+
+def place_images(md: str, results: Sequence[ImageResult], images_dir: Path) -> str:
+    """Swap every [[IMAGE_n]] for its image (or failure note) in a single pass."""
+    blocks: Dict[str, str] = {}
+    for r in results:
+        placeholder = r.spec["placeholder"]
+        blocks[placeholder] = image_markdown(r.spec, images_dir) if r.error is None \
+            else failure_markdown(r.spec, r.error)
+    return _PLACEHOLDER_RE.sub(lambda m: blocks.get(m.group(0), m.group(0)), md)
+
+
+# ══════════════════════════════════════════════════════════════
+# 4.  CONTENT-ADDRESSED IMAGE STORE
+# ══════════════════════════════════════════════════════════════
+
+STORE_DIRNAME = "_store"
+
+
+def _sniff_ext(data: bytes) -> str:
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".png"
+
+
+class ImageStore:
+    """
+    Generated images live once under <images_dir>/_store/<key>/, where key is
+    sha256(prompt, size, quality). What the markdown references is a hardlink
+    (or a copy where links are unsupported) named "<llm filename stem>-<key[:8]><ext>",
+    so two prompts can never share a file name and identical prompts never
+    regenerate.
+
+    Eviction is LRU by last use (directory mtime, refreshed on every hit)
+    once blobs exceed `max_bytes`; evicting a blob also removes its placements.
+    """
+
+    def __init__(self, images_dir: Path, max_bytes: int):
+        self.images_dir = Path(images_dir)
+        self.root = self.images_dir / STORE_DIRNAME
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(spec: dict, namespace: str = "") -> str:
+        parts = [spec["prompt"].strip(), spec.get("size", ""), spec.get("quality", "")]
+        raw = "\x1f".join(parts + [namespace] if namespace else parts)   # "" keeps existing keys valid
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _blob(self, key: str) -> Optional[Path]:
+        d = self.root / key
+        if not d.is_dir():
+            return None
+        found = sorted(d.glob("image.*"))
+        return found[0] if found else None
+
+    def _touch(self, key: str) -> None:
+        now = time.time()
+        os.utime(self.root / key, (now, now))
+
+    def get(self, key: str) -> Optional[Path]:
+        with self._lock:
+            blob = self._blob(key)
+            if blob is not None:
+                self._touch(key)
+            return blob
+
+    def put(self, key: str, data: bytes) -> Path:
+        with self._lock:
+            d = self.root / key
+            d.mkdir(exist_ok=True)
+            blob = d / f"image{_sniff_ext(data)}"
+            tmp = d / f".{blob.name}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, blob)
+            self._touch(key)
+            return blob
+
+    def place(self, key: str, filename: str) -> str:
+        """Link the blob into images_dir under a collision-free name; returns that name."""
+        with self._lock:
+            blob = self._blob(key)
+            if blob is None:
+                raise FileNotFoundError(f"No stored image for key {key[:12]}")
+            name = f"{Path(filename).stem or 'image'}-{key[:8]}{blob.suffix}"
+            dest = self.images_dir / name
+            if dest.exists():
+                if os.path.samefile(dest, blob):
+                    return name
+                dest.unlink()
+            try:
+                os.link(blob, dest)
+            except OSError:
+                shutil.copy2(blob, dest)
+            return name
+
+    def _placements(self, blobs: Iterable[Path]) -> Dict[tuple, List[Path]]:
+        inodes = {(b.stat().st_dev, b.stat().st_ino): [] for b in blobs}
+        for p in self.images_dir.iterdir():
+            if p.is_file():
+                st = p.stat()
+                if (st.st_dev, st.st_ino) in inodes:
+                    inodes[(st.st_dev, st.st_ino)].append(p)
+        return inodes
+
+    def evict(self, keep: Iterable[str] = ()) -> List[str]:
+        """Drop least-recently-used entries (never those in `keep`) until under max_bytes."""
+        keep = set(keep)
+        with self._lock:
+            entries = []
+            for d in self.root.iterdir():
+                if d.is_dir():
+                    size = sum(f.stat().st_size for f in d.iterdir() if f.is_file())
+                    entries.append((d.stat().st_mtime, d.name, size))
+            total = sum(size for _, _, size in entries)
+            if total <= self.max_bytes:
+                return []
+
+            evicted: List[str] = []
+            for _, key, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key in keep:
+                    continue
+                blob = self._blob(key)
+                if blob is not None:
+                    for links in self._placements([blob]).values():
+                        for p in links:
+                            p.unlink(missing_ok=True)
+                shutil.rmtree(self.root / key, ignore_errors=True)
+                total -= size
+                evicted.append(key)
+            return evicted
+
+
+_stores: Dict[str, ImageStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_image_store(images_dir: Path) -> ImageStore:
+    """Env: BWA_IMAGES_MAX_MB (default 512) caps the store under images_dir."""
+    path = str(Path(images_dir).resolve())
+    with _stores_lock:
+        if path not in _stores:
+            max_mb = float(os.getenv("BWA_IMAGES_MAX_MB", "512"))
+            _stores[path] = ImageStore(Path(images_dir), max_bytes=int(max_mb * 1024 * 1024))
+        return _stores[path]
+
+
+# ══════════════════════════════════════════════════════════════
+# 5.  POST-PROCESSING: WEB / THUMB / PRINT RENDITIONS
+# ══════════════════════════════════════════════════════════════
+
+# bwa_export._MAX_IMG_W is letter width minus 1.7in of margins = 6.8in;
+# 150 dpi is plenty for screen-sized PDFs and keeps the file small.
+PRINT_WIDTH_PX = int(6.8 * 150)
+
+# kind → (max width px, Pillow format, file extension, save options)
+VARIANTS: Dict[str, tuple] = {
+    "web":   (1280,           "WEBP", ".webp", {"quality": 82, "method": 4}),
+    "thumb": (320,            "WEBP", ".webp", {"quality": 70, "method": 4}),
+    "print": (PRINT_WIDTH_PX, "JPEG", ".jpg",  {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+_HASHED_NAME_RE = re.compile(r"-([0-9a-f]{8})$")
+# per stored image: {kind: max width} of renditions that came out no smaller than
+# the original and were dropped, so later runs don't decode and re-render them
+_SKIPPED_FILE = "skipped.json"
+
+
+def _existing_variant(d: Path, kind: str) -> Optional[Path]:
+    found = sorted(d.glob(f"{kind}.*"))
+    return found[0] if found else None
+
+
+def _read_skipped(d: Path) -> Dict[str, int]:
+    try:
+        return json.loads((d / _SKIPPED_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_skipped(d: Path, skipped: Dict[str, int]) -> None:
+    tmp = d / f".{_SKIPPED_FILE}.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(skipped, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, d / _SKIPPED_FILE)
+
+
+def make_variants(blob: Path) -> Dict[str, Path]:
+    """
+    Write each rendition next to the stored original. Renditions already in the
+    store, or recorded as skipped at the same width, are not redone; when that
+    covers every kind the original is not even decoded. A rendition that would
+    not be smaller than the original is not kept (and is recorded as skipped),
+    so consumers simply fall back to the original. No-op if Pillow is missing.
+    """
+    out: Dict[str, Path] = {}
+    skipped = _read_skipped(blob.parent)
+    todo: Dict[str, tuple] = {}
+    for kind, variant in VARIANTS.items():
+        existing = _existing_variant(blob.parent, kind)
+        if existing is not None:
+            out[kind] = existing
+        elif skipped.get(kind) != variant[0]:
+            todo[kind] = variant
+    if not todo:
+        return out
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return out
+
+    original_size = blob.stat().st_size
+    newly_skipped = False
+    with Image.open(blob) as im:
+        im.load()
+        has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+        for kind, (max_w, fmt, ext, opts) in todo.items():
+            if fmt == "JPEG" and has_alpha:     # keep transparency: optimized PNG instead
+                fmt, ext, opts = "PNG", ".png", {"optimize": True}
+            target = blob.parent / f"{kind}{ext}"
+
+            v = im.copy()
+            if v.width > max_w:
+                v = v.resize((max_w, max(1, round(v.height * max_w / v.width))), Image.LANCZOS)
+            if fmt == "JPEG":
+                v = v.convert("RGB")
+            elif v.mode not in ("RGB", "RGBA", "L", "LA"):
+                v = v.convert("RGBA" if has_alpha else "RGB")
+
+            tmp = blob.parent / f".{target.name}.tmp"
+            v.save(tmp, format=fmt, **opts)
+            if tmp.stat().st_size >= original_size:
+                tmp.unlink()
+                skipped[kind] = max_w
+                newly_skipped = True
+                continue
+            os.replace(tmp, target)
+            out[kind] = target
+    if newly_skipped:
+        _write_skipped(blob.parent, skipped)
+    return out
+
+
+def variant_path(path: Path, kind: str) -> Path:
+    """
+    For a placed image (images/<stem>-<hash8>.<ext>) return its `kind` rendition
+    if one exists in the store, else the path itself. Works for any path, so
+    callers never need to special-case legacy or remote-free images.
+    """
+    path = Path(path)
+    m = _HASHED_NAME_RE.search(path.stem)
+    if not m:
+        return path
+    for entry in (path.parent / STORE_DIRNAME).glob(f"{m.group(1)}*"):
+        found = sorted(entry.glob(f"{kind}.*"))
+        if found:
+            return found[0]
+    return path
@@ -0,0 +1,255 @@
+"""
+bwa_jobs.py
+───────────
+In-process job service for BlogForge AI.
+
+Generation runs on a bounded pool of worker threads instead of inside each
+Streamlit script run, so a rerun or a browser refresh only detaches the
+viewer: the job keeps going and can be re-attached by id. Queued jobs are
+dispatched round-robin across owners (one owner per browser session), so one
+user submitting many topics cannot starve everyone else.
+
+Classes:
+    Job          one submitted run: status, timestamps and its event log
+    JobService   queue + worker pool around a compiled graph
+
+Functions:
+    get_job_service()  →  JobService  (process-wide shared instance)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from bisect import bisect_left
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from bwa_backend import app, stream_run
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  JOBS
+# ══════════════════════════════════════════════════════════════
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str
+    inputs: Optional[Dict[str, Any]]        # None resumes config's thread_id from its checkpoint
+    config: Dict[str, Any]
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    last_node: Optional[str] = None
+    error: Optional[str] = None
+    # (kind, payload) as yielded by stream_run, ending with ("final", RunOutcome);
+    # seqs[i] is the position of events[i] in that stream. Token events are dropped
+    # once the job finishes, so positions (what followers resume from) stay stable.
+    events: List[Tuple[str, Any]] = field(default_factory=list)
+    seqs: List[int] = field(default_factory=list)
+    emitted: int = 0
+
+    @property
+    def thread_id(self) -> str:
+        return self.config["configurable"]["thread_id"]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def events_since(self, since: int) -> List[Tuple[str, Any]]:
+        return self.events[bisect_left(self.seqs, since):]
+
+    def compact(self) -> None:
+        """
+        Drop streamed section tokens: each worker's "updates" event carries its
+        finished section and the final event the whole post, so a replay of a
+        finished job doesn't need them.
+        """
+        keep = [i for i, (kind, payload) in enumerate(self.events)
+                if not (kind == "custom" and isinstance(payload, dict) and "section_delta" in payload)]
+        self.events = [self.events[i] for i in keep]
+        self.seqs = [self.seqs[i] for i in keep]
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  SERVICE
+# ══════════════════════════════════════════════════════════════
+
+class JobService:
+    """
+    - submit() enqueues and returns a job id immediately.
+    - status() / events() are cheap snapshots for polling; follow() blocks and
+      yields events as they arrive, replaying from `since`.
+    - At most `max_workers` graphs run at once; finished jobs beyond
+      `keep_finished` are forgotten oldest-first, and finished jobs keep no
+      token events (see Job.compact).
+    """
+
+    def __init__(self, graph_app=app, max_workers: int = 2, keep_finished: int = 200):
+        self.graph_app = graph_app
+        self.max_workers = max(1, max_workers)
+        self.keep_finished = keep_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()    # owner → FIFO, rotated
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+
+    # ── submission ───────────────────────────────────────────
+
+    def submit(self, inputs: Optional[Dict[str, Any]], owner: str = "default",
+               config: Optional[Dict[str, Any]] = None) -> str:
+        cfg = dict(config or {})
+        configurable = dict(cfg.get("configurable") or {})
+        configurable.setdefault("thread_id", uuid.uuid4().hex)
+        cfg["configurable"] = configurable
+        job = Job(id=uuid.uuid4().hex[:12], owner=owner, inputs=inputs, config=cfg)
+        with self._cond:
+            self._jobs[job.id] = job
+            self._queues.setdefault(owner, deque()).append(job)
+            self._ensure_workers()
+            self._cond.notify_all()
+        return job.id
+
+    def resume(self, thread_id: str, owner: str = "default",
+               config: Optional[Dict[str, Any]] = None) -> str:
+        """Submit a job that continues a failed run from its last checkpoint."""
+        cfg = dict(config or {})
+        cfg["configurable"] = {**(cfg.get("configurable") or {}), "thread_id": thread_id}
+        return self.submit(None, owner=owner, config=cfg)
+
+    # ── queries ──────────────────────────────────────────────
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def _position(self, job: Job) -> Optional[int]:
+        """0-based place in dispatch order, following the same round-robin as _next_job."""
+        queues = [list(q) for q in self._queues.values()]
+        pos, depth = 0, 0
+        while any(depth < len(q) for q in queues):
+            for q in queues:
+                if depth < len(q):
+                    if q[depth] is job:
+                        return pos
+                    pos += 1
+            depth += 1
+        return None
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "id": job.id, "owner": job.owner, "status": job.status,
+                "thread_id": job.thread_id, "last_node": job.last_node, "error": job.error,
+                "queue_position": self._position(job) if job.status == QUEUED else None,
+                "created_at": job.created_at, "started_at": job.started_at,
+                "finished_at": job.finished_at, "events": job.emitted,
+            }
+
+    def jobs(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._cond:
+            ids = [j.id for j in self._jobs.values() if owner is None or j.owner == owner]
+        return [s for s in (self.status(i) for i in ids) if s is not None]
+
+    def events(self, job_id: str, since: int = 0) -> List[Tuple[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return [] if job is None else job.events_since(since)
+
+    def follow(self, job_id: str, since: int = 0, poll: float = 1.0) -> Iterator[Tuple[str, Any]]:
+        """Yield the job's events from `since` onward until its final event."""
+        while True:
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    raise KeyError(f"Unknown job: {job_id}")
+                while job.emitted <= since and not job.finished:
+                    self._cond.wait(poll)
+                batch, finished, since = job.events_since(since), job.finished, job.emitted
+            for event in batch:
+                yield event
+            if finished and not batch:
+                return
+
+    # ── workers ──────────────────────────────────────────────
+
+    def _ensure_workers(self) -> None:
+        self._workers = [t for t in self._workers if t.is_alive()]
+        while len(self._workers) < self.max_workers:
+            t = threading.Thread(target=self._work, name=f"bwa-job-{len(self._workers)}", daemon=True)
+            self._workers.append(t)
+            t.start()
+
+    def _next_job(self) -> Job:
+        """Round-robin across owners: take the head of the first queue, rotate that owner last."""
+        with self._cond:
+            while not self._queues:
+                self._cond.wait()
+            owner, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            del self._queues[owner]
+            if queue:
+                self._queues[owner] = queue
+            job.status, job.started_at = RUNNING, time.time()
+            return job
+
+    def _emit(self, job: Job, kind: str, payload: Any) -> None:
+        with self._cond:
+            job.events.append((kind, payload))
+            job.seqs.append(job.emitted)
+            job.emitted += 1
+            if kind == "updates" and isinstance(payload, dict) and payload:
+                job.last_node = next(reversed(payload))
+            elif kind == "final":
+                job.status = DONE if payload.ok else FAILED
+                job.error = None if payload.ok else repr(payload.error)
+                job.finished_at = time.time()
+                job.compact()
+            self._cond.notify_all()
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            try:
+                for kind, payload in stream_run(self.graph_app, job.inputs, config=job.config):
+                    self._emit(job, kind, payload)
+            except Exception as e:              # stream_run reports graph errors itself
+                with self._cond:
+                    job.status, job.error, job.finished_at = FAILED, repr(e), time.time()
+                    job.compact()
+                    self._cond.notify_all()
+            self._forget_old()
+
+    def _forget_old(self) -> None:
+        with self._cond:
+            finished = [j.id for j in self._jobs.values() if j.finished]
+            for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self._jobs[job_id]
+
+
+_service: Optional[JobService] = None
+_service_lock = threading.Lock()
+
+
+def get_job_service() -> JobService:
+    """
+    One queue and worker pool per process, shared by every Streamlit session.
+    Env: BWA_JOB_WORKERS (concurrent generations, default 2).
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = JobService(max_workers=int(os.getenv("BWA_JOB_WORKERS", "2")))
+        return _service
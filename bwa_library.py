@@ -0,0 +1,274 @@
+"""
+bwa_library.py
+──────────────
+Persistent index of generated blog posts for BlogForge AI.
+
+Posts are plain <slug>.md files in the working directory. The sidebar used
+to glob and read them on every rerun; instead, generate_and_place_images
+records each post here as it is written, and the UI pages through the index
+(newest first) without touching the files. Posts written by other means
+(older versions, copied in by hand) are picked up by sync(), which runs once
+per process and only reads files whose mtime changed.
+
+Titles, headings, body and evidence URLs are also kept in a full-text index
+(SQLite FTS5, ranked by bm25), updated on the same writes. Without FTS5 in
+the sqlite build, search() falls back to LIKE over a plain table (substring
+matches, unranked, linear time).
+
+Classes:
+    PostInfo   one indexed post (title, slug, word count, images, topic, as_of, mtime)
+    Library    SQLite-backed index (+ full-text search) over the *.md files of one directory
+
+Functions:
+    get_library()  →  Library  (process-wide shared instance, synced on first use)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from bwa_cache import cache_dir
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  POST METADATA
+# ══════════════════════════════════════════════════════════════
+
+_MD_IMG_RE = re.compile(r"!\[[^\]]*\]\(([^)\s]+)")
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_URL_RE = re.compile(r"https?://[^\s)\]>\"']+")
+
+
+@dataclass(frozen=True)
+class PostInfo:
+    name: str                   # file name, relative to the library root
+    title: str
+    slug: str
+    words: int
+    images: Tuple[str, ...]
+    topic: str
+    as_of: str
+    mtime: float
+
+
+def _title(md: str, fallback: str) -> str:
+    for line in md.splitlines():
+        if line.startswith("# "):
+            return line[2:].strip() or fallback
+    return fallback
+
+
+def _words(md: str) -> int:
+    return len(re.sub(r"[#*`>\[\]()!_~\-]", " ", md).split())
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  INDEX
+# ══════════════════════════════════════════════════════════════
+
+_COLUMNS = "name, title, slug, words, images, topic, as_of, mtime"
+# bm25 column weights for (name, title, headings, body, urls); name is UNINDEXED
+_BM25 = "bm25(posts_fts, 0, 10.0, 5.0, 1.0, 2.0)"
+
+
+def _fts_query(text: str) -> str:
+    """User input → FTS5 query: every word must match, the last one as a prefix."""
+    terms = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{t}"' + ("*" if i == len(terms) - 1 else "") for i, t in enumerate(terms))
+
+
+class Library:
+    """
+    One row per post file. Safe to share between threads (one connection
+    guarded by a lock); WAL lets a batch process and the UI index at once.
+    """
+
+    def __init__(self, root: Path | str = ".", db_path: Optional[Path | str] = None):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path or cache_dir() / "library.sqlite3"),
+                                     check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " name TEXT PRIMARY KEY, title TEXT NOT NULL, slug TEXT NOT NULL,"
+            " words INTEGER NOT NULL, images TEXT NOT NULL,"
+            " topic TEXT NOT NULL DEFAULT '', as_of TEXT NOT NULL DEFAULT '',"
+            " mtime REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS posts_mtime ON posts(mtime)")
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+                " name UNINDEXED, title, headings, body, urls, tokenize = 'porter unicode61')"
+            )
+            self.text_table = "posts_fts"
+        except sqlite3.OperationalError:            # sqlite built without FTS5
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts_text ("
+                " name TEXT PRIMARY KEY, title TEXT, headings TEXT, body TEXT, urls TEXT)"
+            )
+            self.text_table = "posts_text"
+        self.fts = self.text_table == "posts_fts"
+
+    @staticmethod
+    def _row(row: tuple) -> PostInfo:
+        name, title, slug, words, images, topic, as_of, mtime = row
+        return PostInfo(name, title, slug, words, tuple(json.loads(images)), topic, as_of, mtime)
+
+    # ── writes ───────────────────────────────────────────────
+
+    def record(self, path: Path | str, md: str, topic: str = "", as_of: str = "",
+               urls: Sequence[str] = ()) -> PostInfo:
+        """
+        Index a post that was just written to `path` (its content is `md`).
+        `urls` are the run's evidence URLs; links in the body are added to them.
+        Empty topic / as_of / urls keep whatever the row already had.
+        """
+        path = Path(path)
+        info = PostInfo(
+            name=path.name, title=_title(md, path.stem), slug=path.stem, words=_words(md),
+            images=tuple(dict.fromkeys(_MD_IMG_RE.findall(md))),
+            topic=topic, as_of=as_of, mtime=path.stat().st_mtime,
+        )
+        headings = "\n".join(_HEADING_RE.findall(md))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._upsert_locked(info, headings, md, urls)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return info
+
+    def _upsert_locked(self, info: PostInfo, headings: str, md: str, urls: Sequence[str]) -> None:
+        old = self._conn.execute(f"SELECT urls FROM {self.text_table} WHERE name = ?", (info.name,)).fetchone()
+        kept = urls or ((old[0] or "").split() if old else [])
+        all_urls = " ".join(dict.fromkeys([*kept, *_URL_RE.findall(md)]))
+        self._conn.execute(
+            f"INSERT INTO posts ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET"
+            " title = excluded.title, slug = excluded.slug, words = excluded.words,"
+            " images = excluded.images, mtime = excluded.mtime,"
+            " topic = CASE WHEN excluded.topic = '' THEN posts.topic ELSE excluded.topic END,"
+            " as_of = CASE WHEN excluded.as_of = '' THEN posts.as_of ELSE excluded.as_of END",
+            (info.name, info.title, info.slug, info.words, json.dumps(list(info.images)),
+             info.topic, info.as_of, info.mtime),
+        )
+        # FTS5 has no upsert: replace the document
+        self._conn.execute(f"DELETE FROM {self.text_table} WHERE name = ?", (info.name,))
+        self._conn.execute(
+            f"INSERT INTO {self.text_table} (name, title, headings, body, urls) VALUES (?, ?, ?, ?, ?)",
+            (info.name, info.title, headings, md, all_urls),
+        )
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM posts WHERE name = ?", (name,))
+            self._conn.execute(f"DELETE FROM {self.text_table} WHERE name = ?", (name,))
+
+    def sync(self) -> int:
+        """
+        Reconcile the index with the *.md files under root: index new or
+        modified files (and posts missing from the text index), drop rows
+        whose file is gone. Returns rows changed.
+        """
+        on_disk = {p.name: p.stat().st_mtime for p in self.root.glob("*.md") if p.is_file()}
+        with self._lock:
+            all_names = {r[0] for r in self._conn.execute("SELECT name FROM posts").fetchall()}
+            indexed = dict(self._conn.execute(      # rows without a text document get re-read
+                f"SELECT name, mtime FROM posts WHERE name IN (SELECT name FROM {self.text_table})"
+            ).fetchall())
+        changed = 0
+        for name in all_names - on_disk.keys():
+            self.forget(name)
+            changed += 1
+        for name, mtime in on_disk.items():
+            if indexed.get(name) == mtime:
+                continue
+            path = self.root / name
+            try:
+                self.record(path, path.read_text(encoding="utf-8", errors="replace"))
+            except OSError:
+                continue                # removed between glob and read
+            changed += 1
+        return changed
+
+    # ── reads ────────────────────────────────────────────────
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def page(self, limit: int = 20, offset: int = 0) -> List[PostInfo]:
+        """Posts newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM posts ORDER BY mtime DESC, name LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def get(self, name: str) -> Optional[PostInfo]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM posts WHERE name = ?", (name,)).fetchone()
+        return self._row(row) if row else None
+
+    def _match(self, query: str) -> Tuple[str, list]:
+        """FROM/WHERE clause + params selecting posts that match every word of `query`."""
+        if self.fts:
+            return ("posts_fts JOIN posts p ON p.name = posts_fts.name WHERE posts_fts MATCH ?",
+                    [_fts_query(query)])
+        # \w+ terms can't hold % or \, but "_" is a LIKE wildcard
+        patterns = ["%" + t.replace("_", "!_") + "%" for t in re.findall(r"\w+", query.lower())]
+        like = "(" + " OR ".join(f"t.{c} LIKE ? ESCAPE '!'" for c in ("title", "headings", "body", "urls")) + ")"
+        params = [pat for pat in patterns for _ in range(4)]
+        return (f"posts_text t JOIN posts p ON p.name = t.name WHERE {' AND '.join([like] * len(patterns))}",
+                params)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[PostInfo]:
+        """Posts matching every word of `query` (last word as a prefix), best first."""
+        if not re.search(r"\w", query):
+            return []
+        clause, params = self._match(query)
+        order = _BM25 if self.fts else "p.mtime DESC"
+        cols = ", ".join(f"p.{c}" for c in _COLUMNS.split(", "))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {cols} FROM {clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                                      (*params, limit, offset)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def search_count(self, query: str) -> int:
+        if not re.search(r"\w", query):
+            return 0
+        clause, params = self._match(query)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {clause}", params).fetchone()[0]
+
+    def path(self, info: PostInfo) -> Path:
+        return self.root / info.name
+
+
+_library: Optional[Library] = None
+_library_lock = threading.Lock()
+
+
+def get_library() -> Library:
+    """
+    Index of the posts in the working directory, synced with the files once
+    per process. Env: BWA_LIBRARY_DB (default <cache dir>/library.sqlite3).
+    """
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = Library(".", os.getenv("BWA_LIBRARY_DB") or None)
+            _library.sync()
+        return _library
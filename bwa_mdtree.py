@@ -0,0 +1,429 @@
+"""
+bwa_mdtree.py
+─────────────
+One markdown parse for every BlogForge AI renderer.
+
+The Preview tab, the HTML export and the PDF export all walk the same
+document tree: blocks (headings, paragraphs, code, quotes, lists, tables,
+rules, images with their caption line) holding inline spans (text, code,
+strong, emphasis, links, images, line breaks). parse() is memoized on the
+markdown text, so a rerun — or an HTML and a PDF export of the same post —
+parses it once.
+
+Covers the subset the pipeline writes: ATX headings, ``` / ~~~ fences,
+nested "-" / "*" / "+" / "1." lists, ">" quotes (which may hold any block),
+pipe tables, and `![alt](src)` image lines followed by an optional
+`*caption*` line (bwa_images.place_images). Anything else is a paragraph.
+
+Classes:
+    Document                         tuple of top-level blocks
+    Heading, Paragraph, CodeBlock, Quote, ListBlock, ListItem, Table, Rule, Image
+    Text, Code, Strong, Emph, Link, InlineImage, LineBreak   (inline spans)
+
+Functions:
+    parse(md)            →  Document  (cached; treat as immutable)
+    parse_inline(text)   →  Tuple[Inline, ...]
+    plain_text(spans)    →  str
+    heading_slug(text)   →  str  (anchor id, like python-markdown's toc extension)
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  NODES
+# ══════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class Text:
+    text: str
+
+
+@dataclass(frozen=True)
+class Code:
+    text: str
+
+
+@dataclass(frozen=True)
+class Strong:
+    children: Tuple["Inline", ...]
+
+
+@dataclass(frozen=True)
+class Emph:
+    children: Tuple["Inline", ...]
+
+
+@dataclass(frozen=True)
+class Link:
+    children: Tuple["Inline", ...]
+    href: str
+
+
+@dataclass(frozen=True)
+class InlineImage:
+    alt: str
+    src: str
+
+
+@dataclass(frozen=True)
+class LineBreak:
+    pass
+
+
+Inline = Union[Text, Code, Strong, Emph, Link, InlineImage, LineBreak]
+Spans = Tuple[Inline, ...]
+
+# every block keeps `source`, its markdown as written, so a renderer that
+# only needs to split the document (the Streamlit preview) can pass it through
+
+
+@dataclass(frozen=True)
+class Heading:
+    level: int
+    spans: Spans
+    source: str
+
+
+@dataclass(frozen=True)
+class Paragraph:
+    spans: Spans
+    source: str
+
+
+@dataclass(frozen=True)
+class CodeBlock:
+    lang: str
+    text: str
+    source: str
+
+
+@dataclass(frozen=True)
+class Quote:
+    children: Tuple["Block", ...]
+    source: str
+
+
+@dataclass(frozen=True)
+class ListItem:
+    spans: Spans                            # the item's first paragraph
+    children: Tuple["Block", ...]           # indented blocks under it (nested lists, code, …)
+
+
+@dataclass(frozen=True)
+class ListBlock:
+    ordered: bool
+    start: int
+    items: Tuple[ListItem, ...]
+    source: str
+
+
+@dataclass(frozen=True)
+class Table:
+    header: Tuple[Spans, ...]
+    align: Tuple[str, ...]                  # "left" | "center" | "right" | "" per column
+    rows: Tuple[Tuple[Spans, ...], ...]
+    source: str
+
+
+@dataclass(frozen=True)
+class Rule:
+    source: str
+
+
+@dataclass(frozen=True)
+class Image:
+    src: str
+    alt: str
+    caption: str
+    source: str
+
+
+Block = Union[Heading, Paragraph, CodeBlock, Quote, ListBlock, Table, Rule, Image]
+
+
+@dataclass(frozen=True)
+class Document:
+    blocks: Tuple[Block, ...]
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  INLINE PARSER
+# ══════════════════════════════════════════════════════════════
+
+_INLINE_RE = re.compile(r"""
+    (?=[\\`!\[<*_\n])      # only try the alternatives where one could start
+    (?:
+      \\(?P<esc>[\\`*_{}\[\]()#+\-.!|>~])
+    | (?P<tick>`+)(?P<code>.+?)(?P=tick)
+    | !\[(?P<img_alt>[^\]]*)\]\((?P<img_src>[^)\s]+)(?:\s+"[^"]*")?\)
+    | \[(?P<link_text>[^\]]+)\]\((?P<link_href>[^)\s]+)(?:\s+"[^"]*")?\)
+    | <(?P<auto>https?://[^>\s]+)>
+    | \*\*(?P<strong>.+?)\*\* | __(?P<strong_u>.+?)__
+    | \*(?P<em>[^*\s](?:.*?[^*\s])?)\* | (?<!\w)_(?P<em_u>[^_\s](?:.*?[^_\s])?)_(?!\w)
+    | (?P<br>\n)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+
+_INLINE_SPECIAL = re.compile(r"[\\`*_!\[<\n]")
+
+
+def parse_inline(text: str) -> Spans:
+    if not _INLINE_SPECIAL.search(text):            # plain text: most table cells, many items
+        return (Text(text),) if text else ()
+    spans: List[Inline] = []
+    buf: List[str] = []
+    pos = 0
+    for m in _INLINE_RE.finditer(text):
+        buf.append(text[pos:m.start()])
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "esc":
+            buf.append(m.group("esc"))
+            continue
+        if any(buf):
+            spans.append(Text("".join(buf)))
+        buf.clear()
+        if kind == "code":
+            spans.append(Code(m.group("code").strip()))
+        elif kind == "img_src":
+            spans.append(InlineImage(m.group("img_alt"), m.group("img_src")))
+        elif kind == "link_href":
+            spans.append(Link(parse_inline(m.group("link_text")), m.group("link_href")))
+        elif kind == "auto":
+            spans.append(Link((Text(m.group("auto")),), m.group("auto")))
+        elif kind in ("strong", "strong_u"):
+            spans.append(Strong(parse_inline(m.group(kind))))
+        elif kind in ("em", "em_u"):
+            spans.append(Emph(parse_inline(m.group(kind))))
+        else:
+            spans.append(LineBreak())
+    buf.append(text[pos:])
+    if any(buf):
+        spans.append(Text("".join(buf)))
+    return tuple(spans)
+
+
+def plain_text(spans: Spans) -> str:
+    out: List[str] = []
+    for s in spans:
+        if isinstance(s, (Text, Code)):
+            out.append(s.text)
+        elif isinstance(s, (Strong, Emph, Link)):
+            out.append(plain_text(s.children))
+        elif isinstance(s, InlineImage):
+            out.append(s.alt)
+        elif isinstance(s, LineBreak):
+            out.append(" ")
+    return "".join(out)
+
+
+def heading_slug(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    text = re.sub(r"[^\w\s-]", "", text).strip().lower()
+    return re.sub(r"[-\s]+", "-", text)
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  BLOCK PARSER
+# ══════════════════════════════════════════════════════════════
+
+# One pass classifies every line; the parser then branches on the token kind
+# and only runs a detail regex on lines that need their parts (headings, items, …).
+# Alternatives are ordered by precedence ("---" is a rule, not a list item or a
+# table delimiter) and each holds exactly one named group, so `lastgroup` is the kind.
+_LINE_RE = re.compile(r"""
+      (?P<blank>\s*$)
+    | (?P<fence>\s{0,3}(?:`{3,}|~{3,}))
+    | (?P<heading>\s{0,3}\#{1,6}\s)
+    | (?P<rule>\s{0,3}(?:(?:-\s*){3,}|(?:\*\s*){3,}|(?:_\s*){3,})$)
+    | (?P<quote>\s{0,3}>)
+    | (?P<item>\s*(?:[-*+]|\d{1,9}[.)])\s+\S)
+    | (?P<image>\s*!\[[^\]]*\]\([^)\s]+(?:\s+"[^"]*")?\)\s*$)
+    | (?P<delim>\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$)
+    | (?P<pipe>[^|]*\|)
+""", re.VERBOSE)
+
+_FENCE_RE   = re.compile(r"^\s{0,3}(?P<fence>`{3,}|~{3,})\s*(?P<lang>[^`\s]*)")
+_HEADING_RE = re.compile(r"^\s{0,3}(?P<hashes>#{1,6})\s+(?P<text>.*?)(?:\s+#+)?\s*$")
+_QUOTE_RE   = re.compile(r"^\s{0,3}> ?")
+_ITEM_RE    = re.compile(r"^(?P<indent>\s*)(?P<marker>[-*+]|(?P<num>\d{1,9})[.)])\s+(?P<text>.*)$")
+_IMAGE_RE   = re.compile(r"^\s*!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+\"[^\"]*\")?\)\s*$")
+_CAPTION_RE = re.compile(r"^\s*\*(?P<cap>[^*].*?)\*\s*$")
+
+# kinds that end a paragraph (a "pipe" line does too when a "delim" line follows)
+_INTERRUPTS = frozenset(("blank", "fence", "heading", "rule", "quote", "item", "image"))
+
+
+def _tokenize(lines: List[str]) -> List[str]:
+    match = _LINE_RE.match
+    return [m.lastgroup if m else "text" for m in map(match, lines)]    # type: ignore[misc]
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" \t"))
+
+
+def _cells(row: str) -> List[str]:
+    row = row.strip()
+    if row.startswith("|"):
+        row = row[1:]
+    if row.endswith("|") and not row.endswith("\\|"):
+        row = row[:-1]
+    return [c.strip().replace("\\|", "|") for c in re.split(r"(?<!\\)\|", row)]
+
+
+def _is_table(kinds: List[str], i: int) -> bool:
+    return kinds[i] == "pipe" and i + 1 < len(kinds) and kinds[i + 1] == "delim"
+
+
+def _parse_list(lines: List[str], kinds: List[str], i: int) -> Tuple[ListBlock, int]:
+    first = _ITEM_RE.match(lines[i])
+    assert first is not None
+    base = len(first.group("indent"))
+    ordered = first.group("num") is not None
+    begin, n = i, len(lines)
+    items: List[ListItem] = []
+    while i < n and kinds[i] == "item":
+        m = _ITEM_RE.match(lines[i])
+        assert m is not None
+        if len(m.group("indent")) > base + 1 or (m.group("num") is not None) != ordered:
+            break
+        text_lines = [m.group("text")]
+        content = len(m.group("indent")) + len(m.group("marker")) + 1
+        body: List[str] = []
+        i += 1
+        while i < n:
+            kind = kinds[i]
+            if kind == "blank":
+                # blank lines stay inside the item only if indented content follows
+                j = i + 1
+                while j < n and kinds[j] == "blank":
+                    j += 1
+                if j < n and _indent(lines[j]) > base:
+                    body.extend([""] * (j - i))
+                    i = j
+                    continue
+                break
+            if _indent(lines[i]) > base:
+                body.append(lines[i])
+            elif not body and kind not in _INTERRUPTS and not _is_table(kinds, i):
+                text_lines.append(lines[i].strip())     # lazy continuation of the item's text
+            else:
+                break
+            i += 1
+        children: List[Block] = []
+        if body:
+            # dedent to the item's content column; a leading indented paragraph
+            # ("- a\n  more text") belongs to the item's own text
+            strip = min([content] + [_indent(b) for b in body if b])
+            children = _parse_blocks([b[strip:] for b in body])
+            if children and isinstance(children[0], Paragraph) and body[0]:
+                text_lines.append(children.pop(0).source.strip())
+        items.append(ListItem(parse_inline("\n".join(text_lines)), tuple(children)))
+        if i < n and kinds[i] == "blank":
+            j = i + 1
+            while j < n and kinds[j] == "blank":
+                j += 1
+            if j < n and kinds[j] == "item":
+                i = j                   # loose list: the loop re-checks indent and kind
+                continue
+            break
+    return ListBlock(ordered, int(first.group("num") or 1), tuple(items), "\n".join(lines[begin:i]).rstrip()), i
+
+
+def _parse_blocks(lines: List[str]) -> List[Block]:
+    kinds = _tokenize(lines)
+    blocks: List[Block] = []
+    n = len(lines)
+    i = 0
+    while i < n:
+        kind = kinds[i]
+        line = lines[i]
+        if kind == "blank":
+            i += 1
+
+        elif kind == "fence":
+            m = _FENCE_RE.match(line)
+            assert m is not None
+            close = m.group("fence")
+            begin = i
+            i += 1
+            while i < n and not lines[i].lstrip().startswith(close):
+                i += 1
+            blocks.append(CodeBlock(m.group("lang"), "\n".join(lines[begin + 1:i]), "\n".join(lines[begin:i + 1])))
+            i = min(i + 1, n)                           # closing fence (or EOF)
+
+        elif kind == "heading":
+            m = _HEADING_RE.match(line)
+            assert m is not None
+            blocks.append(Heading(len(m.group("hashes")), parse_inline(m.group("text")), line))
+            i += 1
+
+        elif kind == "rule":
+            blocks.append(Rule(line))
+            i += 1
+
+        elif kind == "quote":
+            begin = i
+            while i < n and kinds[i] == "quote":
+                i += 1
+            inner = [_QUOTE_RE.sub("", q, count=1) for q in lines[begin:i]]
+            blocks.append(Quote(tuple(_parse_blocks(inner)), "\n".join(lines[begin:i])))
+
+        elif kind == "image":
+            m = _IMAGE_RE.match(line)
+            assert m is not None
+            begin = i
+            caption = ""
+            i += 1
+            if i < n and kinds[i] == "text":
+                cap = _CAPTION_RE.match(lines[i])
+                if cap:
+                    caption = cap.group("cap").strip()
+                    i += 1
+            blocks.append(Image(m.group("src"), m.group("alt").strip(), caption, "\n".join(lines[begin:i])))
+
+        elif kind == "item":
+            block, i = _parse_list(lines, kinds, i)
+            blocks.append(block)
+
+        elif _is_table(kinds, i):
+            begin = i
+            header = _cells(line)
+            align = []
+            for spec in _cells(lines[i + 1]):
+                left, right = spec.startswith(":"), spec.endswith(":")
+                align.append("center" if left and right else "right" if right else "left" if left else "")
+            width = len(header)
+            rows: List[Tuple[Spans, ...]] = []
+            i += 2
+            while i < n and kinds[i] == "pipe":
+                cells = (_cells(lines[i]) + [""] * width)[:width]
+                rows.append(tuple(parse_inline(c) for c in cells))
+                i += 1
+            blocks.append(Table(tuple(parse_inline(c) for c in header), tuple(align),
+                                tuple(rows), "\n".join(lines[begin:i])))
+
+        else:                                           # text (or a stray pipe / delim line)
+            begin = i
+            i += 1
+            while i < n and kinds[i] not in _INTERRUPTS and not _is_table(kinds, i):
+                i += 1
+            para = "\n".join(l.strip() for l in lines[begin:i])
+            blocks.append(Paragraph(parse_inline(para), "\n".join(lines[begin:i])))
+    return blocks
+
+
+@lru_cache(maxsize=64)
+def parse(md: str) -> Document:
+    """Parse markdown into a Document. Cached per text; never mutate the result."""
+    return Document(tuple(_parse_blocks(md.replace("\r\n", "\n").split("\n"))))
+
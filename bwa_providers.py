@@ -0,0 +1,389 @@
+"""
+bwa_providers.py
+────────────────
+Pluggable LLM, search and image providers for BlogForge AI.
+
+    BWA_PROVIDER=fake streamlit run bwa_frontend.py      # full runs, no network, no keys
+
+BWA_PROVIDER selects "live" (default: Gemini + Tavily) or "fake" for all
+three; BWA_LLM_PROVIDER / BWA_SEARCH_PROVIDER / BWA_IMAGE_PROVIDER override
+it per kind. The fakes are deterministic (same input → same output) and
+shaped like the real thing, so graph overhead, caching, exports and
+concurrency can be benchmarked locally:
+
+    BWA_FAKE_LATENCY        "min,max" seconds added per call   (default "0.05,0.3")
+    BWA_FAKE_FAILURE_RATE   share of calls raising a retryable error (default 0)
+    BWA_FAKE_TOKEN_SCALE    multiplier on reported usage_metadata tokens (default 1)
+    BWA_FAKE_SEED           seed for latency / failure draws (default 0)
+
+The Gemini rate limiter still applies to fake calls; set BWA_GEMINI_RPM=0 and
+BWA_GEMINI_TPM=0 to measure pure graph overhead.
+
+Classes:
+    FakeChatModel     invoke / ainvoke / stream / astream / with_structured_output
+    FakeSearchEngine  TavilyEngine-compatible search_many with synthetic hits
+
+Functions:
+    provider(kind)            →  "live" | "fake"
+    make_llm(model)           →  ChatGoogleGenerativeAI | FakeChatModel
+    get_search_engine()       →  TavilyEngine | FakeSearchEngine | None (live without a key)
+    image_backend(live)       →  Callable[[str], bytes]
+    fake_image_bytes(prompt)  →  bytes (PNG)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from pydantic import BaseModel
+
+from bwa_resilience import FaultInjector
+
+
+def provider(kind: str) -> str:
+    """kind ∈ llm | search | image. Env: BWA_<KIND>_PROVIDER, falling back to BWA_PROVIDER."""
+    value = os.getenv(f"BWA_{kind.upper()}_PROVIDER") or os.getenv("BWA_PROVIDER") or "live"
+    return "fake" if value.strip().lower() == "fake" else "live"
+
+
+def _faults(fn: Callable[..., Any], salt: str) -> FaultInjector:
+    lo, _, hi = os.getenv("BWA_FAKE_LATENCY", "0.05,0.3").partition(",")
+    seed = int(os.getenv("BWA_FAKE_SEED", "0"))
+    return FaultInjector(
+        fn,
+        failure_rate=float(os.getenv("BWA_FAKE_FAILURE_RATE", "0")),
+        latency=(float(lo or 0), float(hi or lo or 0)),
+        seed=seed ^ int(hashlib.sha256(salt.encode()).hexdigest()[:8], 16),
+    )
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:12], 16)
+
+
+def _line(text: str, label: str, default: str = "") -> str:
+    m = re.search(rf"^{re.escape(label)}:\s*(.*)$", text, re.MULTILINE)
+    return m.group(1).strip() if m else default
+
+
+_WORDS = ("system latency throughput model pipeline cache token request worker queue "
+          "evidence benchmark memory batch schedule index retrieval context budget "
+          "trade-off failure retry signal metric baseline").split()
+
+
+def _sentence(seed: int, n: int) -> str:
+    words = [_WORDS[(seed >> (i % 40)) % len(_WORDS) if i % 3 else (seed + i) % len(_WORDS)] for i in range(n)]
+    return " ".join(words).capitalize() + "."
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  FAKE LLM
+# ══════════════════════════════════════════════════════════════
+
+def _fake_router(text: str) -> Dict[str, Any]:
+    topic = _line(text, "Topic", "the topic")
+    lowered = topic.lower()
+    if re.search(r"\b(news|latest|this week|roundup|today)\b", lowered):
+        mode = "open_book"
+    elif re.search(r"\b(20\d\d|vs|versus|compare|best|new)\b", lowered):
+        mode = "hybrid"
+    else:
+        mode = "closed_book"
+    research = mode != "closed_book"
+    return {
+        "needs_research": research,
+        "mode": mode,
+        "reason": f"[fake] keyword routing chose {mode}.",
+        "queries": [f"{topic} {suffix}" for suffix in ("overview", "recent developments", "benchmarks")] if research else [],
+        "max_results_per_query": 5,
+    }
+
+
+def _fake_plan(text: str) -> Dict[str, Any]:
+    topic = _line(text, "Topic", "The Topic")
+    mode = _line(text, "Mode", "closed_book")
+    seed = _digest(topic)
+    angles = ["Why it matters", "Core concepts", "How it works", "Trade-offs", "In practice", "Pitfalls", "What's next"]
+    count = 5 + seed % 3
+    research = mode in ("hybrid", "open_book")
+    return {
+        "blog_title": topic.strip().title() or "Untitled",
+        "audience": "software engineers",
+        "tone": "practical",
+        "blog_kind": "news_roundup" if "news_roundup" in text or mode == "open_book" else "explainer",
+        "constraints": [],
+        "tasks": [
+            {
+                "id": i + 1,
+                "title": f"{angles[i]}: {topic}"[:80],
+                "goal": f"Understand {angles[i].lower()} for {topic}.",
+                "bullets": [f"{angles[i]} point {j + 1}" for j in range(3 + (seed >> i) % 2)],
+                "target_words": 180 + (seed >> (2 * i)) % 200,
+                "tags": [angles[i].split()[0].lower()],
+                "requires_research": research,
+                "requires_citations": research,
+                "requires_code": i == 2 and not research,
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def _fake_evidence(text: str) -> Dict[str, Any]:
+    """Echo the raw search hits the research node sent (JSON lines) as EvidenceItems."""
+    items = []
+    for ln in text.splitlines():
+        ln = ln.strip()
+        if ln.startswith("{") and '"url"' in ln:
+            try:
+                r = json.loads(ln)
+            except json.JSONDecodeError:
+                continue
+            items.append({"title": r.get("title") or r["url"], "url": r["url"],
+                          "published_at": r.get("published_at"), "snippet": (r.get("snippet") or "")[:200]})
+    return {"evidence": items[:12]}
+
+
+def _fake_inline_images(text: str) -> Dict[str, Any]:
+    _, _, md = text.partition("Insert placeholders + propose image prompts.\n\n")
+    blocks = md.split("\n\n")
+    # after the first paragraph that follows the first "## " heading
+    at = next((i + 1 for i, b in enumerate(blocks) if b.startswith("## ")), len(blocks))
+    blocks.insert(min(at + 1, len(blocks)), "[[IMAGE_1]]")
+    topic = _line(text, "Topic", "topic")
+    return {
+        "md_with_placeholders": "\n\n".join(blocks),
+        "images": [{"placeholder": "[[IMAGE_1]]", "filename": "overview_diagram.png",
+                    "alt": f"Diagram of {topic}", "caption": f"How {topic} fits together",
+                    "prompt": f"Clean technical diagram explaining {topic}, short labels"}],
+    }
+
+
+def _fake_anchored_images(text: str) -> Dict[str, Any]:
+    sections = len(re.findall(r"^\[\d+\] ## ", text, re.MULTILINE))
+    topic = _line(text, "Topic", "topic")
+    images = []
+    for n, section in enumerate(sorted({1, max(1, sections // 2 + 1)}), start=1):
+        if section > sections:
+            break
+        images.append({"anchor": {"section": section, "paragraph": 1},
+                       "filename": f"figure_{n}.png", "alt": f"Figure {n} for {topic}",
+                       "caption": f"Figure {n}: {topic}",
+                       "prompt": f"Technical diagram {n} about {topic}, minimal, labeled"})
+    return {"images": images}
+
+
+_STRUCTURED: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    "RouterDecision": _fake_router,
+    "Plan": _fake_plan,
+    "EvidencePack": _fake_evidence,
+    "GlobalImagePlan": _fake_inline_images,
+    "ImagePlacementPlan": _fake_anchored_images,
+}
+
+
+def _fake_section(text: str) -> str:
+    title = _line(text, "Section title", "Section")
+    target = int(re.sub(r"\D", "", _line(text, "Target words", "200")) or 200)
+    bullets = re.findall(r"^- (.+)$", text.partition("Bullets:")[2].partition("\n\n")[0], re.MULTILINE)
+    urls = re.findall(r"\| (https?://\S+) \|", text)
+    seed = _digest(title)
+    per_para = max(20, target // max(1, len(bullets) or 1))
+    paras = []
+    for i, bullet in enumerate(bullets or [title]):
+        body = " ".join(_sentence(seed + i * 7 + k, 12) for k in range(max(1, per_para // 12)))
+        cite = f" ([Source]({urls[i % len(urls)]}))" if urls else ""
+        paras.append(f"**{bullet}.** {body}{cite}")
+    if _line(text, "requires_code") == "True":
+        paras.append("```python\ndef example():\n    return \"fake\"\n```")
+    return f"## {title}\n\n" + "\n\n".join(paras)
+
+
+def _messages_text(messages: Sequence[Any]) -> str:
+    return "\n".join(str(getattr(m, "content", m)) for m in messages)
+
+
+def _usage(messages: Sequence[Any], output: str) -> Dict[str, int]:
+    scale = float(os.getenv("BWA_FAKE_TOKEN_SCALE", "1"))
+    inp = int(len(_messages_text(messages)) / 4 * scale)
+    out = int(len(output) / 4 * scale)
+    return {"input_tokens": inp, "output_tokens": out, "total_tokens": inp + out}
+
+
+def _apply(fn: Callable[[Sequence[Any]], Any], messages: Sequence[Any]) -> Any:
+    return fn(messages)
+
+
+async def _aapply(fn: Callable[[Sequence[Any]], Any], messages: Sequence[Any]) -> Any:
+    return fn(messages)
+
+
+class _FakeStructured:
+    def __init__(self, model: "FakeChatModel", schema: Type[BaseModel], include_raw: bool):
+        if schema.__name__ not in _STRUCTURED:
+            raise NotImplementedError(f"FakeChatModel has no generator for {schema.__name__}")
+        self.model, self.schema, self.include_raw = model, schema, include_raw
+
+    def _respond(self, messages: Sequence[Any]) -> Any:
+        parsed = self.schema.model_validate(_STRUCTURED[self.schema.__name__](_messages_text(messages)))
+        raw = AIMessage(content=parsed.model_dump_json(), usage_metadata=_usage(messages, parsed.model_dump_json()))
+        return {"raw": raw, "parsed": parsed, "parsing_error": None} if self.include_raw else parsed
+
+    def invoke(self, messages: Sequence[Any], *args: Any, **kwargs: Any) -> Any:
+        return self.model._call(self._respond, messages)
+
+    async def ainvoke(self, messages: Sequence[Any], *args: Any, **kwargs: Any) -> Any:
+        return await self.model._acall(self._respond, messages)
+
+
+class FakeChatModel:
+    """
+    Duck-typed stand-in for ChatGoogleGenerativeAI covering what bwa_backend uses.
+    Structured calls are dispatched on the schema name; plain calls write a worker
+    section from the prompt's title, bullets, target words and evidence URLs.
+    """
+
+    def __init__(self, model: str = "fake"):
+        self.model = model
+        self._faults = _faults(_apply, "llm")
+        self._afaults = _faults(_aapply, "llm")
+
+    def _call(self, fn: Callable[[Sequence[Any]], Any], messages: Sequence[Any]) -> Any:
+        return self._faults(fn, messages)
+
+    async def _acall(self, fn: Callable[[Sequence[Any]], Any], messages: Sequence[Any]) -> Any:
+        return await self._afaults.acall(fn, messages)
+
+    def _text(self, messages: Sequence[Any]) -> AIMessage:
+        content = _fake_section(_messages_text(messages))
+        return AIMessage(content=content, usage_metadata=_usage(messages, content))
+
+    def with_structured_output(self, schema: Type[BaseModel], include_raw: bool = False, **kwargs: Any) -> _FakeStructured:
+        return _FakeStructured(self, schema, include_raw)
+
+    def invoke(self, messages: Sequence[Any], *args: Any, **kwargs: Any) -> AIMessage:
+        return self._call(self._text, messages)
+
+    async def ainvoke(self, messages: Sequence[Any], *args: Any, **kwargs: Any) -> AIMessage:
+        return await self._acall(self._text, messages)
+
+    @staticmethod
+    def _chunks(msg: AIMessage) -> List[AIMessageChunk]:
+        pieces = re.findall(r"\S+\s*", str(msg.content))
+        chunks = [AIMessageChunk(content=p) for p in pieces] or [AIMessageChunk(content="")]
+        chunks[-1] = AIMessageChunk(content=chunks[-1].content, usage_metadata=msg.usage_metadata)
+        return chunks
+
+    def stream(self, messages: Sequence[Any], *args: Any, **kwargs: Any) -> Iterator[AIMessageChunk]:
+        yield from self._chunks(self.invoke(messages))
+
+    async def astream(self, messages: Sequence[Any], *args: Any, **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        for chunk in self._chunks(await self.ainvoke(messages)):
+            yield chunk
+
+
+def make_llm(model: str) -> Any:
+    if provider("llm") == "fake":
+        return FakeChatModel(model=f"fake/{model}")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    # retries are owned by bwa_resilience (backoff, deadlines, breaker); don't stack the SDK's on top
+    return ChatGoogleGenerativeAI(model=model, max_retries=0)
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  FAKE SEARCH
+# ══════════════════════════════════════════════════════════════
+
+class FakeSearchEngine:
+    """Same search / search_many contract as bwa_research.TavilyEngine, no network."""
+
+    def __init__(self) -> None:
+        self._faults = _faults(self._hits, "search")
+
+    @staticmethod
+    def _hits(query: str, max_results: int) -> List[dict]:
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "q"
+        seed = _digest(query)
+        today = date.today()
+        return [
+            {
+                "title": f"{query.title()} — report {i + 1}",
+                "url": f"https://example.com/{slug}/{i + 1}",
+                "snippet": " ".join(_sentence(seed + i * 13 + k, 14) for k in range(3)),
+                "published_at": (today - timedelta(days=(seed >> i) % 6)).isoformat(),
+                "source": "example.com",
+            }
+            for i in range(max_results)
+        ]
+
+    def search(self, query: str, max_results: int = 5) -> List[dict]:
+        return self._faults(query, max_results)
+
+    search_resilient = search
+
+    def search_many(self, queries: Sequence[str], max_results: int = 5) -> List[Union[List[dict], BaseException]]:
+        out: List[Union[List[dict], BaseException]] = []
+        for q in queries:
+            try:
+                out.append(self.search(q, max_results))
+            except Exception as e:
+                out.append(e)
+        return out
+
+
+_fake_engine: Optional[FakeSearchEngine] = None
+_fake_engine_lock = threading.Lock()
+
+
+def get_search_engine() -> Any:
+    """None means "no search configured" (live provider without TAVILY_API_KEY)."""
+    global _fake_engine
+    if provider("search") == "fake":
+        with _fake_engine_lock:
+            if _fake_engine is None:
+                _fake_engine = FakeSearchEngine()
+            return _fake_engine
+    if not os.getenv("TAVILY_API_KEY"):
+        return None
+    from bwa_research import get_engine
+    return get_engine()
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  FAKE IMAGES
+# ══════════════════════════════════════════════════════════════
+
+def _png(width: int, height: int, rgb: Tuple[int, int, int]) -> bytes:
+    """Minimal valid RGB PNG with a diagonal two-tone split (no Pillow needed)."""
+    other = tuple(255 - c for c in rgb)
+    rows = b"".join(
+        b"\x00" + b"".join(bytes(rgb if x * height < y * width else other) for x in range(width))
+        for y in range(height)
+    )
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows, 6)) + chunk(b"IEND", b""))
+
+
+def fake_image_bytes(prompt: str) -> bytes:
+    d = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return _png(256, 256, (d[0], d[1], d[2]))
+
+
+def image_backend(live: Callable[[str], bytes]) -> Callable[[str], bytes]:
+    """The image generator to use: `live` (Gemini) or the deterministic fake."""
+    if provider("image") == "fake":
+        return _faults(fake_image_bytes, "image")
+    return live
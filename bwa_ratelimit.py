@@ -0,0 +1,116 @@
+"""
+bwa_ratelimit.py
+────────────────
+Process-wide Gemini rate limiting for BlogForge AI.
+
+Every LLM call — sync or async, from any Streamlit session or batch run —
+reserves capacity from one shared RateLimiter before hitting the API, so
+concurrent runs queue up instead of tripping 429s.
+
+Classes:
+    RateLimiter   requests-per-minute + tokens-per-minute token buckets
+
+Functions:
+    estimate_tokens(messages, output_tokens)  →  int
+    get_rate_limiter()                         →  RateLimiter (shared instance)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Optional, Sequence
+
+
+class _Bucket:
+    """Token bucket that allows reservations to drive the balance negative."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0      # refill per second
+        self.balance = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self, now: float) -> None:
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` now and return how long the caller must wait before using it."""
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        self.balance -= min(amount, self.capacity)   # never wait forever on one huge request
+        return 0.0 if self.balance >= 0 else -self.balance / self.rate
+
+    def refund(self, amount: float) -> None:
+        if self.enabled:
+            self.balance = min(self.capacity, self.balance + amount)
+
+
+class RateLimiter:
+    """
+    Reservation-based limiter: callers are charged immediately and told how long
+    to sleep, which keeps waiting callers roughly first-come-first-served.
+    `rpm` / `tpm` of 0 disable the corresponding limit.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            return max(self._requests.reserve(1, now), self._tokens.reserve(tokens, now))
+
+    def acquire(self, tokens: int = 0) -> None:
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token bucket once the real usage is known."""
+        if actual is None:
+            return
+        with self._lock:
+            if actual < estimated:
+                self._tokens.refund(estimated - actual)
+            else:
+                self._tokens.reserve(actual - estimated, time.monotonic())
+
+
+def estimate_tokens(messages: Sequence[Any], output_tokens: int = 1024) -> int:
+    """Cheap pre-call estimate (~4 chars per token) plus an output allowance."""
+    chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // 4 + output_tokens
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Env: BWA_GEMINI_RPM (default 10), BWA_GEMINI_TPM (default 250000). 0 disables a limit.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                rpm=float(os.getenv("BWA_GEMINI_RPM", "10")),
+                tpm=float(os.getenv("BWA_GEMINI_TPM", "250000")),
+            )
+        return _limiter
@@ -0,0 +1,338 @@
+"""
+bwa_research.py
+───────────────
+Research utilities for BlogForge AI.
+
+Classes:
+    TavilyEngine    pooled, concurrent Tavily search client (retried, circuit-broken)
+    SearchUnavailable  every query of a batch failed
+    EvidenceIndex   in-process BM25 index over evidence title + snippet
+
+Functions:
+    get_engine()               →  TavilyEngine   (process-wide shared instance)
+    get_evidence_index(docs)   →  EvidenceIndex  (memoized per evidence set)
+    canonicalize_url(url)      →  str
+    preprocess_results(raw, cutoff)  →  List[dict]  (dedup + recency filter before the LLM)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+from datetime import date
+from email.utils import parsedate_to_datetime
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from time import monotonic
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bwa_resilience import call, get_breaker, search_policy
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  TAVILY SEARCH ENGINE
+# ══════════════════════════════════════════════════════════════
+
+TAVILY_API_URL = "https://api.tavily.com"
+SEARCH_BREAKER = "tavily"
+
+
+class SearchUnavailable(RuntimeError):
+    """Search is down (errors, timeouts or an open breaker) for every query of a batch."""
+
+
+def normalize_result(r: dict) -> dict:
+    """Map a raw Tavily hit onto the dict shape research_node expects."""
+    return {
+        "title": r.get("title") or "",
+        "url": r.get("url") or "",
+        "snippet": r.get("content") or r.get("snippet") or "",
+        "published_at": r.get("published_date") or r.get("published_at"),
+        "source": r.get("source"),
+    }
+
+
+class TavilyEngine:
+    """
+    Runs Tavily queries concurrently over one pooled HTTP session.
+
+    - `max_workers` bounds parallelism (and the connection pool size).
+    - `timeout` is the HTTP timeout of one request; transient failures are
+      retried with backoff (bwa_resilience.search_policy) behind the shared
+      "tavily" circuit breaker.
+    - `base_url` can point at a local stub server for testing.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_workers: int = 4,
+        timeout: float = 15.0,
+        search_depth: str = "advanced",
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("TAVILY_API_KEY", "")
+        self.base_url = (base_url or os.getenv("TAVILY_API_URL") or TAVILY_API_URL).rstrip("/")
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.search_depth = search_depth
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="bwa-research")
+
+    def search(self, query: str, max_results: int = 5) -> List[dict]:
+        """Run one query. Raises on HTTP/network errors."""
+        resp = self._session.post(
+            f"{self.base_url}/search",
+            json={
+                "query": query,
+                "max_results": max_results,
+                "search_depth": self.search_depth,
+                "api_key": self.api_key,
+            },
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return [normalize_result(r) for r in resp.json().get("results") or []]
+
+    def search_resilient(self, query: str, max_results: int = 5) -> List[dict]:
+        """search() with retries and the circuit breaker; raises once those give up."""
+        return call(lambda: self.search(query, max_results=max_results),
+                    search_policy(self.timeout), get_breaker(SEARCH_BREAKER))
+
+    def search_many(self, queries: Sequence[str], max_results: int = 5) -> List[Union[List[dict], BaseException]]:
+        """
+        Run all queries with bounded parallelism.
+        Returns one entry per query, in the same order as `queries` (so downstream
+        dedup sees a stable ordering): its results, or the exception it failed with.
+        """
+        futures = [self._executor.submit(self.search_resilient, q, max_results) for q in queries]
+        # Each "wave" of max_workers queries gets one retry budget.
+        waves = -(-len(futures) // self.max_workers)
+        budget = search_policy(self.timeout).deadline or self.timeout
+        deadline = monotonic() + budget * max(1, waves)
+        out: List[Union[List[dict], BaseException]] = []
+        for fut in futures:
+            try:
+                out.append(fut.result(timeout=max(0.0, deadline - monotonic())))
+            except FutureTimeout:
+                fut.cancel()
+                out.append(TimeoutError(f"search did not finish within {budget:.0f}s"))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
+
+
+_engine: Optional[TavilyEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> TavilyEngine:
+    """
+    Process-wide engine shared by every run, so the connection pool and
+    concurrency bound apply across Streamlit sessions.
+    Env: BWA_RESEARCH_CONCURRENCY (default 4), BWA_RESEARCH_TIMEOUT (seconds, default 15).
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TavilyEngine(
+                max_workers=int(os.getenv("BWA_RESEARCH_CONCURRENCY", "4")),
+                timeout=float(os.getenv("BWA_RESEARCH_TIMEOUT", "15")),
+            )
+        return _engine
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  EVIDENCE RELEVANCE INDEX (BM25)
+# ══════════════════════════════════════════════════════════════
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from how in into is it its of on or that the this to
+vs was what when which who why will with your you
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+class EvidenceIndex:
+    """
+    Okapi BM25 over short documents (one per evidence item).
+    Built once per run; `top_k` is cheap enough to call once per worker.
+    """
+
+    def __init__(self, docs: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self._tfs: List[Counter] = [Counter(tokenize(d)) for d in docs]
+        self._lens = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lens) / len(self._lens)) if self._lens else 0.0
+        df: Counter = Counter()
+        for tf in self._tfs:
+            df.update(tf.keys())
+        n = len(self._tfs)
+        self._idf: Dict[str, float] = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def __len__(self) -> int:
+        return len(self._tfs)
+
+    def scores(self, query: str) -> List[float]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        out: List[float] = []
+        for tf, dl in zip(self._tfs, self._lens):
+            norm = self.k1 * (1 - self.b + self.b * dl / self._avg_len) if self._avg_len else self.k1
+            out.append(sum(
+                self._idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                for t in terms if t in tf
+            ))
+        return out
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """
+        Indices of the k best-matching documents, best first (ties keep input order).
+        Documents with zero overlap are only used to fill up when nothing matches,
+        so a worker never gets less context than the old "first k" behaviour.
+        """
+        scored = self.scores(query)
+        ranked = sorted(range(len(scored)), key=lambda i: (-scored[i], i))
+        hits = [i for i in ranked if scored[i] > 0][:k]
+        return hits or ranked[:k]
+
+
+@lru_cache(maxsize=16)
+def _build_index(docs: Tuple[str, ...]) -> EvidenceIndex:
+    return EvidenceIndex(docs)
+
+
+def get_evidence_index(docs: Sequence[str]) -> EvidenceIndex:
+    """Every worker of a run sees the same evidence, so they share one index."""
+    return _build_index(tuple(docs))
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  RAW RESULT PRE-PROCESSING (before the synthesizer LLM)
+# ══════════════════════════════════════════════════════════════
+
+# click ids and mail/marketing tags only; names like "ref" or "source" carry
+# content on many sites (GitHub branches, docs versions) and must survive
+_TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi",
+})
+
+
+def _is_tracking(param: str) -> bool:
+    name = unquote_plus(param.partition("=")[0]).lower()
+    return name.startswith("utm_") or name in _TRACKING_PARAMS
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Lower-case scheme/host, drop "www.", fragments, default ports, tracking
+    params (utm_*, click ids) and trailing slashes. The parameters that remain
+    keep their order and original encoding.
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and not ((parts.scheme == "http" and parts.port == 80) or
+                           (parts.scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = "&".join(p for p in parts.query.split("&") if p and not _is_tracking(p))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(((parts.scheme or "https").lower(), host, path, query, ""))
+
+
+def parse_published(value: Optional[str]) -> Optional[date]:
+    """Tavily dates come as ISO ("2025-01-14...") or RFC 2822 ("Tue, 14 Jan 2025 08:00:00 GMT")."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value.strip()[:10])
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).date()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+_MINHASH_PERMS = 64
+_MERSENNE = (1 << 61) - 1
+_PERM_A = [int.from_bytes(hashlib.blake2b(b"a%d" % i, digest_size=8).digest(), "big") % _MERSENNE | 1
+           for i in range(_MINHASH_PERMS)]
+_PERM_B = [int.from_bytes(hashlib.blake2b(b"b%d" % i, digest_size=8).digest(), "big") % _MERSENNE
+           for i in range(_MINHASH_PERMS)]
+
+
+def _shingles(text: str, n: int = 4) -> set:
+    words = _TOKEN_RE.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def minhash(text: str) -> Optional[Tuple[int, ...]]:
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest(), "big")
+              for sh in shingles]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in zip(_PERM_A, _PERM_B))
+
+
+def _similarity(x: Tuple[int, ...], y: Tuple[int, ...]) -> float:
+    return sum(1 for a, b in zip(x, y) if a == b) / len(x)
+
+
+def preprocess_results(raw: Sequence[dict], cutoff: Optional[date] = None,
+                       near_dup_threshold: float = 0.8) -> List[dict]:
+    """
+    Deterministic clean-up of raw search hits, in input order:
+      1. drop hits without a URL, canonicalize the rest and keep the first per URL;
+      2. drop hits published before `cutoff` (hits with no parseable date are kept);
+      3. drop near-duplicate snippets (MinHash Jaccard estimate >= threshold),
+         e.g. the same wire story syndicated on several sites.
+    """
+    out: List[dict] = []
+    seen_urls: set = set()
+    signatures: List[Tuple[int, ...]] = []
+    for r in raw:
+        url = canonicalize_url(r.get("url") or "")
+        if not url or url in seen_urls:
+            continue
+        if cutoff is not None:
+            published = parse_published(r.get("published_at"))
+            if published is not None and published < cutoff:
+                continue
+        sig = minhash(f"{r.get('title') or ''} {r.get('snippet') or ''}")
+        if sig is not None and any(_similarity(sig, other) >= near_dup_threshold for other in signatures):
+            continue
+        seen_urls.add(url)
+        if sig is not None:
+            signatures.append(sig)
+        out.append({**r, "url": url})
+    return out
@@ -0,0 +1,460 @@
+"""
+bwa_resilience.py
+─────────────────
+Retry, deadline, hedging and circuit-breaking for BlogForge AI's outbound
+calls (Gemini and Tavily).
+
+Classes:
+    RetryPolicy      attempts, exponential backoff with full jitter, deadlines, hedging
+    CircuitBreaker   closed → open → half-open breaker; open means "fail fast"
+    FaultInjector    wraps a callable with injected latency / errors (local fake for testing)
+    CircuitOpenError, DeadlineExceeded
+
+Functions:
+    is_retryable(exc)                       →  bool
+    call(fn, policy, breaker)               →  fn()          (sync)
+    acall(afn, policy, breaker)             →  await afn()   (async)
+    llm_policy(hedge) / search_policy(timeout)  →  RetryPolicy  (env-configured)
+    get_breaker(name)                       →  CircuitBreaker (process-wide, per service)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the service because its breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """A single attempt, or the call as a whole, ran past its deadline."""
+
+
+class TransientError(RuntimeError):
+    """Explicitly retryable failure (used by fakes and wrappers)."""
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  ERROR CLASSIFICATION
+# ══════════════════════════════════════════════════════════════
+
+_RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+# google-api-core / google-genai / httpx / requests class names, matched by name
+# so none of those packages has to be importable here
+_RETRYABLE_NAMES = frozenset({
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "TooManyRequests", "GatewayTimeout", "BadGateway", "Aborted", "ServerError",
+    "ConnectTimeout", "ReadTimeout", "ConnectError", "RemoteProtocolError",
+    "ConnectionError", "Timeout", "ChunkedEncodingError",     # requests' own (not builtins)
+})
+_RETRYABLE_TEXT = re.compile(
+    r"\b(429|500|502|503|504)\b|RESOURCE_EXHAUSTED|UNAVAILABLE|DEADLINE_EXCEEDED|overloaded|rate limit",
+    re.IGNORECASE,
+)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for value in (getattr(exc, "status_code", None), getattr(exc, "code", None),
+                  getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient by type, HTTP status or (for wrapped SDK errors) message; never CircuitOpenError."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (TransientError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    if any(cls.__name__ in _RETRYABLE_NAMES for cls in type(exc).__mro__):
+        return True
+    # langchain wraps SDK errors in its own exception types; the status survives in the text
+    return bool(_RETRYABLE_TEXT.search(str(exc)))
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  CIRCUIT BREAKER
+# ══════════════════════════════════════════════════════════════
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures. While open,
+    calls fail immediately with CircuitOpenError; after `reset_timeout` seconds
+    one probe is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected (open and not yet due for a probe)."""
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self._opened_at < self.reset_timeout else "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True            # half-open: exactly one probe at a time
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures, self._opened_at, self._probing = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at, self._probing = time.monotonic(), False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Env: BWA_BREAKER_THRESHOLD (default 5), BWA_BREAKER_RESET (seconds, default 30)."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv("BWA_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("BWA_BREAKER_RESET", "30")),
+            )
+        return _breakers[name]
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  RETRY POLICY + CALL WRAPPERS
+# ══════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 4                       # total tries, including the first
+    base_delay: float = 1.0
+    max_delay: float = 20.0
+    attempt_timeout: Optional[float] = None # per-try deadline
+    deadline: Optional[float] = None        # whole-call deadline, across retries
+    hedge_after: Optional[float] = None     # start a duplicate if the try is still running after N s
+    retry_on: Callable[[BaseException], bool] = is_retryable
+
+    def backoff(self, retry: int) -> float:
+        """Full jitter: uniform(0, min(max_delay, base * 2**retry))."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+
+def _pool_size() -> int:
+    """
+    Env: BWA_RESILIENCE_THREADS (default: 2 × BWA_JOB_WORKERS × BWA_MAX_CONCURRENCY,
+    at least 16), so every concurrent call can have a hedge in flight.
+    """
+    configured = os.getenv("BWA_RESILIENCE_THREADS")
+    if configured:
+        return int(configured)
+    calls = int(os.getenv("BWA_JOB_WORKERS", "2")) * int(os.getenv("BWA_MAX_CONCURRENCY", "4"))
+    return max(16, 2 * calls)
+
+
+_pool = ThreadPoolExecutor(max_workers=_pool_size(), thread_name_prefix="bwa-resilience")
+
+
+def _remaining(policy: RetryPolicy, started: float) -> Optional[float]:
+    if policy.deadline is None:
+        return policy.attempt_timeout
+    left = policy.deadline - (time.monotonic() - started)
+    if left <= 0:
+        raise DeadlineExceeded(f"call deadline of {policy.deadline}s exceeded")
+    return left if policy.attempt_timeout is None else min(left, policy.attempt_timeout)
+
+
+def _call_end(policy: RetryPolicy, started: float) -> Optional[float]:
+    """Monotonic time the whole call must finish by (None: no deadline)."""
+    if policy.deadline is None:
+        return None
+    if time.monotonic() - started >= policy.deadline:
+        raise DeadlineExceeded(f"call deadline of {policy.deadline}s exceeded")
+    return started + policy.deadline
+
+
+def _left(end: Optional[float]) -> Optional[float]:
+    return None if end is None else max(0.0, end - time.monotonic())
+
+
+def _earliest(*ends: Optional[float]) -> Optional[float]:
+    present = [e for e in ends if e is not None]
+    return min(present) if present else None
+
+
+class _Try:
+    """fn, with the time a pool thread started running it (not when it was submitted)."""
+
+    def __init__(self, fn: Callable[[], T]):
+        self.fn = fn
+        self.at: Optional[float] = None
+        self.started = threading.Event()
+
+    def __call__(self) -> T:
+        self.at = time.monotonic()
+        self.started.set()
+        return self.fn()
+
+
+def _submit(fn: Callable[[], T]) -> Future:
+    # run in a copy of the caller's context: LangGraph keeps the runnable config (and
+    # with it get_stream_writer) in contextvars, which pool threads don't inherit
+    return _pool.submit(contextvars.copy_context().run, fn)
+
+
+def _attempt(fn: Callable[[], T], timeout: Optional[float], hedge_after: Optional[float],
+             end: Optional[float] = None) -> T:
+    """
+    One try, bounded by `timeout` and optionally hedged with a second identical request.
+    The try's clock starts when a pool thread picks it up, so time queued behind other
+    calls does not count against `timeout`; `end` (the whole-call deadline) still does.
+    Threads cannot be cancelled: an overrunning try finishes in the background and
+    its result is discarded.
+    """
+    if timeout is None and hedge_after is None and end is None:
+        return fn()
+    first = _Try(fn)
+    futures: List[Future] = [_submit(first)]
+    if not first.started.wait(_left(end)):
+        futures[0].cancel()
+        raise DeadlineExceeded("call deadline exceeded while queued")
+    assert first.at is not None
+    try_end = None if timeout is None else first.at + timeout
+    limit = _earliest(try_end, end)
+    if hedge_after is not None and (timeout is None or hedge_after < timeout):
+        done, _ = wait(futures, timeout=_left(_earliest(first.at + hedge_after, limit)))
+        if not done and (limit is None or time.monotonic() < limit):
+            futures.append(_submit(fn))
+    error: Optional[BaseException] = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=_left(limit), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            if fut.exception() is None:
+                for other in pending:
+                    other.cancel()          # the loser's result is simply dropped
+                return fut.result()
+            error = fut.exception()
+    if pending:
+        if try_end is not None and (end is None or try_end <= end):
+            raise DeadlineExceeded(f"attempt exceeded {timeout}s")
+        raise DeadlineExceeded("call deadline exceeded")
+    raise _failure(error)
+
+
+def _failure(error: Optional[BaseException]) -> BaseException:
+    return error if error is not None else RuntimeError("call failed without an exception")
+
+
+def _record(breaker: Optional[CircuitBreaker], exc: Optional[BaseException], retryable: bool) -> None:
+    # only transient failures count against the service; a 400 still proves it is up
+    if breaker is None:
+        return
+    if exc is not None and retryable:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def call(fn: Callable[[], T], policy: RetryPolicy, breaker: Optional[CircuitBreaker] = None) -> T:
+    """
+    Run fn() under `policy`. Retryable errors back off and retry; anything else,
+    an exhausted budget or an open breaker raises immediately.
+    """
+    started = time.monotonic()
+    for retry in range(max(1, policy.attempts)):
+        if breaker is not None:
+            breaker.check()
+        try:
+            result = _attempt(fn, policy.attempt_timeout, policy.hedge_after, _call_end(policy, started))
+        except Exception as exc:
+            retryable = policy.retry_on(exc)
+            _record(breaker, exc, retryable)
+            if not retryable or retry + 1 >= policy.attempts:
+                raise
+            delay = policy.backoff(retry)
+            if policy.deadline is not None and time.monotonic() - started + delay >= policy.deadline:
+                raise
+            time.sleep(delay)
+            continue
+        _record(breaker, None, False)
+        return result
+    raise AssertionError("unreachable")
+
+
+async def _aattempt(afn: Callable[[], Awaitable[T]], timeout: Optional[float],
+                    hedge_after: Optional[float]) -> T:
+    if hedge_after is None or (timeout is not None and hedge_after >= timeout):
+        return await asyncio.wait_for(afn(), timeout) if timeout is not None else await afn()
+
+    async def race() -> T:
+        tasks = [asyncio.ensure_future(afn())]
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            tasks.append(asyncio.ensure_future(afn()))
+        error: Optional[BaseException] = None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise _failure(error)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return await asyncio.wait_for(race(), timeout) if timeout is not None else await race()
+
+
+async def acall(afn: Callable[[], Awaitable[T]], policy: RetryPolicy,
+                breaker: Optional[CircuitBreaker] = None) -> T:
+    """Async twin of call(); deadlines cancel the in-flight coroutine."""
+    started = time.monotonic()
+    for retry in range(max(1, policy.attempts)):
+        if breaker is not None:
+            breaker.check()
+        try:
+            result = await _aattempt(afn, _remaining(policy, started), policy.hedge_after)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if isinstance(exc, asyncio.TimeoutError) and not isinstance(exc, DeadlineExceeded):
+                exc = DeadlineExceeded(str(exc) or "attempt deadline exceeded")
+            retryable = policy.retry_on(exc)
+            _record(breaker, exc, retryable)
+            if not retryable or retry + 1 >= policy.attempts:
+                raise exc
+            delay = policy.backoff(retry)
+            if policy.deadline is not None and time.monotonic() - started + delay >= policy.deadline:
+                raise exc
+            await asyncio.sleep(delay)
+            continue
+        _record(breaker, None, False)
+        return result
+    raise AssertionError("unreachable")
+
+
+def llm_policy(hedge: bool = False) -> RetryPolicy:
+    """
+    Env: BWA_LLM_RETRIES (attempts, default 4), BWA_LLM_TIMEOUT (per try, default 120 s),
+         BWA_LLM_DEADLINE (whole call, default 300 s),
+         BWA_HEDGE_AFTER (seconds before a duplicate request; default 0 = no hedging).
+    """
+    hedge_after = float(os.getenv("BWA_HEDGE_AFTER", "0"))
+    return RetryPolicy(
+        attempts=int(os.getenv("BWA_LLM_RETRIES", "4")),
+        attempt_timeout=float(os.getenv("BWA_LLM_TIMEOUT", "120")) or None,
+        deadline=float(os.getenv("BWA_LLM_DEADLINE", "300")) or None,
+        hedge_after=hedge_after if hedge and hedge_after > 0 else None,
+    )
+
+
+def search_policy(timeout: float) -> RetryPolicy:
+    """HTTP calls already carry their own timeout; retries must fit in ~3 of them. Env: BWA_SEARCH_RETRIES."""
+    return RetryPolicy(
+        attempts=int(os.getenv("BWA_SEARCH_RETRIES", "3")),
+        base_delay=0.5,
+        max_delay=4.0,
+        deadline=timeout * 3,
+    )
+
+
+# ══════════════════════════════════════════════════════════════
+# 4.  FAULT INJECTION (local fake for tests and chaos runs)
+# ══════════════════════════════════════════════════════════════
+
+class FaultInjector:
+    """
+    Wrap a callable (sync or async) so calls fail or stall on demand:
+
+        flaky = FaultInjector(search, fail_first=2)            # 2 transient errors, then OK
+        slow  = FaultInjector(llm_call, latency=(0.1, 3.0))     # uniform extra latency
+        chaos = FaultInjector(fn, failure_rate=0.2, seed=7)     # 20% random failures
+
+    `error` is the exception type (or factory) to raise; counters record what happened.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *, fail_first: int = 0, failure_rate: float = 0.0,
+                 latency: Tuple[float, float] = (0.0, 0.0),
+                 error: Callable[[str], BaseException] | Type[BaseException] = TransientError,
+                 seed: Optional[int] = None):
+        self.fn = fn
+        self.fail_first = fail_first
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first or self._rng.random() < self.failure_rate
+            self.failures += fail
+            return self._rng.uniform(*self.latency), fail
+
+    def _fault(self) -> BaseException:
+        return self.error(f"injected fault (call {self.calls})")
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        delay, fail = self._plan()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise self._fault()
+        return self.fn(*args, **kwargs)
+
+    async def acall(self, *args: Any, **kwargs: Any) -> Any:
+        delay, fail = self._plan()
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise self._fault()
+        return await self.fn(*args, **kwargs)
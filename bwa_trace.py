@@ -0,0 +1,195 @@
+"""
+bwa_trace.py
+────────────
+Per-node tracing for BlogForge AI runs.
+
+Every graph node runs inside a Span (see bwa_backend._node). Code deeper in
+the call stack — LLM helpers, search, image generation — reports into the
+current span through a ContextVar, so nothing has to be threaded through
+function signatures. Finished spans are appended to one JSONL file per run;
+the files are kept LRU by mtime and capped in number (BWA_TRACE_FILES,
+default 256), checked whenever a run starts a new one.
+
+Classes:
+    Span   timing + LLM/token/cache counters of one node execution
+
+Functions:
+    span(node, run_id, task_id)   →  context manager yielding the active Span
+    record_llm(message)           →  count one LLM call and its usage_metadata tokens
+    record_cache_hit()            →  count one LLM response-cache hit
+    record_count(name, n)         →  bump a free-form counter (searches, images, …)
+    trace_path(run_id)            →  Path  (<cache dir>/traces/<run_id>.jsonl)
+    read_trace(run_id)            →  List[dict]
+    summarize(spans)              →  List[dict]  (one row per node)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from bwa_cache import cache_dir
+
+
+# ══════════════════════════════════════════════════════════════
+# 1.  SPANS
+# ══════════════════════════════════════════════════════════════
+
+@dataclass
+class Span:
+    run_id: str
+    node: str
+    task_id: Optional[int] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_hits: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def seconds(self) -> float:
+        return round((self.end or time.time()) - self.start, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "seconds": self.seconds}
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("bwa_span", default=None)
+_write_lock = threading.Lock()
+
+
+def tracing_enabled() -> bool:
+    """Env: BWA_TRACE = on (default) | off."""
+    return os.getenv("BWA_TRACE", "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+def trace_path(run_id: str) -> Path:
+    """Env: BWA_TRACE_DIR (default <cache dir>/traces)."""
+    d = Path(os.getenv("BWA_TRACE_DIR") or cache_dir() / "traces")
+    d.mkdir(parents=True, exist_ok=True)
+    return d / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', run_id)}.jsonl"
+
+
+def _prune_traces(keep: Path) -> None:
+    """Drop the least recently written trace files beyond BWA_TRACE_FILES (never `keep`)."""
+    limit = int(os.getenv("BWA_TRACE_FILES", "256"))
+    entries = []
+    for path in keep.parent.glob("*.jsonl"):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue                    # pruned concurrently
+    for _, path in sorted(entries, reverse=True)[limit:]:
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+
+def _write(s: Span) -> None:
+    line = json.dumps(s.to_dict(), ensure_ascii=False)
+    path = trace_path(s.run_id)
+    with _write_lock:
+        new = not path.exists()
+        with path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        if new:
+            _prune_traces(keep=path)
+
+
+@contextmanager
+def span(node: str, run_id: Optional[str], task_id: Optional[int] = None) -> Iterator[Optional[Span]]:
+    """Time one node execution; errors are recorded on the span and re-raised."""
+    if not run_id or not tracing_enabled():
+        yield None
+        return
+    s = Span(run_id=run_id, node=node, task_id=task_id)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as exc:
+        s.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end = time.time()
+        try:
+            _write(s)
+        except OSError:
+            pass                        # tracing must never fail a run
+
+
+# ══════════════════════════════════════════════════════════════
+# 2.  RECORDING (no-ops outside a span)
+# ══════════════════════════════════════════════════════════════
+
+def record_llm(message: Any) -> None:
+    s = _current.get()
+    if s is None:
+        return
+    s.llm_calls += 1
+    usage = getattr(message, "usage_metadata", None) or {}
+    s.input_tokens += int(usage.get("input_tokens") or 0)
+    s.output_tokens += int(usage.get("output_tokens") or 0)
+
+
+def record_cache_hit() -> None:
+    s = _current.get()
+    if s is not None:
+        s.cache_hits += 1
+
+
+def record_count(name: str, n: int = 1) -> None:
+    s = _current.get()
+    if s is not None and n:
+        s.counts[name] = s.counts.get(name, 0) + n
+
+
+# ══════════════════════════════════════════════════════════════
+# 3.  READING
+# ══════════════════════════════════════════════════════════════
+
+def read_trace(run_id: str) -> List[Dict[str, Any]]:
+    path = trace_path(run_id)
+    if not path.exists():
+        return []
+    spans: List[Dict[str, Any]] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            spans.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return sorted(spans, key=lambda s: s["start"])
+
+
+def summarize(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per node, in first-start order: executions, wall time, slowest, LLM calls, tokens, cache hits, errors."""
+    rows: Dict[str, Dict[str, Any]] = {}
+    for s in spans:
+        row = rows.setdefault(s["node"], {
+            "node": s["node"], "runs": 0, "first_start": s["start"], "last_end": s["end"],
+            "slowest_s": 0.0, "llm_calls": 0, "input_tokens": 0, "output_tokens": 0,
+            "cache_hits": 0, "errors": 0,
+        })
+        row["runs"] += 1
+        row["first_start"] = min(row["first_start"], s["start"])
+        row["last_end"] = max(row["last_end"], s["end"])
+        row["slowest_s"] = max(row["slowest_s"], s["seconds"])
+        for key in ("llm_calls", "input_tokens", "output_tokens", "cache_hits"):
+            row[key] += s.get(key) or 0
+        row["errors"] += 1 if s.get("error") else 0
+    out = []
+    for row in rows.values():
+        # parallel workers overlap, so wall time is first start → last end, not a sum
+        row["wall_s"] = round(row.pop("last_end") - row.pop("first_start"), 3)
+        out.append(row)
+    return out
@@ -0,0 +1,32 @@
+"""
+Shared test setup: every test runs against the offline fake providers
+(bwa_providers) in a throwaway working directory, so nothing touches the
+network, the real caches or the posts next to the sources.
+
+bwa_backend reads its provider, cache and checkpointer settings at import
+time, so the environment is fixed here, before any test module imports it.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="bwa-tests-"))
+
+for key, value in {
+    "BWA_PROVIDER": "fake",
+    "BWA_FAKE_LATENCY": "0,0",
+    "BWA_GEMINI_RPM": "0",
+    "BWA_GEMINI_TPM": "0",
+    "BWA_CACHE_DIR": str(WORKDIR / ".bwa_cache"),
+    "BWA_LLM_CACHE": "memory",
+    "BWA_CHECKPOINTER": "memory",
+}.items():
+    os.environ.setdefault(key, value)
+
+# posts (<slug>.md), images/ and the library index are written relative to the cwd
+os.chdir(WORKDIR)
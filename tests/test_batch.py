@@ -0,0 +1,59 @@
+import json
+
+import bwa_backend
+from bwa_batch import main, read_topics, run_batch
+
+TOPICS = ["Batch topic one", "Batch topic two"]
+
+
+def _summary(out_dir):
+    return [json.loads(line) for line in (out_dir / "summary.jsonl").read_text(encoding="utf-8").splitlines()]
+
+
+def test_read_topics_parses_text_and_jsonl():
+    items = read_topics(["# comment", "", "plain topic", '{"topic": "json topic", "as_of": "2025-02-01"}',
+                         "plain topic"], "2025-01-15")
+    assert [(i.topic, i.as_of) for i in items] == [("plain topic", "2025-01-15"), ("json topic", "2025-02-01")]
+
+
+def test_repeated_batches_get_their_own_threads_and_traces(tmp_path):
+    items = read_topics(TOPICS, "2025-01-15")
+    first = run_batch(items, tmp_path, concurrency=2, log=lambda _: None)
+    second = run_batch(items, tmp_path, concurrency=2, log=lambda _: None)
+
+    assert [r["status"] for r in first + second] == ["ok"] * 4
+    assert not any(r["resumed"] for r in second)
+    assert {r["batch"] for r in first}.isdisjoint({r["batch"] for r in second})
+    assert len({r["trace"] for r in first + second}) == 4
+    assert all(r["sections"] > 0 for r in first)
+
+
+def test_resume_continues_only_the_last_batch(tmp_path, monkeypatch):
+    real = bwa_backend._invoke_text
+    crash = {"on": True}
+
+    def flaky(messages, *args, **kwargs):
+        if crash["on"] and "Topic: Batch topic two" in messages[-1].content:
+            raise ValueError("worker crashed")
+        return real(messages, *args, **kwargs)
+
+    monkeypatch.setattr(bwa_backend, "_invoke_text", flaky)
+    items = read_topics(TOPICS, "2025-01-15")
+    first = run_batch(items, tmp_path, concurrency=1, log=lambda _: None)
+    assert sorted(r["status"] for r in first) == ["error", "ok"]
+
+    crash["on"] = False
+    resumed = run_batch(items, tmp_path, concurrency=1, log=lambda _: None, resume=True)
+
+    assert [(r["topic"], r["status"], r["resumed"]) for r in resumed] == [("Batch topic two", "ok", True)]
+    assert resumed[0]["batch"] == first[0]["batch"]
+    assert len(_summary(tmp_path)) == 3
+
+
+def test_cli_resume_without_a_previous_batch_starts_one(tmp_path, capsys):
+    topics = tmp_path / "topics.txt"
+    topics.write_text("CLI topic\n", encoding="utf-8")
+
+    assert main([str(topics), "--out", str(tmp_path / "out"), "--as-of", "2025-01-15", "--resume"]) == 0
+    assert "starting a new one" in capsys.readouterr().err
+    assert [r["status"] for r in _summary(tmp_path / "out")] == ["ok"]
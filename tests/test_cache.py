@@ -0,0 +1,83 @@
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import bwa_backend
+from bwa_backend import Plan, RouterDecision
+from bwa_cache import MemoryLRU, SearchCache, SqliteLRU, llm_cache_key, search_ttl
+
+
+def test_sqlite_lru_hit_miss_and_max_age(tmp_path):
+    store = SqliteLRU(tmp_path / "c.sqlite3")
+    assert store.get("k") is None
+    store.put("k", "v")
+    assert store.get("k") == "v"
+    assert store.get("k", max_age=-1) is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 2
+
+
+def test_sqlite_lru_evicts_least_recently_used(tmp_path):
+    store = SqliteLRU(tmp_path / "c.sqlite3", max_bytes=10)
+    store.put("a", "xxxx")
+    time.sleep(0.01)
+    store.put("b", "yyyy")
+    time.sleep(0.01)
+    store.get("a")                      # "b" is now the least recently used
+    store.put("c", "zzzz")
+    assert store.get("b") is None
+    assert store.get("a") == "xxxx" and store.get("c") == "zzzz"
+    assert store.evictions == 1
+
+
+def test_memory_lru_matches_sqlite_interface():
+    store = MemoryLRU(max_bytes=8)
+    store.put("a", "xxxx")
+    store.put("b", "yyyy")
+    store.get("a")
+    store.put("c", "zzzz")
+    assert store.get("b") is None and store.get("a") == "xxxx"
+
+
+def test_search_cache_keys_normalize_queries(tmp_path):
+    cache = SearchCache(SqliteLRU(tmp_path / "s.sqlite3"))
+    hits = [{"title": "t", "url": "https://example.com"}]
+    cache.put("  Rust Async Runtimes? ", 5, hits)
+
+    assert cache.get("rust async runtimes", 5, recency_days=45) == hits
+    assert cache.get("rust async runtimes", 6, recency_days=45) is None
+
+
+def test_search_cache_never_stores_empty_results(tmp_path):
+    cache = SearchCache(SqliteLRU(tmp_path / "s.sqlite3"))
+    cache.put("nothing", 5, [])
+    assert cache.get("nothing", 5, recency_days=45) is None
+
+
+def test_search_ttl_is_short_for_news_windows():
+    assert search_ttl(7) < search_ttl(45) == search_ttl(3650)
+
+
+def test_llm_cache_key_covers_model_messages_and_schema():
+    messages = [SystemMessage(content="sys"), HumanMessage(content="Topic: x")]
+    key = llm_cache_key("m", messages, RouterDecision)
+    assert key == llm_cache_key("m", list(messages), RouterDecision)
+    assert key != llm_cache_key("other", messages, RouterDecision)
+    assert key != llm_cache_key("m", messages, Plan)
+    assert key != llm_cache_key("m", [SystemMessage(content="sys"), HumanMessage(content="Topic: y")], RouterDecision)
+    # same text under another role is a different prompt
+    assert key != llm_cache_key("m", [HumanMessage(content="sys"), HumanMessage(content="Topic: x")], RouterDecision)
+
+
+def test_response_cache_hit_skips_the_llm(monkeypatch):
+    calls = []
+    real = bwa_backend.llm.invoke
+    monkeypatch.setattr(bwa_backend.llm, "invoke", lambda m, *a, **kw: calls.append(1) or real(m, *a, **kw))
+    messages = [SystemMessage(content="cache test"),
+                HumanMessage(content="Section title: Cached\nTarget words: 30\nBullets:\n- once\n")]
+
+    first = bwa_backend._invoke_text(messages)
+    second = bwa_backend._invoke_text(messages)
+    bypassed = bwa_backend._invoke_text(messages, {"configurable": {"bypass_llm_cache": True}})
+
+    assert first == second == bypassed
+    assert len(calls) == 2
@@ -0,0 +1,103 @@
+import logging
+import re
+
+from pydantic import BaseModel
+
+import bwa_backend
+from bwa_backend import EvidenceItem, Plan, Task, app, new_run_inputs, stream_run
+from bwa_cache import cache_dir
+
+
+class _Foreign(BaseModel):
+    x: int
+
+
+def _plan() -> Plan:
+    task = Task(id=1, title="Intro", goal="Understand it.", bullets=["a", "b", "c"], target_words=150)
+    return Plan(blog_title="T", audience="engineers", tone="plain", tasks=[task])
+
+
+def test_checkpoint_serde_allowlists_state_models(caplog):
+    serde = bwa_backend._checkpoint_serde()
+    state = {"plan": _plan(), "evidence": [EvidenceItem(title="t", url="https://example.com")],
+             "sections": [(1, "## Intro")]}
+
+    with caplog.at_level(logging.WARNING):
+        out = serde.loads_typed(serde.dumps_typed(state))
+
+    assert isinstance(out["plan"], Plan) and isinstance(out["plan"].tasks[0], Task)
+    assert out["plan"] == state["plan"] and out["evidence"] == state["evidence"]
+    assert "unregistered" not in caplog.text
+    # anything else is refused rather than imported and rebuilt
+    assert not isinstance(serde.loads_typed(serde.dumps_typed(_Foreign(x=1))), _Foreign)
+
+
+def _section_title(messages) -> str:
+    return re.search(r"^Section title: (.+)$", messages[-1].content, re.MULTILINE).group(1)
+
+
+def test_failed_run_resumes_from_its_checkpoint(monkeypatch):
+    real_text, real_structured = bwa_backend._invoke_text, bwa_backend._invoke_structured
+    calls = {"written": [], "structured": []}
+    fail = {"left": 1}
+
+    def flaky_text(messages, *args, **kwargs):
+        title = _section_title(messages)
+        if fail["left"] and title.startswith("Core concepts"):
+            fail["left"] -= 1
+            raise ValueError("worker crashed")
+        out = real_text(messages, *args, **kwargs)
+        calls["written"].append(title)
+        return out
+
+    def counted_structured(schema, *args, **kwargs):
+        calls["structured"].append(schema.__name__)
+        return real_structured(schema, *args, **kwargs)
+
+    monkeypatch.setattr(bwa_backend, "_invoke_text", flaky_text)
+    monkeypatch.setattr(bwa_backend, "_invoke_structured", counted_structured)
+    config = {"configurable": {"thread_id": "test-resume", "bypass_llm_cache": True}}
+
+    _, failed = list(stream_run(app, new_run_inputs("Checkpointed topic", "2025-01-15"), config))[-1]
+    assert not failed.ok and "worker crashed" in str(failed.error)
+    snapshot = app.get_state(config)
+    tasks = snapshot.values["plan"].tasks
+    # workers that finished before the crash have their sections saved as pending writes;
+    # siblings still running or not yet started when it happened do not
+    saved = {sid for t in snapshot.tasks if t.result for sid, _ in t.result["sections"]}
+    assert len(saved) < len(tasks)
+
+    calls["written"], calls["structured"] = [], []
+    _, resumed = list(stream_run(app, None, config))[-1]
+
+    assert resumed.ok, resumed.error
+    # only the workers without a checkpointed section run again
+    assert sorted(calls["written"]) == sorted(t.title for t in tasks if t.id not in saved)
+    assert calls["structured"] == ["ImagePlacementPlan"]
+    assert resumed.state["final"].count("\n## ") == len(tasks)
+
+
+def test_resume_survives_a_pruned_context_snapshot(monkeypatch):
+    real_text = bwa_backend._invoke_text
+    fail = {"left": 1}
+
+    def flaky_text(messages, *args, **kwargs):
+        if fail["left"] and _section_title(messages).startswith("Core concepts"):
+            fail["left"] -= 1
+            raise ValueError("worker crashed")
+        return real_text(messages, *args, **kwargs)
+
+    monkeypatch.setattr(bwa_backend, "_invoke_text", flaky_text)
+    config = {"configurable": {"thread_id": "test-resume-pruned", "bypass_llm_cache": True}}
+    _, failed = list(stream_run(app, new_run_inputs("Pruned snapshot topic", "2025-01-15"), config))[-1]
+    assert not failed.ok
+
+    # newer runs push the failed run's snapshot out, and the resume happens in a fresh process
+    monkeypatch.setenv("BWA_CONTEXT_FILES", "1")
+    bwa_backend.publish_context(_plan(), [])
+    assert len(list((cache_dir() / "contexts").glob("*.json"))) == 1
+    bwa_backend._CONTEXTS.clear()
+
+    _, resumed = list(stream_run(app, None, config))[-1]
+    assert resumed.ok, resumed.error
+    assert resumed.state["final"].count("\n## ") == len(resumed.state["plan"].tasks)
@@ -0,0 +1,52 @@
+from bwa_backend import EvidenceItem, Task, _relevant_evidence
+from bwa_research import EvidenceIndex, tokenize
+
+DOCS = [
+    "Quarterly earnings beat expectations",
+    "Vector databases compared: HNSW index recall and latency",
+    "Weather outlook for the weekend",
+    "HNSW graphs explained: building the index layer by layer",
+]
+
+
+def _task(title: str, goal: str = "Explain it.", bullets=("one", "two", "three")) -> Task:
+    return Task(id=1, title=title, goal=goal, bullets=list(bullets), target_words=150)
+
+
+def _evidence(titles):
+    return [EvidenceItem(title=t, url=f"https://example.com/{i}") for i, t in enumerate(titles)]
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("How the HNSW index is built, in 3 steps: a-b") == ["hnsw", "index", "built", "steps"]
+
+
+def test_section_relevant_documents_rank_first():
+    index = EvidenceIndex(DOCS)
+    scores = index.scores("HNSW index")
+    assert scores[0] == scores[2] == 0
+    assert set(index.top_k("HNSW index", 2)) == {1, 3}
+    assert index.top_k("HNSW recall and latency", 4) == [1, 3]     # more matched terms first
+    assert index.top_k("earnings", 3) == [0]                  # hits only, never padded
+
+
+def test_no_hits_falls_back_to_input_order():
+    assert EvidenceIndex(DOCS).top_k("kubernetes operators", 2) == [0, 1]
+    assert EvidenceIndex([]).top_k("anything", 3) == []
+
+
+def test_relevant_evidence_cuts_to_top_k(monkeypatch):
+    monkeypatch.setenv("BWA_EVIDENCE_TOP_K", "2")
+    evidence = _evidence(DOCS)
+    picked = _relevant_evidence(_task("How HNSW builds its index"), evidence)
+    assert {e.url for e in picked} == {evidence[1].url, evidence[3].url}
+
+    unrelated = _relevant_evidence(_task("Kubernetes operators"), evidence)
+    assert unrelated == evidence[:2]
+
+
+def test_relevant_evidence_keeps_everything_when_there_are_at_most_k(monkeypatch):
+    monkeypatch.setenv("BWA_EVIDENCE_TOP_K", "4")
+    evidence = _evidence(DOCS)
+    assert _relevant_evidence(_task("Weather"), evidence) is evidence
+    assert _relevant_evidence(_task("Weather"), []) == []
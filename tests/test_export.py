@@ -0,0 +1,88 @@
+import os
+
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.platypus import Table
+
+from bwa_export import ExportCache, _make_styles, _parse_md_to_flowables, export_key, to_pdf_bytes, to_styled_html
+from bwa_providers import fake_image_bytes
+
+LONG = "a long note that will certainly not fit into a third of the page without wrapping"
+TABLE = f"""| Name | Count | Notes |
+|:-----|:-----:|------:|
+| {LONG} | {LONG} | {LONG} |
+| x | 1 | {LONG} |
+"""
+
+
+def _table(st: dict) -> Table:
+    [tbl] = [f for f in _parse_md_to_flowables(TABLE, st) if isinstance(f, Table)]
+    return tbl
+
+
+def test_wrapped_cells_use_the_column_alignment():
+    st = _make_styles()
+    long_row, short_row = _table(st)._cellvalues[1:]
+
+    assert [c.style.alignment for c in long_row] == [TA_LEFT, TA_CENTER, TA_RIGHT]
+    assert [c.style for c in long_row] == [st["td_left"], st["td_center"], st["td_right"]]
+    assert short_row[:2] == ["x", "1"]              # short plain cells stay plain strings
+    assert short_row[2].style is st["td_right"]
+
+
+def test_aligned_styles_belong_to_their_export():
+    first, second = _make_styles(), _make_styles()
+    assert _table(first)._cellvalues[1][2].style is first["td_right"]
+    assert _table(second)._cellvalues[1][2].style is second["td_right"]
+    assert first["td_right"].parent is first["td"]
+    assert to_pdf_bytes(TABLE, "Aligned").startswith(b"%PDF-")
+
+
+def _set_mtime(path, ns: int) -> None:
+    os.utime(path, ns=(ns, ns))
+
+
+def test_export_key_follows_referenced_image_bytes_and_mtime(tmp_path):
+    img = tmp_path / "diagram.png"
+    img.write_bytes(fake_image_bytes("one"))
+    _set_mtime(img, 1_000_000_000_000_000_000)
+    md = f"# Post\n\n![d]({img})\n"
+    key = export_key("pdf", md, "Post")
+    assert export_key("pdf", md, "Post") == key
+    assert export_key("html", md, "Post") != key
+
+    img.write_bytes(fake_image_bytes("one") + b"\0")        # new bytes, restored mtime
+    _set_mtime(img, 1_000_000_000_000_000_000)
+    changed = export_key("pdf", md, "Post")
+    assert changed != key
+
+    _set_mtime(img, 1_000_000_000_000_000_001)              # same bytes, touched
+    assert export_key("pdf", md, "Post") not in (key, changed)
+
+    img.unlink()
+    assert export_key("pdf", md, "Post") not in (key, changed)
+
+
+def test_export_cache_evicts_least_recently_used_within_the_byte_budget():
+    cache = ExportCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"                         # "b" is now least recently used
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    cache.put("huge", b"x" * 11)                             # over budget on its own: not cached
+    assert cache.get("huge") is None and cache.get("a") == b"aaaa"
+
+
+def test_second_build_of_the_same_content_is_a_cache_hit():
+    cache, builds = ExportCache(max_bytes=10**8), []
+
+    def build():
+        builds.append(1)
+        return to_styled_html(TABLE, "Cached")
+
+    key = export_key("html", TABLE, "Cached")
+    first = cache.get_or_build(key, build)
+    assert cache.get_or_build(export_key("html", TABLE, "Cached"), build) is first
+    assert len(builds) == 1 and b"<table>" in first
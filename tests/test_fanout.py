@@ -0,0 +1,44 @@
+import os
+import time
+
+import bwa_backend
+from bwa_backend import EvidenceItem, Plan, Task, load_context, publish_context
+from bwa_cache import cache_dir
+
+
+def _plan(title: str) -> Plan:
+    task = Task(id=1, title="Intro", goal="Understand it.", bullets=["a", "b", "c"], target_words=150)
+    return Plan(blog_title=title, audience="engineers", tone="plain", tasks=[task])
+
+
+def _age(ref: str, seconds: float) -> None:
+    path = cache_dir() / "contexts" / f"{ref}.json"
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_context_is_shared_by_reference_and_survives_a_fresh_process():
+    evidence = [EvidenceItem(title="t", url="https://example.com/a")]
+    ref = publish_context(_plan("Shared"), evidence)
+    assert publish_context(_plan("Shared"), evidence) == ref
+
+    bwa_backend._CONTEXTS.clear()           # as in a resumed run in a new process
+    ctx = load_context(ref)
+    assert ctx.plan.blog_title == "Shared"
+    assert ctx.evidence == tuple(evidence)
+
+
+def test_context_files_are_capped_least_recently_used_first(monkeypatch):
+    monkeypatch.setenv("BWA_CONTEXT_FILES", "3")
+    for f in (cache_dir() / "contexts").glob("*.json"):
+        f.unlink()
+    refs = [publish_context(_plan(f"Post {i}"), []) for i in range(3)]
+    for age, ref in zip((30, 20, 10), refs):
+        _age(ref, age)
+
+    bwa_backend._CONTEXTS.clear()
+    load_context(refs[0])                   # a resumed run touches the oldest snapshot
+    newest = publish_context(_plan("Post 3"), [])
+
+    left = {p.stem for p in (cache_dir() / "contexts").glob("*.json")}
+    assert left == {refs[0], refs[2], newest}
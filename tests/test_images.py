@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+
+import pytest
+
+from bwa_images import STORE_DIRNAME, VARIANTS, ImageStore, generate_images, make_variants, place_images
+from bwa_providers import fake_image_bytes
+
+
+def _specs(*prompts):
+    return [{"placeholder": f"[[IMAGE_{i}]]", "filename": f"f{i}.png", "alt": "a", "caption": "c", "prompt": p}
+            for i, p in enumerate(prompts, start=1)]
+
+
+def test_images_generate_concurrently_in_spec_order():
+    lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+    def backend(prompt):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.1)
+        with lock:
+            state["now"] -= 1
+        return fake_image_bytes(prompt)
+
+    results = generate_images(_specs("one", "two", "three"), backend, max_workers=3)
+
+    assert [r.spec["prompt"] for r in results] == ["one", "two", "three"]
+    assert all(r.ok for r in results)
+    assert results[1].data == fake_image_bytes("two")
+    assert state["peak"] == 3
+
+
+def test_one_failed_or_hung_image_does_not_affect_the_others():
+    def backend(prompt):
+        if prompt == "boom":
+            raise RuntimeError("quota")
+        if prompt == "hang":
+            time.sleep(2)
+        return fake_image_bytes(prompt)
+
+    started = time.monotonic()
+    results = generate_images(_specs("ok", "boom", "hang"), backend, max_workers=3, timeout=0.3)
+
+    assert time.monotonic() - started < 1.5
+    assert results[0].ok
+    assert str(results[1].error) == "quota"
+    assert isinstance(results[2].error, TimeoutError)
+
+
+def test_place_images_swaps_placeholders_and_failures(tmp_path):
+    def backend(prompt):
+        if prompt == "boom":
+            raise ValueError("nope")
+        return fake_image_bytes(prompt)
+
+    results = generate_images(_specs("ok", "boom"), backend)
+    md = place_images("# T\n\n[[IMAGE_1]]\n\n[[IMAGE_2]]\n\n[[IMAGE_9]]\n", results, tmp_path)
+
+    assert f"![a]({tmp_path}/f1.png)\n*c*" in md
+    assert "**[IMAGE GENERATION FAILED]**" in md and "nope" in md
+    assert "[[IMAGE_9]]" in md
+
+
+
+def _stored_png(tmp_path, size, noisy):
+    Image = pytest.importorskip("PIL.Image")
+    d = tmp_path / "_store" / "k"
+    d.mkdir(parents=True)
+    blob = d / "image.png"
+    im = Image.effect_noise(size, 80).convert("RGB") if noisy else Image.new("RGB", size, (20, 40, 60))
+    im.save(blob, format="PNG")
+    return blob
+
+
+def _count_decodes(monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    opened = []
+    real_open = Image.open
+    monkeypatch.setattr(Image, "open", lambda *a, **kw: opened.append(a[0]) or real_open(*a, **kw))
+    return opened
+
+
+def test_variants_are_made_once_and_then_served_from_the_store(tmp_path, monkeypatch):
+    blob = _stored_png(tmp_path, (1600, 900), noisy=True)
+    first = make_variants(blob)
+    assert set(first) == {"web", "thumb", "print"}
+
+    opened = _count_decodes(monkeypatch)
+    assert make_variants(blob) == first
+    assert opened == []
+
+
+def test_renditions_no_smaller_than_the_original_are_recorded_not_redone(tmp_path, monkeypatch):
+    blob = _stored_png(tmp_path, (16, 16), noisy=False)   # a JPEG can't beat this PNG
+    first = make_variants(blob)
+    assert "print" not in first
+    assert not list(blob.parent.glob("print.*"))
+
+    opened = _count_decodes(monkeypatch)
+    assert make_variants(blob) == first
+    assert opened == []
+
+
+def test_skip_record_is_invalidated_by_a_new_width(tmp_path, monkeypatch):
+    blob = _stored_png(tmp_path, (16, 16), noisy=False)
+    make_variants(blob)
+
+    monkeypatch.setitem(VARIANTS, "print", (8, "JPEG", ".jpg", {"quality": 85}))
+    opened = _count_decodes(monkeypatch)
+    make_variants(blob)
+    assert opened == [blob]
+
+
+def _spec(prompt, filename="img.png", **kw):
+    return {"prompt": prompt, "filename": filename, "size": "1024x1024", "quality": "standard", **kw}
+
+
+def _age(store: ImageStore, key: str, seconds: float) -> None:
+    past = time.time() - seconds
+    os.utime(store.root / key, (past, past))
+
+
+def test_store_reuses_one_blob_per_prompt_size_and_quality(tmp_path):
+    store = ImageStore(tmp_path, max_bytes=10**9)
+    key = ImageStore.key(_spec(" a lighthouse ", "first.png", caption="one"))
+    assert ImageStore.key(_spec("a lighthouse", "second.png", caption="two")) == key
+    assert ImageStore.key(_spec("a lighthouse", size="512x512")) != key
+    assert ImageStore.key(_spec("a lighthouse", quality="hd")) != key
+
+    assert store.get(key) is None
+    blob = store.put(key, fake_image_bytes("a lighthouse"))
+    assert store.get(key) == blob and blob.suffix == ".png"
+
+    first, second = store.place(key, "first.png"), store.place(key, "second.png")
+    assert os.path.samefile(tmp_path / first, blob) and os.path.samefile(tmp_path / second, blob)
+    assert store.place(key, "first.png") == first                  # placing again is a no-op
+    assert [p.name for p in (store.root / key).iterdir()] == [blob.name]
+
+
+def test_same_filename_for_two_prompts_gets_distinct_placements(tmp_path):
+    store = ImageStore(tmp_path, max_bytes=10**9)
+    keys = [ImageStore.key(_spec(p, "diagram.png")) for p in ("a queue", "a stack")]
+    for key, prompt in zip(keys, ("a queue", "a stack")):
+        store.put(key, fake_image_bytes(prompt))
+
+    names = [store.place(key, "diagram.png") for key in keys]
+    assert names == [f"diagram-{key[:8]}.png" for key in keys]
+    assert (tmp_path / names[0]).read_bytes() == fake_image_bytes("a queue")
+    assert (tmp_path / names[1]).read_bytes() == fake_image_bytes("a stack")
+
+
+def test_evict_drops_lru_blobs_and_their_placements_but_never_kept_ones(tmp_path):
+    data = {p: fake_image_bytes(p) for p in ("old", "kept", "new")}
+    store = ImageStore(tmp_path, max_bytes=len(data["new"]) + len(data["kept"]))
+    keys = {p: ImageStore.key(_spec(p)) for p in data}
+    names = {}
+    for age, prompt in zip((30, 20, 10), data):
+        store.put(keys[prompt], data[prompt])
+        names[prompt] = store.place(keys[prompt], f"{prompt}.png")
+        _age(store, keys[prompt], age)
+    _age(store, keys["kept"], 40)               # least recently used, but in use by this run
+
+    assert store.evict(keep=[keys["kept"]]) == [keys["old"]]
+    assert {d.name for d in store.root.iterdir()} == {keys["kept"], keys["new"]}
+    assert {p.name for p in tmp_path.iterdir()} == {STORE_DIRNAME, names["kept"], names["new"]}
+    assert store.evict() == []                  # back under the budget
+
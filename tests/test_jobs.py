@@ -0,0 +1,39 @@
+from bwa_backend import app, new_run_inputs
+from bwa_jobs import DONE, JobService
+
+
+def _is_token(event):
+    kind, payload = event
+    return kind == "custom" and "section_delta" in payload
+
+
+def test_finished_jobs_drop_token_events_but_keep_positions():
+    service = JobService(app, max_workers=1)
+    live = []
+    emit = service._emit
+    service._emit = lambda job, kind, payload: live.append((kind, payload)) or emit(job, kind, payload)
+    job_id = service.submit(new_run_inputs("Job service topic", "2025-01-15"),
+                            config={"configurable": {"bypass_llm_cache": True}})
+
+    assert list(service.follow(job_id, poll=0.05))[-1] == live[-1]
+    assert any(_is_token(e) for e in live)
+    assert live[-1][0] == "final" and live[-1][1].ok
+
+    job = service.get(job_id)
+    assert job.status == DONE
+    replay = service.events(job_id)
+    assert not any(_is_token(e) for e in replay)
+    assert replay == [e for e in live if not _is_token(e)]
+    assert service.status(job_id)["events"] == len(live)
+
+    # a viewer that had seen the first k events continues with what is left after k
+    k = next(i for i, e in enumerate(live) if _is_token(e)) + 1
+    assert list(service.follow(job_id, since=k)) == [e for e in live[k:] if not _is_token(e)]
+
+
+def test_owners_are_served_round_robin():
+    service = JobService(app, max_workers=1)
+    service._ensure_workers = lambda: None      # queue only: no worker picks these up
+    ids = [service.submit(None, owner=o) for o in ("a", "a", "a", "b")]
+
+    assert [service.status(i)["queue_position"] for i in ids] == [0, 2, 3, 1]
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+
+import pytest
+
+import bwa_library
+from bwa_library import Library
+
+
+class _NoFTS5(sqlite3.Connection):
+    def execute(self, sql, *args):
+        if "USING fts5" in sql:
+            raise sqlite3.OperationalError("no such module: fts5")
+        return super().execute(sql, *args)
+
+
+@pytest.fixture(params=["fts5", "like"])
+def library(request, tmp_path, monkeypatch):
+    if request.param == "like":
+        connect = sqlite3.connect
+        monkeypatch.setattr(bwa_library.sqlite3, "connect",
+                            lambda *a, **kw: connect(*a, factory=_NoFTS5, **kw))
+    lib = Library(tmp_path, db_path=tmp_path / "lib.sqlite3")
+    assert lib.fts == (request.param == "fts5")
+    return lib
+
+
+def _write(lib: Library, name: str, md: str, mtime: float, **kw):
+    path = lib.root / name
+    path.write_text(md, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    return lib.record(path, md, **kw)
+
+
+def _posts(lib: Library):
+    _write(lib, "caching.md", "# Caching at the edge\n\n## Invalidation\n\nKeys expire.\n", 100,
+           topic="edge caching", urls=["https://cdn.example.com/guide"])
+    _write(lib, "queues.md", "# Message queues\n\n## Backpressure\n\nA note on caching consumers.\n"
+           "See https://queues.example.org/why.\n", 200)
+    _write(lib, "vectors.md", "# Vector search\n\n## Indexes\n\n![diagram](images/hnsw.png)\n", 300)
+
+
+def test_record_and_page_newest_first(library):
+    _posts(library)
+    assert library.count() == 3
+    assert [p.slug for p in library.page(limit=2)] == ["vectors", "queues"]
+    assert [p.slug for p in library.page(limit=2, offset=2)] == ["caching"]
+
+    info = library.get("caching.md")
+    assert (info.title, info.topic) == ("Caching at the edge", "edge caching")
+    assert library.get("vectors.md").images == ("images/hnsw.png",)
+
+
+def test_search_matches_titles_headings_body_and_urls(library):
+    _posts(library)
+    assert {p.slug for p in library.search("caching")} == {"caching", "queues"}
+    assert library.search_count("caching") == 2
+    assert [p.slug for p in library.search("backpressure")] == ["queues"]
+    assert [p.slug for p in library.search("cdn")] == ["caching"]
+    assert [p.slug for p in library.search("queues example")] == ["queues"]
+    assert [p.slug for p in library.search("vec")] == ["vectors"]     # last word as a prefix
+    assert library.search("") == [] and library.search_count("  ") == 0
+    assert library.search("caching nothing") == []
+
+
+def test_fts_ranks_title_matches_first(tmp_path):
+    lib = Library(tmp_path, db_path=tmp_path / "lib.sqlite3")
+    if not lib.fts:
+        pytest.skip("sqlite built without FTS5")
+    _posts(lib)
+    assert [p.slug for p in lib.search("caching")] == ["caching", "queues"]
+
+
+def test_rerecording_keeps_topic_and_urls(library):
+    _posts(library)
+    _write(library, "caching.md", "# Caching at the edge\n\nRewritten.\n", 400)
+
+    assert library.get("caching.md").topic == "edge caching"
+    assert [p.slug for p in library.search("cdn")] == ["caching"]
+    assert library.search("invalidation") == []
+
+
+def test_sync_picks_up_new_changed_and_removed_files(library):
+    _posts(library)
+    (library.root / "vectors.md").unlink()
+    extra = library.root / "copied.md"
+    extra.write_text("# Copied in by hand\n\nAbout tracing.\n", encoding="utf-8")
+
+    assert library.sync() == 2
+    assert library.get("vectors.md") is None
+    assert [p.slug for p in library.search("tracing")] == ["copied"]
+    assert library.sync() == 0
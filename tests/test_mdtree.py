@@ -0,0 +1,66 @@
+import re
+
+from reportlab.platypus import ListFlowable, Table
+from reportlab.platypus.flowables import ListItem as RLListItem
+
+import bwa_mdtree as mdt
+from bwa_export import _make_styles, _parse_md_to_flowables, to_styled_html
+from bwa_mdtree import parse
+
+MD = """# Title
+
+| Name | Count | Notes |
+|:-----|:-----:|------:|
+| a | 1 | `code` |
+
+- one
+  - nested **bold**
+    1. deep
+- two
+"""
+
+
+def test_parse_tables_and_nested_lists():
+    heading, table, lst = parse(MD).blocks
+
+    assert isinstance(heading, mdt.Heading) and heading.level == 1
+    assert isinstance(table, mdt.Table)
+    assert table.align == ("left", "center", "right")
+    assert mdt.plain_text(table.header[1]) == "Count"
+    assert table.rows[0][2] == (mdt.Code("code"),)
+
+    assert isinstance(lst, mdt.ListBlock) and not lst.ordered
+    assert [mdt.plain_text(i.spans) for i in lst.items] == ["one", "two"]
+    [inner] = lst.items[0].children
+    assert not inner.ordered and inner.items[0].spans[1] == mdt.Strong((mdt.Text("bold"),))
+    [deepest] = inner.items[0].children
+    assert deepest.ordered and mdt.plain_text(deepest.items[0].spans) == "deep"
+
+
+def test_parse_is_shared_between_renderers():
+    assert parse(MD) is parse(MD)
+
+
+def test_html_renders_aligned_tables_and_nested_lists():
+    html = to_styled_html(MD, "T")
+    body = html[html.index("<article"):html.index("</article>")]
+
+    assert re.findall(r'<th style="text-align: (\w+);">', body) == ["left", "center", "right"]
+    assert '<td style="text-align: right;"><code>code</code></td>' in body
+    assert re.sub(r"\s+", "", body[body.index("<ul>"):]) == (
+        "<ul><li>one<ul><li>nested<strong>bold</strong><ol><li>deep</li></ol></li></ul></li>"
+        "<li>two</li></ul>"
+    )
+
+
+def test_pdf_renders_tables_and_nested_lists():
+    flowables = _parse_md_to_flowables(MD, _make_styles())
+    [table] = [f for f in flowables if isinstance(f, Table)]
+    [outer] = [f for f in flowables if isinstance(f, ListFlowable)]
+
+    assert len(table._cellvalues) == 2 and len(table._cellvalues[0]) == 3
+    first = outer._flowables[0]
+    assert isinstance(first, RLListItem)
+    [inner] = [f for f in first._flowables if isinstance(f, ListFlowable)]
+    [deep] = [f for f in inner._flowables[0]._flowables if isinstance(f, ListFlowable)]
+    assert deep._bulletType == "1"
@@ -0,0 +1,57 @@
+from bwa_backend import ImageAnchor, md_outline, placeholder_anchors, splice_placeholders
+
+MD = """# Title
+
+Intro paragraph.
+
+## Setup
+
+First paragraph.
+
+```python
+x = 1
+
+y = 2
+```
+
+Last paragraph.
+
+## Results
+
+Only paragraph.
+"""
+
+
+def _at(section: int, paragraph: int, n: int = 1):
+    return (ImageAnchor(section=section, paragraph=paragraph), f"[[IMAGE_{n}]]")
+
+
+def test_outline_counts_a_fenced_block_with_blank_lines_as_one_paragraph():
+    assert md_outline(MD) == "[1] ## Setup (3 paragraphs)\n[2] ## Results (1 paragraphs)"
+
+
+def test_splice_after_a_fenced_block_keeps_the_code_intact():
+    out = splice_placeholders(MD, [_at(1, 2)])
+    assert "y = 2\n```\n\n[[IMAGE_1]]\n\nLast paragraph." in out
+    assert out.replace("\n[[IMAGE_1]]\n", "") == MD
+
+
+def test_splice_clamps_paragraphs_and_sends_unknown_sections_to_the_end():
+    out = splice_placeholders(MD, [_at(2, 99, 1), _at(2, -3, 2), _at(7, 1, 3), _at(0, 1, 4)])
+    results = out[out.index("## Results"):]
+    assert results.index("[[IMAGE_2]]") < results.index("Only paragraph.") < results.index("[[IMAGE_1]]")
+    assert out.rstrip().endswith("[[IMAGE_1]]\n\n[[IMAGE_3]]\n\n[[IMAGE_4]]")
+
+
+def test_heading_running_into_its_first_paragraph():
+    md = "# T\n\n## Tight\nText right under.\n"
+    out = splice_placeholders(md, [_at(1, 0)])
+    assert out == "# T\n\n## Tight\n\n[[IMAGE_1]]\n\nText right under.\n"
+
+
+def test_anchors_round_trip_through_splice():
+    anchors = [_at(1, 0, 1), _at(1, 2, 2), _at(2, 1, 3)]
+    spliced = splice_placeholders(MD, anchors)
+
+    assert placeholder_anchors(spliced) == anchors
+    assert splice_placeholders(MD, placeholder_anchors(spliced)) == spliced
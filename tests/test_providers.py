@@ -0,0 +1,98 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from bwa_backend import Plan, app, astream_run, new_run_inputs, stream_run
+from bwa_providers import FakeChatModel, FakeSearchEngine, fake_image_bytes, provider
+from bwa_resilience import is_retryable, llm_policy
+
+
+def _run(topic: str, thread_id: str):
+    config = {"configurable": {"thread_id": thread_id, "bypass_llm_cache": True}}
+    events = list(stream_run(app, new_run_inputs(topic, "2025-01-15"), config=config))
+    kind, outcome = events[-1]
+    assert kind == "final"
+    return events, outcome
+
+
+def test_fake_run_streams_sections_through_timed_attempts():
+    # with a per-try timeout every LLM attempt runs on the resilience pool; the
+    # worker's stream writer must still find its LangGraph context there
+    assert llm_policy().attempt_timeout is not None
+    events, outcome = _run("Intro to vector databases", "test-sync-run")
+
+    assert outcome.ok, outcome.error
+    assert outcome.state["final"].startswith("# ")
+    task_ids = [t.id for t in outcome.state["plan"].tasks]
+    # the reducer subgraph returns its full state; sections must not be counted twice
+    assert sorted(tid for tid, _ in outcome.state["sections"]) == task_ids
+    assert outcome.state["final"].count("\n## ") == len(task_ids)
+    deltas = [p["section_delta"] for k, p in events if k == "custom" and "section_delta" in p]
+    assert {d["task_id"] for d in deltas} == set(task_ids)
+
+
+def test_fake_run_with_research_is_deterministic():
+    _, first = _run("Weekly AI news roundup", "test-det-1")
+    _, second = _run("Weekly AI news roundup", "test-det-2")
+
+    assert first.ok and second.ok
+    assert first.state["mode"] == "open_book"
+    assert first.state["evidence"]
+    assert first.state["final"] == second.state["final"]
+
+
+def test_fake_async_run():
+    async def run():
+        config = {"configurable": {"thread_id": "test-async-run", "bypass_llm_cache": True}}
+        return [e async for e in astream_run(app, new_run_inputs("Rust async runtimes", "2025-01-15"), config)]
+
+    kind, outcome = asyncio.run(run())[-1]
+    assert kind == "final"
+    assert outcome.ok, outcome.error
+    assert outcome.state["final"].startswith("# ")
+
+
+def test_provider_selection_per_kind(monkeypatch):
+    monkeypatch.setenv("BWA_PROVIDER", "fake")
+    monkeypatch.setenv("BWA_IMAGE_PROVIDER", "live")
+    assert provider("llm") == provider("search") == "fake"
+    assert provider("image") == "live"
+    monkeypatch.delenv("BWA_PROVIDER")
+    assert provider("llm") == "live"
+
+
+def test_fake_llm_stream_matches_invoke_and_reports_usage():
+    llm = FakeChatModel()
+    messages = [HumanMessage(content="Section title: Streams\nTarget words: 60\nBullets:\n- one\n- two\n")]
+    whole = llm.invoke(messages)
+    chunks = list(llm.stream(messages))
+
+    assert "".join(c.content for c in chunks) == whole.content
+    assert whole.content.startswith("## Streams")
+    assert chunks[-1].usage_metadata == whole.usage_metadata
+    assert whole.usage_metadata["total_tokens"] > 0
+
+
+def test_fake_structured_output_validates_against_the_schema():
+    out = FakeChatModel().with_structured_output(Plan, include_raw=True).invoke(
+        [HumanMessage(content="Topic: Vector search\nMode: closed_book")])
+    assert isinstance(out["parsed"], Plan)
+    assert 5 <= len(out["parsed"].tasks) <= 7
+    assert out["raw"].usage_metadata["total_tokens"] > 0
+
+
+def test_fake_failure_rate_raises_retryable_errors(monkeypatch):
+    monkeypatch.setenv("BWA_FAKE_FAILURE_RATE", "1")
+    engine = FakeSearchEngine()
+    [failed] = engine.search_many(["anything"])
+    assert is_retryable(failed)
+
+
+def test_fake_search_and_images_are_deterministic():
+    engine = FakeSearchEngine()
+    assert engine.search("same query", 3) == engine.search("same query", 3)
+    assert len(engine.search("same query", 3)) == 3
+
+    png = fake_image_bytes("a prompt")
+    assert png == fake_image_bytes("a prompt") != fake_image_bytes("another prompt")
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
@@ -0,0 +1,88 @@
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import bwa_backend
+from bwa_ratelimit import RateLimiter, _Bucket, estimate_tokens
+from bwa_resilience import get_breaker
+
+
+def test_bucket_reservations_queue_callers_in_order():
+    bucket = _Bucket(per_minute=60)            # 1 per second, burst of 60
+    now = time.monotonic()
+    assert bucket.reserve(60, now) == 0.0
+    assert bucket.reserve(1, now) == 1.0
+    assert bucket.reserve(1, now) == 2.0       # the next caller waits behind the first
+
+
+def test_bucket_refills_and_caps_at_capacity():
+    bucket = _Bucket(per_minute=60)
+    start = time.monotonic()
+    bucket.reserve(60, start)
+    bucket._refill(start + 10)
+    assert round(bucket.balance) == 10
+    bucket._refill(start + 1000)
+    assert bucket.balance == 60
+
+
+def test_oversized_request_never_waits_longer_than_a_full_bucket():
+    bucket = _Bucket(per_minute=60)
+    now = time.monotonic()
+    assert bucket.reserve(10_000, now) == 0.0  # charged as the whole capacity
+    assert bucket.reserve(60, now) == 60.0
+
+
+def test_zero_limits_disable_the_limiter():
+    limiter = RateLimiter(rpm=0, tpm=0)
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.acquire(1_000_000)
+    assert time.monotonic() - started < 0.1
+
+
+def test_settle_refunds_and_charges_the_difference():
+    limiter = RateLimiter(rpm=0, tpm=6000)
+    limiter.acquire(1000)
+    limiter.settle(1000, 400)
+    assert round(limiter._tokens.balance) == 5600
+    limiter.settle(1000, None)                 # unknown usage keeps the estimate
+    limiter.settle(400, 1400)
+    assert round(limiter._tokens.balance) == 4600
+
+
+def test_estimate_counts_prompt_chars_plus_output_allowance():
+    assert estimate_tokens(["x" * 400], output_tokens=100) == 200
+
+
+class _SlowLimiter:
+    """Every acquire waits `delay` seconds, as a full Gemini queue would."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.acquired = 0
+
+    def acquire(self, tokens: int = 0) -> None:
+        self.acquired += 1
+        time.sleep(self.delay)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        self.acquire(tokens)
+
+    def settle(self, estimated: int, actual) -> None:
+        pass
+
+
+def test_limiter_wait_is_outside_attempt_deadline(monkeypatch):
+    limiter = _SlowLimiter(0.3)
+    monkeypatch.setattr(bwa_backend, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setenv("BWA_LLM_TIMEOUT", "0.2")
+    breaker = get_breaker(bwa_backend.LLM_BREAKER)
+    breaker.record_success()
+
+    messages = [SystemMessage(content="Write one section."),
+                HumanMessage(content="Section title: Queueing\nTarget words: 40\nBullets:\n- waits\n")]
+    text = bwa_backend._invoke_text(messages, {"configurable": {"bypass_llm_cache": True}})
+
+    assert text.startswith("## Queueing")
+    assert limiter.acquired == 1
+    assert breaker._failures == 0
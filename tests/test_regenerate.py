@@ -0,0 +1,65 @@
+import re
+
+import pytest
+
+import bwa_backend
+from bwa_backend import app, new_run_inputs, regenerate_section, stream_run
+
+
+@pytest.fixture(scope="module")
+def finished():
+    config = {"configurable": {"thread_id": "test-regen"}}
+    _, outcome = list(stream_run(app, new_run_inputs("Regenerating one section", "2025-01-15"), config))[-1]
+    assert outcome.ok, outcome.error
+    return outcome.state
+
+
+def _h2(md: str):
+    return re.findall(r"^## (.+)$", md, re.MULTILINE)
+
+
+@pytest.mark.parametrize("doubled", [False, True])
+def test_regenerated_post_keeps_one_heading_per_task(finished, monkeypatch, doubled):
+    state = dict(finished)
+    if doubled:                         # as stored by runs before sections were keyed by task id
+        state["sections"] = list(state["sections"]) * 2
+    tasks = state["plan"].tasks
+    target = tasks[1]
+    monkeypatch.setattr(bwa_backend, "_invoke_text",
+                        lambda *a, **kw: f"## {target.title} (rewritten)\n\nFresh text.")
+
+    new_state = regenerate_section(state, target.id)
+
+    headings = _h2(new_state["final"])
+    assert len(headings) == len(tasks)
+    assert headings[1] == f"{target.title} (rewritten)"
+    assert headings[0] == tasks[0].title and headings[2:] == [t.title for t in tasks[2:]]
+    assert len(new_state["sections"]) == len(tasks)
+    assert new_state["final"].count("Fresh text.") == 1
+
+
+def test_regeneration_keeps_image_placements(finished, monkeypatch):
+    assert finished["image_specs"]
+    monkeypatch.setattr(bwa_backend, "_invoke_text", lambda *a, **kw: "## Short\n\nOne paragraph.")
+
+    new_state = regenerate_section(dict(finished), finished["plan"].tasks[0].id)
+
+    assert new_state["final"].count("![") == finished["final"].count("![")
+
+
+def test_regeneration_keeps_the_original_image_failure(monkeypatch):
+    def quota_exceeded(prompt):
+        raise RuntimeError("image quota exceeded")
+
+    monkeypatch.setattr(bwa_backend, "image_backend", lambda live: quota_exceeded)
+    config = {"configurable": {"thread_id": "test-regen-failed-image"}}
+    _, outcome = list(stream_run(app, new_run_inputs("Images that never rendered", "2025-01-15"), config))[-1]
+    assert outcome.ok, outcome.error
+    failed = outcome.state["final"].count("**Error:** image quota exceeded")
+    assert failed and failed == len(outcome.state["image_specs"])
+
+    monkeypatch.setattr(bwa_backend, "_invoke_text", lambda *a, **kw: "## Short\n\nOne paragraph.")
+    new_state = regenerate_section(dict(outcome.state), outcome.state["plan"].tasks[0].id)
+
+    assert new_state["final"].count("**Error:** image quota exceeded") == failed
+    assert "no longer exists" not in new_state["final"]
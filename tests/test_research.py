@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bwa_research import SEARCH_BREAKER, TavilyEngine, canonicalize_url, preprocess_results
+from bwa_resilience import get_breaker
+
+
+class _StubTavily(BaseHTTPRequestHandler):
+    """POST /search: echoes the query as hits after a short delay; "bad ..." queries get a 400."""
+
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            time.sleep(0.1)
+            if body["query"].startswith("bad"):
+                self.send_response(400)
+                self.end_headers()
+                return
+            payload = {"results": [
+                {"title": f"{body['query']} {i}", "url": f"https://example.com/{body['query']}/{i}",
+                 "content": "snippet", "published_date": "2025-01-14"}
+                for i in range(body["max_results"])
+            ]}
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def engine():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubTavily)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _StubTavily.peak = 0
+    get_breaker(SEARCH_BREAKER).record_success()
+    eng = TavilyEngine(api_key="test", base_url=f"http://127.0.0.1:{server.server_port}",
+                       max_workers=4, timeout=5)
+    yield eng
+    eng.close()
+    server.shutdown()
+
+
+def test_search_many_runs_concurrently_in_query_order(engine):
+    queries = [f"q{i}" for i in range(8)]
+    started = time.monotonic()
+    out = engine.search_many(queries, max_results=2)
+
+    assert [r[0]["title"] for r in out] == [f"q{i} 0" for i in range(8)]
+    assert out[3][1] == {"title": "q3 1", "url": "https://example.com/q3/1", "snippet": "snippet",
+                         "published_at": "2025-01-14", "source": None}
+    assert _StubTavily.peak > 1
+    assert time.monotonic() - started < 0.1 * len(queries)
+
+
+def test_failed_query_does_not_sink_the_batch(engine):
+    out = engine.search_many(["good", "bad query", "also good"], max_results=1)
+
+    assert out[0][0]["title"] == "good 0"
+    assert isinstance(out[1], Exception)
+    assert out[2][0]["title"] == "also good 0"
+    # a 400 is the caller's fault, not an outage: the breaker stays closed
+    assert get_breaker(SEARCH_BREAKER).state == "closed"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://WWW.Example.com:443/a/?utm_source=x&id=7#top", "https://example.com/a?id=7"),
+    ("https://example.com/p?fbclid=abc&gclid=def", "https://example.com/p"),
+    # "ref" is content on GitHub and many docs sites
+    ("https://github.com/o/r/blob/main/x.py?ref=v1.2", "https://github.com/o/r/blob/main/x.py?ref=v1.2"),
+    # kept parameters keep their order and encoding
+    ("https://docs.example.com/s?q=a%20b&lang=en&UTM_Medium=m", "https://docs.example.com/s?q=a%20b&lang=en"),
+    ("https://example.com/s?b=2&a=1&path=%2Fx", "https://example.com/s?b=2&a=1&path=%2Fx"),
+    ("http://example.com:8080/", "http://example.com:8080/"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_canonical_urls_are_fixed_points():
+    for url in ("https://example.com/a?id=7", "https://example.com/s?q=a+b&ref=main"):
+        assert canonicalize_url(canonicalize_url(url)) == canonicalize_url(url) == url
+
+
+def test_preprocess_drops_tracking_duplicates_but_not_ref_variants():
+    raw = [
+        {"title": "A", "url": "https://example.com/a?utm_source=feed", "snippet": "alpha report one"},
+        {"title": "A", "url": "https://www.example.com/a/", "snippet": "alpha report two"},
+        {"title": "B", "url": "https://github.com/o/r?ref=main", "snippet": "main branch notes"},
+        {"title": "C", "url": "https://github.com/o/r?ref=dev", "snippet": "dev branch changelog"},
+    ]
+    assert [r["url"] for r in preprocess_results(raw)] == [
+        "https://example.com/a", "https://github.com/o/r?ref=main", "https://github.com/o/r?ref=dev",
+    ]
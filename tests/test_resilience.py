@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import bwa_resilience
+from bwa_resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, FaultInjector, RetryPolicy, TransientError,
+    acall, call, is_retryable,
+)
+
+FAST = dict(base_delay=0.001, max_delay=0.001)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_retryable_classification():
+    assert is_retryable(TransientError("x"))
+    assert is_retryable(TimeoutError())
+    assert is_retryable(_HTTPError(429)) and is_retryable(_HTTPError(503))
+    assert not is_retryable(_HTTPError(400))
+    assert is_retryable(RuntimeError("google: 503 UNAVAILABLE"))
+    assert not is_retryable(ValueError("bad schema"))
+    assert not is_retryable(CircuitOpenError("open"))
+
+
+def test_transient_errors_are_retried_until_success():
+    flaky = FaultInjector(lambda: "ok", fail_first=2)
+    assert call(flaky, RetryPolicy(attempts=3, **FAST)) == "ok"
+    assert flaky.calls == 3
+
+
+def test_permanent_errors_and_exhausted_budgets_raise():
+    bad = FaultInjector(lambda: "ok", fail_first=1, error=ValueError)
+    with pytest.raises(ValueError):
+        call(bad, RetryPolicy(attempts=5, **FAST))
+    assert bad.calls == 1
+
+    down = FaultInjector(lambda: "ok", fail_first=10)
+    with pytest.raises(TransientError):
+        call(down, RetryPolicy(attempts=3, **FAST))
+    assert down.calls == 3
+
+
+def test_attempt_timeout_is_retried_and_whole_call_deadline_holds():
+    slow = FaultInjector(lambda: "ok", latency=(0.5, 0.5))
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call(slow, RetryPolicy(attempts=10, attempt_timeout=0.1, deadline=0.35, **FAST))
+    assert time.monotonic() - started < 0.5
+    assert 2 <= slow.calls <= 4
+
+
+def test_timed_attempts_see_the_callers_context():
+    var = contextvars.ContextVar("var", default="unset")
+    var.set("caller")
+    assert call(var.get, RetryPolicy(attempt_timeout=1.0)) == "caller"
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    """A one-thread pool that is busy for the first 0.3 s of the test."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(bwa_resilience, "_pool", pool)
+    pool.submit(time.sleep, 0.3)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_time_queued_for_a_thread_does_not_count_against_the_attempt(busy_pool):
+    def fn():
+        time.sleep(0.05)
+        return "ok"
+
+    tried = FaultInjector(fn)
+    assert call(tried, RetryPolicy(attempts=1, attempt_timeout=0.2)) == "ok"
+    assert tried.calls == 1
+
+
+def test_whole_call_deadline_still_covers_the_queue(busy_pool):
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call(lambda: "ok", RetryPolicy(attempts=1, attempt_timeout=0.2, deadline=0.1))
+    assert time.monotonic() - started < 0.25
+
+
+def test_pool_is_sized_for_concurrent_calls_and_hedges(monkeypatch):
+    monkeypatch.delenv("BWA_RESILIENCE_THREADS", raising=False)
+    monkeypatch.setenv("BWA_JOB_WORKERS", "3")
+    monkeypatch.setenv("BWA_MAX_CONCURRENCY", "8")
+    assert bwa_resilience._pool_size() == 48
+    monkeypatch.setenv("BWA_MAX_CONCURRENCY", "1")
+    assert bwa_resilience._pool_size() == 16
+    monkeypatch.setenv("BWA_RESILIENCE_THREADS", "5")
+    assert bwa_resilience._pool_size() == 5
+
+
+def test_hedged_call_returns_the_faster_duplicate():
+    latencies = iter([1.0, 0.0])
+
+    def fn():
+        time.sleep(next(latencies))
+        return "done"
+
+    started = time.monotonic()
+    assert call(fn, RetryPolicy(attempts=1, attempt_timeout=2.0, hedge_after=0.05)) == "done"
+    assert time.monotonic() - started < 0.5
+
+
+def test_breaker_opens_fails_fast_and_recovers_after_a_probe():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.1)
+    down = FaultInjector(lambda: "ok", fail_first=2)
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            call(down, RetryPolicy(attempts=1), breaker)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        call(down, RetryPolicy(attempts=3, **FAST), breaker)
+    assert down.calls == 2                      # rejected without calling the service
+
+    time.sleep(0.12)
+    assert breaker.state == "half_open"
+    assert call(down, RetryPolicy(attempts=1), breaker) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_non_retryable_errors_do_not_trip_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(ValueError):
+        call(FaultInjector(lambda: "ok", fail_first=1, error=ValueError), RetryPolicy(attempts=1), breaker)
+    assert breaker.state == "closed"
+
+
+def test_async_call_retries_and_enforces_attempt_timeout():
+    async def ok():
+        return "ok"
+
+    async def run():
+        flaky = FaultInjector(ok, fail_first=2)
+        assert await acall(flaky.acall, RetryPolicy(attempts=3, **FAST)) == "ok"
+
+        slow = FaultInjector(ok, latency=(0.5, 0.5))
+        with pytest.raises(DeadlineExceeded):
+            await acall(slow.acall, RetryPolicy(attempts=2, attempt_timeout=0.05, **FAST))
+
+    asyncio.run(run())
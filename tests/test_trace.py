@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from bwa_trace import read_trace, record_cache_hit, record_count, record_llm, span, summarize, trace_path
+
+
+@pytest.fixture(autouse=True)
+def trace_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("BWA_TRACE_DIR", str(tmp_path))
+    monkeypatch.setenv("BWA_TRACE", "on")
+    return tmp_path
+
+
+def _reply(inp: int, out: int) -> AIMessage:
+    return AIMessage(content="x", usage_metadata={"input_tokens": inp, "output_tokens": out,
+                                                  "total_tokens": inp + out})
+
+
+def test_nested_spans_attribute_calls_to_the_innermost_node():
+    with span("outer", "run-1") as outer:
+        record_llm(_reply(10, 1))
+        with span("inner", "run-1", task_id=3) as inner:
+            record_llm(_reply(100, 20))
+            record_llm(AIMessage(content="no usage"))
+            record_cache_hit()
+            record_count("searches", 2)
+            record_count("searches", 0)
+        record_llm(_reply(5, 5))
+    record_llm(_reply(1000, 1000))                  # outside any span: ignored
+
+    assert (outer.llm_calls, outer.input_tokens, outer.output_tokens) == (2, 15, 6)
+    assert (inner.llm_calls, inner.input_tokens, inner.output_tokens) == (2, 100, 20)
+    assert (inner.cache_hits, inner.counts, inner.task_id) == (1, {"searches": 2}, 3)
+
+    spans = read_trace("run-1")
+    assert [s["node"] for s in spans] == ["outer", "inner"]        # by start time
+    assert spans[1]["input_tokens"] == 100 and spans[1]["error"] is None
+
+
+def test_failed_node_is_written_with_its_error_and_reraised():
+    with pytest.raises(ValueError):
+        with span("worker", "run-err"):
+            raise ValueError("bad section")
+    [s] = read_trace("run-err")
+    assert s["error"] == "ValueError: bad section" and s["end"] >= s["start"]
+
+
+def test_no_run_id_or_tracing_off_writes_nothing(trace_dir, monkeypatch):
+    with span("node", None) as s:
+        assert s is None
+    monkeypatch.setenv("BWA_TRACE", "off")
+    with span("node", "run-off") as s:
+        assert s is None
+    assert list(trace_dir.iterdir()) == []
+
+
+def test_summarize_rolls_up_per_node_in_first_start_order():
+    spans = [
+        {"node": "worker", "start": 1.0, "end": 3.0, "seconds": 2.0, "llm_calls": 1,
+         "input_tokens": 10, "output_tokens": 5, "cache_hits": 0, "error": None},
+        {"node": "router", "start": 0.0, "end": 0.5, "seconds": 0.5, "llm_calls": 1,
+         "input_tokens": 3, "output_tokens": 1, "cache_hits": 1, "error": None},
+        {"node": "worker", "start": 1.5, "end": 4.0, "seconds": 2.5, "llm_calls": 1,
+         "input_tokens": 20, "output_tokens": 7, "cache_hits": 0, "error": "ValueError: x"},
+    ]
+    rows = {r["node"]: r for r in summarize(spans)}
+
+    assert list(rows) == ["worker", "router"]
+    assert rows["worker"] == {"node": "worker", "runs": 2, "slowest_s": 2.5, "llm_calls": 2,
+                              "input_tokens": 30, "output_tokens": 12, "cache_hits": 0,
+                              "errors": 1, "wall_s": 3.0}      # overlapping workers: not 4.5
+    assert rows["router"]["cache_hits"] == 1 and rows["router"]["wall_s"] == 0.5
+
+
+def test_trace_files_are_capped_least_recently_written_first(trace_dir, monkeypatch):
+    monkeypatch.setenv("BWA_TRACE_FILES", "2")
+    for age, run in ((30, "old"), (20, "mid")):
+        with span("node", run):
+            pass
+        past = time.time() - age
+        os.utime(trace_path(run), (past, past))
+    with span("node", "old"):                      # appending refreshes a run's file
+        pass
+
+    with span("node", "new"):
+        pass
+    assert {p.stem for p in trace_dir.iterdir()} == {"old", "new"}
+    assert len(read_trace("old")) == 2